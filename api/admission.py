@@ -0,0 +1,122 @@
+import time
+import heapq
+import itertools
+import threading
+import metrics
+
+MAX_INFLIGHT = 0
+QUEUE_DEPTH = 0
+QUEUE_TIMEOUT = 0.1
+RETRY_AFTER = 1
+# the latency-sensitive method wins a freed slot over fan-outs
+PRIORITIES = {"online_score": 1}
+QUEUE_FULL = "queue_full"
+METHOD_LIMIT = "method_limit"
+TIMEOUT = "timeout"
+
+SHED = metrics.counter("admission_shed",
+                       "Requests refused by admission control by method "
+                       "and reason.",
+                       labels=("method", "reason"))
+QUEUE_SECONDS = metrics.histogram("admission_queue_seconds",
+                                  "Time admitted requests waited for a slot.")
+
+
+class AdmissionControl(object):
+    """Bounds the number of requests handled at once.
+
+    At most ``max_inflight`` requests run, up to ``queue_depth`` more
+    wait for a slot for at most ``queue_timeout`` seconds (or until the
+    request deadline) and the rest are refused at once. A freed slot
+    goes to the waiter of the highest priority (``priorities`` by
+    method on top of PRIORITIES, 0 by default), first come first served
+    within a priority. ``limits`` cap the running and waiting requests
+    of single methods, e.g. to keep fan-outs from taking every slot;
+    requests over a method limit are refused without waiting. Every
+    ``admit`` that returns True must be followed by a ``release``. A
+    ``max_inflight`` of 0 leaves only the method limits.
+    """
+
+    def __init__(self, max_inflight=MAX_INFLIGHT, queue_depth=QUEUE_DEPTH,
+                 queue_timeout=QUEUE_TIMEOUT, limits=None, priorities=None,
+                 retry_after=RETRY_AFTER):
+        self.max_inflight = max_inflight
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.limits = dict(limits or {})
+        self.priorities = dict(PRIORITIES)
+        self.priorities.update(priorities or {})
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.admitted = 0
+        self.shed = 0
+        # running and waiting requests of the methods with a limit
+        self._methods = dict.fromkeys(self.limits, 0)
+        # heap of [-priority, arrival, event] of the waiting requests
+        self._waiters = []
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def _shed(self, method, reason):
+        # called with the lock held
+        self.shed += 1
+        SHED.labels(method, reason).inc()
+        return False
+
+    def admit(self, method, deadline=None):
+        """Take a slot for a request of ``method``, waiting for one if
+        needed. False when the request is refused."""
+        with self._lock:
+            limit = self.limits.get(method)
+            if limit is not None:
+                if self._methods[method] >= limit:
+                    return self._shed(method, METHOD_LIMIT)
+                self._methods[method] += 1
+            if not self.max_inflight or self.inflight < self.max_inflight:
+                self.inflight += 1
+                self.admitted += 1
+                return True
+            if len(self._waiters) >= self.queue_depth:
+                self._unlimit(method)
+                return self._shed(method, QUEUE_FULL)
+            waiter = [-self.priorities.get(method, 0), next(self._arrivals),
+                      threading.Event()]
+            heapq.heappush(self._waiters, waiter)
+        start = time.time()
+        timeout = self.queue_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - start)
+        if timeout > 0:
+            waiter[2].wait(timeout)
+        with self._lock:
+            # the slot may have been handed over right after the timeout
+            if not waiter[2].is_set():
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._unlimit(method)
+                return self._shed(method, TIMEOUT)
+            self.admitted += 1
+        QUEUE_SECONDS.observe(time.time() - start)
+        return True
+
+    def _unlimit(self, method):
+        # called with the lock held
+        if method in self._methods:
+            self._methods[method] -= 1
+
+    def release(self, method):
+        with self._lock:
+            self._unlimit(method)
+            if self._waiters:
+                # the slot passes to the waiter, inflight stays the same
+                heapq.heappop(self._waiters)[2].set()
+            else:
+                self.inflight -= 1
+
+    def stats(self):
+        return {
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
@@ -1,16 +1,40 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import json
+import sys
 import datetime
+# strptime imports it lazily and the import races between threads
+import _strptime  # noqa: F401
 import logging
 import hashlib
+import hmac
+import time
+import threading
 import uuid
 import re
+import random
+import itertools
 from optparse import OptionParser
-from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from BaseHTTPServer import BaseHTTPRequestHandler
 import scoring
-from store import Store
+from scoring import UNKNOWN, MALE, FEMALE, GENDERS  # noqa: F401
+import fastjson
+import server
+import metrics
+import replay
+import warmup
+from admission import AdmissionControl, MAX_INFLIGHT, QUEUE_DEPTH, \
+    QUEUE_TIMEOUT, RETRY_AFTER
+import deadline
+from deadline import DeadlineExceeded
+from store import Store, HOST, NEGATIVE_TTL
+from backends import make_store, BACKENDS, TARANTOOL, MEMORY
+from memory_store import read_interests
+from breaker import FAILURE_THRESHOLD, RESET_TIMEOUT
+from cache import LRUCache, CachedStore, FILL_TTL
+from batch import BatchStore
+from writebehind import WriteBehindStore, POLICIES, DROP
+from asynclog import setup_logging, FORMATS, TEXT, QUEUE_SIZE
 
 SALT = "Otus"
 ADMIN_LOGIN = "admin"
@@ -21,43 +45,114 @@ FORBIDDEN = 403
 NOT_FOUND = 404
 INVALID_REQUEST = 422
 INTERNAL_ERROR = 500
+SERVICE_UNAVAILABLE = 503
+GATEWAY_TIMEOUT = 504
 ERRORS = {
     BAD_REQUEST: "Bad Request",
     FORBIDDEN: "Forbidden",
     NOT_FOUND: "Not Found",
     INVALID_REQUEST: "Invalid Request",
     INTERNAL_ERROR: "Internal Server Error",
+    SERVICE_UNAVAILABLE: "Service Unavailable",
+    GATEWAY_TIMEOUT: "Gateway Timeout",
 }
-UNKNOWN = 0
-MALE = 1
-FEMALE = 2
-GENDERS = {
-    UNKNOWN: "unknown",
-    MALE: "male",
-    FEMALE: "female",
-}
+HTTP_REQUESTS = metrics.counter("http_requests",
+                                "HTTP requests by route and response code.",
+                                labels=("route", "code"))
+HTTP_SECONDS = metrics.histogram("http_request_duration_seconds",
+                                 "Time to handle an HTTP request by route.",
+                                 labels=("route",))
+METHOD_RESPONSES = metrics.counter("method_responses",
+                                   "Method responses by method and code.",
+                                   labels=("method", "code"))
+PARSE_SECONDS = metrics.STAGE_SECONDS.labels("parse")
+VALIDATE_SECONDS = metrics.STAGE_SECONDS.labels("validate")
+AUTH_SECONDS = metrics.STAGE_SECONDS.labels("auth")
+SCORE_SECONDS = metrics.STAGE_SECONDS.labels("score")
+INTERESTS_SECONDS = metrics.STAGE_SECONDS.labels("interests")
+SERIALIZE_SECONDS = metrics.STAGE_SECONDS.labels("serialize")
+MISSING = object()
+MAX_BATCH_SIZE = 1000
+ADMIN_TOKEN_GRACE = 60
+KEEPALIVE_TIMEOUT = 5
+MAX_KEEPALIVE_REQUESTS = 100
+# share of request bodies written to the log
+LOG_BODY_RATE = 1.0
+# seconds a request may take, 0 for no limit; clients may ask for less
+REQUEST_TIMEOUT = 2.0
+TIMEOUT_HEADER = "X-Request-Timeout"
+# clients_interests requests with more ids are streamed, 0 never streams
+STREAM_THRESHOLD = 1000
+STREAM_BATCH_SIZE = 1000
+DATE_FORMAT = "%d.%m.%Y"
+# parsed dates by their string, real dates are few
+DATES_SIZE = 100000
+AGE_LIMIT = 70
+dates = {}
+
+
+def parse_date(value):
+    date = dates.get(value)
+    if date is None:
+        date = datetime.datetime.strptime(value, DATE_FORMAT)
+        if len(dates) >= DATES_SIZE:
+            dates.clear()
+        dates[value] = date
+    return date
+
+
+class Today(object):
+    """Current date, recomputed only when the day rolls over."""
+
+    def __init__(self):
+        self._date = None
+        self._until = 0
+
+    def __call__(self):
+        now = time.time()
+        if now >= self._until:
+            date = datetime.date.today()
+            tomorrow = datetime.datetime.combine(
+                date + datetime.timedelta(days=1), datetime.time.min)
+            self._date = date
+            self._until = time.mktime(tomorrow.timetuple())
+        return self._date
+
+
+today = Today()
 
 
 class CommonField(object):
+    f_type = ()
+    pattern = None
+    _counter = itertools.count()
+
     def __init__(self, required, nullable):
         self.required = required
         self.nullable = nullable
+        # declaration order, used as the validation order of the request
+        self.order = next(CommonField._counter)
+        self.types = frozenset(self.f_type)
+        self.regex = re.compile(self.pattern) if self.pattern else None
 
     def validate_value(self, value):
-        if type(value) not in self.f_type:
+        if type(value) not in self.types:
             raise TypeError("Invalid type")
-        if "pattern" in dir(self):
-            if not re.match(self.pattern, str(value)):
-                raise ValueError("Invalid format")
+        if self.regex is not None and not self.regex.match(str(value)):
+            raise ValueError("Invalid format")
         return value
 
+    def clean(self, value):
+        # validated value converted to the type handlers use
+        return self.validate_value(value)
+
 
 class CharField(CommonField):
-    f_type = [str, unicode]
+    f_type = (str, unicode)
 
 
 class ArgumentsField(CommonField):
-    f_type = [dict]
+    f_type = (dict,)
 
 
 class EmailField(CharField):
@@ -65,28 +160,28 @@ class EmailField(CharField):
 
 
 class PhoneField(CommonField):
-    f_type = [str, unicode, int]
+    f_type = (str, unicode, int)
     pattern = r"^7\d{10}$"
 
 
 class DateField(CommonField):
     def validate_value(self, value):
+        self.clean(value)
+        return value
+
+    def clean(self, value):
         try:
-            datetime.datetime.strptime(value, "%d.%m.%Y")
+            return parse_date(value)
         except Exception:
             raise ValueError("Invalid date")
-        return value
 
 
 class BirthDayField(DateField):
-    def validate_value(self, value):
-        super(BirthDayField, self).validate_value(value)
-        birth_year = int(value[-4:])
-        today = datetime.datetime.now()
-        age_limit = 70
-        if today.year - birth_year > age_limit:
-            raise ValueError("Birthday is more than 70 years ago")
-        return value
+    def clean(self, value):
+        birthday = super(BirthDayField, self).clean(value)
+        if today().year - birthday.year > AGE_LIMIT:
+            raise ValueError("Birthday is more than %s years ago" % AGE_LIMIT)
+        return birthday
 
 
 class GenderField(CommonField):
@@ -98,7 +193,7 @@ class GenderField(CommonField):
 
 
 class ClientIDsField(CommonField):
-    f_type = [list]
+    f_type = (list,)
 
     def validate_value(self, value):
         err_values = []
@@ -114,41 +209,73 @@ class ClientIDsField(CommonField):
 
 class CommonRequestMeta(type):
     def __new__(meta, name, bases, dct):
-        data_fields = []
-        for val in dct:
-            if isinstance(dct[val], CommonField):
-                data_fields.append(val)
+        # fields move from the class dict to slots: an instance keeps only
+        # the values, the field objects live in ``validators``
+        fields = sorted(((f, dct.pop(f)) for f, v in dct.items()
+                         if isinstance(v, CommonField)),
+                        key=lambda item: item[1].order)
+        dct.setdefault("__slots__", tuple(f for f, _ in fields))
         inst = super(CommonRequestMeta, meta).__new__(meta, name, bases, dct)
-        inst.data_fields = data_fields
+        inst.data_fields = tuple(f for f, _ in fields)
+        inst.field_bits = dict((f, 1 << i) for i, (f, _) in enumerate(fields))
+        inst.validators = tuple((f, field.required, field.nullable,
+                                 field.clean, inst.field_bits[f])
+                                for f, field in fields)
         return inst
 
 
 class CommonRequest(object):
     __metaclass__ = CommonRequestMeta
+    __slots__ = ("errors_list", "filled_mask", "parsed")
     null_values = (None, "", [], (), {})
 
+    @property
+    def filled_fields(self):
+        mask = self.filled_mask
+        return tuple(f for f in self.data_fields
+                     if mask & self.field_bits[f])
+
+    def has(self, *fields):
+        bits = self.field_bits
+        mask = 0
+        for f in fields:
+            mask |= bits[f]
+        return self.filled_mask & mask == mask
+
     def check_data(self, request):
-        self.errors_list = []
-        self.filled_fields = []
-        for f in self.data_fields:
-            field = getattr(self, f)
-            value = None
-            try:
-                value = request[f]
-            except Exception:
-                if field.required:
-                    self.errors_list.append("%s is required" % f)
-            if not value and not field.nullable:
-                self.errors_list.append("%s is empty" % f)
-            try:
-                setattr(self, f, value)
-                if value not in self.null_values:
-                    field.validate_value(value)
-                    self.filled_fields.append(f)
-            except Exception as e:
-                self.errors_list.append("'%s' error: %s" % (f, e))
-        if self.errors_list:
-            err = ", ".join(self.errors_list)
+        # errors and parsed values are allocated only when there are any
+        errors_list = ()
+        filled_mask = 0
+        parsed = None
+        null_values = self.null_values
+        if not isinstance(request, dict):
+            request = {}
+        for f, required, nullable, clean, bit in self.validators:
+            value = request.get(f, MISSING)
+            if value is MISSING:
+                value = None
+                if required:
+                    errors_list += ("%s is required" % f,)
+            if not value and not nullable:
+                errors_list += ("%s is empty" % f,)
+            setattr(self, f, value)
+            if value not in null_values:
+                try:
+                    cleaned = clean(value)
+                    filled_mask |= bit
+                    if cleaned is not value:
+                        if parsed is None:
+                            parsed = {}
+                        parsed[f] = cleaned
+                except Exception as e:
+                    errors_list += ("'%s' error: %s" % (f, e),)
+        self.errors_list = errors_list
+        self.filled_mask = filled_mask
+        # typed values of the fields that were converted, e.g. dates,
+        # None if there are none
+        self.parsed = parsed
+        if errors_list:
+            err = ", ".join(errors_list)
             raise ValueError(err)
 
 
@@ -174,8 +301,9 @@ class OnlineScoreRequest(CommonRequest):
         super(OnlineScoreRequest, self).check_data(request)
         pair_exists = False
         for p0, p1 in self.pairs:
-            if p0 in self.filled_fields and p1 in self.filled_fields:
+            if self.has(p0, p1):
                 pair_exists = True
+                break
         if not pair_exists:
             err = "No pairs %s found" % str(self.pairs)
             raise ValueError(err)
@@ -193,41 +321,99 @@ class MethodRequest(CommonRequest):
         return self.login == ADMIN_LOGIN
 
 
+class Authenticator(object):
+    """Token checks without hashing on every request.
+
+    The admin token changes once an hour, so the current one is computed
+    when the hour starts; the previous one is still accepted for
+    ``grace`` seconds after the rollover. User tokens are hashed on every
+    request, a cache lookup costs about as much as SHA-512 of a short
+    string. Tokens are compared in constant time.
+    """
+
+    def __init__(self, grace=ADMIN_TOKEN_GRACE):
+        self.grace = grace
+        self._admin_tokens = ()
+        self._hour_start = 0
+        self._hour_end = 0
+        self._lock = threading.Lock()
+
+    def _admin_token(self, hour):
+        return hashlib.sha512(hour.strftime("%Y%m%d%H") +
+                              ADMIN_SALT).hexdigest()
+
+    def admin_tokens(self):
+        now = time.time()
+        if now >= self._hour_end:
+            with self._lock:
+                if now >= self._hour_end:
+                    today = datetime.datetime.now()
+                    hour = today.replace(minute=0, second=0, microsecond=0)
+                    self._admin_tokens = (
+                        self._admin_token(hour),
+                        self._admin_token(hour - datetime.timedelta(hours=1)))
+                    self._hour_start = now - (today - hour).total_seconds()
+                    self._hour_end = self._hour_start + 3600
+        if now - self._hour_start < self.grace:
+            return self._admin_tokens
+        return self._admin_tokens[:1]
+
+    def user_token(self, account, login):
+        return hashlib.sha512(account + login + SALT).hexdigest()
+
+    def check(self, request):
+        token = request.token
+        if type(token) is unicode:
+            token = token.encode("utf-8")
+        elif type(token) is not str:
+            return False
+        if request.login == ADMIN_LOGIN:
+            for digest in self.admin_tokens():
+                if hmac.compare_digest(digest, token):
+                    return True
+            return False
+        return hmac.compare_digest(
+            self.user_token(request.account, request.login), token)
+
+
+authenticator = Authenticator()
+
+
 def check_auth(request):
-    if request.is_admin:
-        digest = hashlib.sha512(datetime.datetime.now().strftime("%Y%m%d%H") +
-                                ADMIN_SALT).hexdigest()
-    else:
-        digest = hashlib.sha512(request.account +
-                                request.login +
-                                SALT).hexdigest()
-    if digest == request.token:
-        return True
-    return False
+    return authenticator.check(request)
 
 
 def method_handler(request, ctx, store):
     response, code = None, None
-    handlers = {
-        "online_score": online_score_handler,
-        "clients_interests": clients_interests_handler
-    }
+    handlers = METHOD_HANDLERS
+    method = "unknown"
     try:
         method_request = MethodRequest()
-        method_request.check_data(request["body"])
-        if not check_auth(method_request):
-            return "", FORBIDDEN
-        response, code =\
-            handlers[method_request.method](method_request, ctx, store)
+        with VALIDATE_SECONDS.time():
+            method_request.check_data(request["body"])
+        if method_request.method in handlers:
+            method = method_request.method
+        with AUTH_SECONDS.time():
+            authorized = check_auth(method_request)
+        if not authorized:
+            response, code = "", FORBIDDEN
+        else:
+            with deadline.scope(ctx.get("deadline")):
+                response, code = handlers[method_request.method](
+                    method_request, ctx, store)
+    except DeadlineExceeded as e:
+        response, code = str(e), GATEWAY_TIMEOUT
     except Exception as e:
-        logging.info("MethodRequest validation error: %s" % request)
-        return str(e), INVALID_REQUEST
+        logging.info("MethodRequest validation error: %s", request)
+        response, code = str(e), INVALID_REQUEST
+    METHOD_RESPONSES.labels(method, code).inc()
     return response, code
 
 
 def online_score_handler(request, ctx, store):
     score_request = OnlineScoreRequest()
-    score_request.check_data(request.arguments)
+    with VALIDATE_SECONDS.time():
+        score_request.check_data(request.arguments)
     if request.is_admin:
         score = 42
     else:
@@ -236,91 +422,563 @@ def online_score_handler(request, ctx, store):
             if arg == "gender":
                 scoring_args[arg] = GENDERS[request.arguments[arg]]
             elif arg == "birthday":
-                scoring_args[arg] = datetime.datetime.strptime(
-                    request.arguments[arg], "%d.%m.%Y")
+                scoring_args[arg] = score_request.parsed[arg]
             elif arg == "phone":
                 scoring_args[arg] = str(request.arguments[arg])
             else:
                 scoring_args[arg] = request.arguments[arg].encode("utf-8")
-        score = scoring.get_score(**scoring_args)
+        with SCORE_SECONDS.time():
+            score = scoring.get_score(**scoring_args)
     ctx["has"] = score_request.filled_fields
     return {"score": score}, OK
 
 
+class InterestsStream(object):
+    """clients_interests response built batch by batch while it is sent.
+
+    Iterating yields the JSON of the response dict in pieces, one per
+    ``batch_size`` ids, each batch looked up only when its piece is due,
+    so memory is bounded by the batch size. ``start`` looks up the first
+    batch in advance, its errors still change the response code.
+
+    The request ``deadline`` covers the first batch, i.e. the first byte
+    of the response. Every later batch gets a deadline of its own,
+    ``batch_timeout`` seconds from its start (None for no limit), so a
+    long stream is not cut off by the budget of the whole request.
+    """
+
+    def __init__(self, store, client_ids, batch_size=STREAM_BATCH_SIZE,
+                 deadline=None, batch_timeout=None):
+        self.store = store
+        self.client_ids = client_ids
+        self.batch_size = batch_size
+        self.deadline = deadline
+        self.batch_timeout = batch_timeout
+        self._seen = set()
+        self._first = None
+
+    def __repr__(self):
+        return "<%s client ids streamed>" % len(self.client_ids)
+
+    def _piece(self, cids, until):
+        # ids repeated within the batch or seen in earlier ones are
+        # emitted once, at their first position
+        seen = self._seen
+        fresh = []
+        for cid in cids:
+            if cid not in seen:
+                seen.add(cid)
+                fresh.append(cid)
+        cids = fresh
+        with deadline.scope(until):
+            with INTERESTS_SECONDS.time():
+                interests = scoring.get_interests_many(store=self.store,
+                                                       cids=cids)
+        return ", ".join('"%s": %s' % (cid, fastjson.dumps(i))
+                         for cid, i in zip(cids, interests))
+
+    def start(self):
+        self._first = self._piece(self.client_ids[:self.batch_size],
+                                  self.deadline)
+
+    def __iter__(self):
+        if self._first is None:
+            self.start()
+        piece, self._first = self._first, None
+        yield "{" + piece
+        for i in range(self.batch_size, len(self.client_ids),
+                       self.batch_size):
+            until = time.time() + self.batch_timeout \
+                if self.batch_timeout else None
+            piece = self._piece(self.client_ids[i:i + self.batch_size],
+                                until)
+            if piece:
+                yield ", " + piece
+        yield "}"
+
+
 def clients_interests_handler(request, ctx, store):
     interests_request = ClientsInterestsRequest()
-    interests_request.check_data(request.arguments)
-    response = {}
+    with VALIDATE_SECONDS.time():
+        interests_request.check_data(request.arguments)
+    client_ids = interests_request.client_ids
+    if ctx.get("stream") and STREAM_THRESHOLD and \
+            len(client_ids) > STREAM_THRESHOLD:
+        stream = InterestsStream(store, client_ids, STREAM_BATCH_SIZE,
+                                 ctx.get("deadline"), REQUEST_TIMEOUT)
+        try:
+            stream.start()
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            return str(e), INTERNAL_ERROR
+        ctx["nclients"] = len(client_ids)
+        return stream, OK
     try:
-        for cid in interests_request.client_ids:
-            response[str(cid)] = scoring.get_interests(store=store, cid=cid)
+        with INTERESTS_SECONDS.time():
+            interests = scoring.get_interests_many(store=store,
+                                                   cids=client_ids)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return str(e), INTERNAL_ERROR
+    response = dict(zip((str(cid) for cid in client_ids), interests))
     num_clients = len(interests_request.client_ids)
     ctx["nclients"] = num_clients
     return response, OK
 
 
+METHOD_HANDLERS = {
+    "online_score": online_score_handler,
+    "clients_interests": clients_interests_handler
+}
+
+
+def batch_handler(request, ctx, store):
+    items = request["body"]
+    if not isinstance(items, list):
+        return "Batch must be a list of method requests", INVALID_REQUEST
+    if len(items) > MAX_BATCH_SIZE:
+        err = "Batch is larger than %s requests" % MAX_BATCH_SIZE
+        return err, INVALID_REQUEST
+    # fetch interests of all authorized clients_interests items at once
+    client_ids = []
+    for item in items:
+        method_request = MethodRequest()
+        try:
+            method_request.check_data(item)
+            authorized = method_request.method == "clients_interests" and \
+                check_auth(method_request)
+        except Exception:
+            # method_handler reports the error of this item
+            continue
+        if authorized and \
+                isinstance(method_request.arguments, dict) and \
+                isinstance(method_request.arguments.get("client_ids"), list):
+            client_ids.extend(method_request.arguments["client_ids"])
+    batch_store = BatchStore(store)
+    with deadline.scope(ctx.get("deadline")):
+        batch_store.prefetch(["i:%s" % cid for cid in client_ids
+                              if type(cid) is int])
+    # items past the deadline get 504, the ones before keep their results
+    response = []
+    for item in items:
+        r, code = method_handler(
+            {"body": item, "headers": request["headers"]},
+            {"request_id": ctx["request_id"],
+             "deadline": ctx.get("deadline")}, batch_store)
+        response.append(make_envelope(r, code))
+    ctx["nitems"] = len(items)
+    return response, OK
+
+
+def iter_envelope(code, stream):
+    """The envelope of a streamed response, piece by piece."""
+    pieces = iter(stream)
+    yield '{"code": %s, "response": %s' % (code, next(pieces))
+    for piece in pieces:
+        yield piece
+    yield "}"
+
+
+def make_envelope(response, code):
+    if code not in ERRORS:
+        return {"response": response, "code": code}
+    return {"error": response or ERRORS.get(code, "Unknown Error"),
+            "code": code}
+
+
+def request_deadline(headers, start):
+    """Absolute deadline of a request started at ``start``: the shorter
+    of REQUEST_TIMEOUT and the X-Request-Timeout header (in seconds),
+    None when neither is set."""
+    timeout = REQUEST_TIMEOUT
+    try:
+        asked = float(headers.get(TIMEOUT_HEADER) or 0)
+    except (TypeError, ValueError):
+        asked = 0
+    if asked > 0:
+        timeout = min(timeout, asked) if timeout else asked
+    return start + timeout if timeout else None
+
+
+def admission_key(route, request):
+    """What admission control limits a request by: the method of a
+    /method request, the route otherwise."""
+    if route == "method" and isinstance(request, dict):
+        method = request.get("method")
+        if method in METHOD_HANDLERS:
+            return method
+    return route
+
+
+def parse_settings(values):
+    """{"name": int} of "name=N" option values."""
+    settings = {}
+    for value in values:
+        name, _, number = value.partition("=")
+        try:
+            settings[name.strip()] = int(number)
+        except ValueError:
+            raise ValueError("Expected METHOD=N, got %r" % value)
+    return settings
+
+
+def process_request(router, path, data_string, headers, context, store,
+                    admission=None):
+    """Handle a request. With ``admission`` the handler only runs once
+    admitted, ``context["admitted"]`` is then set to the key the caller
+    must release after sending the response."""
+    start = time.time()
+    if "deadline" not in context:
+        context["deadline"] = request_deadline(headers, start)
+    response, code = {}, OK
+    request = None
+    route = path.strip("/")
+    if route not in router:
+        route = "unknown"
+    try:
+        with PARSE_SECONDS.time():
+            request = fastjson.loads(data_string)
+    except Exception:
+        code = BAD_REQUEST
+
+    if request:
+        if LOG_BODY_RATE >= 1 or random.random() < LOG_BODY_RATE:
+            logging.info("%s: %s %s", path, data_string,
+                         context["request_id"])
+        path = path.strip("/")
+        key = admission_key(path, request)
+        if path not in router:
+            code = NOT_FOUND
+        elif admission is not None and \
+                not admission.admit(key, context["deadline"]):
+            code = SERVICE_UNAVAILABLE
+            context["retry_after"] = admission.retry_after
+        else:
+            if admission is not None:
+                context["admitted"] = key
+            try:
+                response, code = router[path](
+                    {"body": request, "headers": headers}, context, store)
+            except Exception as e:
+                logging.exception("Unexpected error: %s", e)
+                code = INTERNAL_ERROR
+
+    r = make_envelope(response, code)
+    context.update(r)
+    logging.info(context)
+    HTTP_REQUESTS.labels(route, code).inc()
+    HTTP_SECONDS.labels(route).observe(time.time() - start)
+    return r, code
+
+
+def replay_request(item, store):
+    """Handle one (line number, line) of a replayed JSONL stream as a POST
+    to /method, return the response envelope as a JSON line."""
+    n, line = item
+    context = {"request_id": "replay-%s" % n}
+    r, code = process_request({"method": method_handler}, "/method", line,
+                              {}, context, store)
+    return fastjson.dumps(r)
+
+
 class MainHTTPHandler(BaseHTTPRequestHandler):
     router = {
-        "method": method_handler
+        "method": method_handler,
+        "batch": batch_handler
     }
     store = Store()
+    # AdmissionControl shared by the handler threads, None for no limits
+    admission = None
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, don't let Nagle hold
+    # the body back until the client's delayed ACK
+    disable_nagle_algorithm = True
+    # idle keep-alive connections are closed after `timeout` seconds
+    timeout = KEEPALIVE_TIMEOUT
+    max_requests = MAX_KEEPALIVE_REQUESTS
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.requests_served = 0
+        # an idle keep-alive connection blocks a single-threaded server
+        # for the whole timeout, keep connections open only when other
+        # connections are served meanwhile
+        self.keep_alive = getattr(self.server, "concurrent", False)
+
+    def count_request(self):
+        self.requests_served += 1
+        if not self.keep_alive or self.requests_served >= self.max_requests:
+            self.close_connection = 1
 
     def get_request_id(self, headers):
         return headers.get('HTTP_X_REQUEST_ID', uuid.uuid4().hex)
 
     def do_POST(self):
-        response, code = {}, OK
-        context = {"request_id": self.get_request_id(self.headers)}
-        request = None
+        self.count_request()
+        context = {"request_id": self.get_request_id(self.headers),
+                   "stream": self.request_version == "HTTP/1.1"}
         try:
             data_string = self.rfile.read(int(self.headers['Content-Length']))
-            request = json.loads(data_string)
         except Exception:
-            code = BAD_REQUEST
+            # the body can't be skipped, so the connection can't be reused
+            data_string = None
+            self.close_connection = 1
+        try:
+            r, code = process_request(self.router, self.path, data_string,
+                                      self.headers, context, self.store,
+                                      self.admission)
+            if isinstance(r.get("response"), InterestsStream):
+                self.send_chunked(code, iter_envelope(code, r["response"]),
+                                  "application/json")
+                return
+            with SERIALIZE_SECONDS.time():
+                body = fastjson.dumps(r)
+            headers = ()
+            if code == SERVICE_UNAVAILABLE:
+                headers = (("Retry-After", context["retry_after"]),)
+            self.send_body(code, body, "application/json", headers)
+        finally:
+            # a streamed response holds its slot until it is sent
+            if "admitted" in context:
+                self.admission.release(context["admitted"])
+
+    def do_GET(self):
+        self.count_request()
+        if self.path.strip("/") == "metrics":
+            body = metrics.REGISTRY.render() + \
+                metrics.render_stats("store", self.store.stats())
+            if self.admission is not None:
+                body += metrics.render_stats("admission",
+                                             self.admission.stats())
+            self.send_body(OK, body, metrics.CONTENT_TYPE)
+        else:
+            body = fastjson.dumps(make_envelope(None, NOT_FOUND))
+            self.send_body(NOT_FOUND, body, "application/json")
 
-        if request:
-            path = self.path.strip("/")
-            logging.info("%s: %s %s" %
-                         (self.path, data_string, context["request_id"]))
-            if path in self.router:
-                try:
-                    response, code = self.router[path](
-                        {"body": request, "headers": self.headers},
-                        context, self.store)
-                except Exception as e:
-                    logging.exception("Unexpected error: %s" % e)
-                    code = INTERNAL_ERROR
-            else:
-                code = NOT_FOUND
+    def send_body(self, code, body, content_type, headers=()):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", len(body))
+        for name, value in headers:
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
 
+    def send_chunked(self, code, chunks, content_type):
         self.send_response(code)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        if self.close_connection:
+            self.send_header("Connection", "close")
         self.end_headers()
-        if code not in ERRORS:
-            r = {"response": response, "code": code}
-        else:
-            r = {"error": response or ERRORS.get(
-                code, "Unknown Error"), "code": code}
-        context.update(r)
-        logging.info(context)
-        self.wfile.write(json.dumps(r))
-        return
+        try:
+            for chunk in chunks:
+                if chunk:
+                    self.wfile.write("%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write("0\r\n\r\n")
+        except Exception:
+            # the code is already sent, a body cut short without its last
+            # chunk tells the client the response is incomplete
+            logging.exception("Streaming response failed")
+            self.close_connection = 1
 
 
 if __name__ == "__main__":
     op = OptionParser()
     op.add_option("-p", "--port", action="store", type=int, default=8080)
     op.add_option("-l", "--log", action="store", default=None)
+    op.add_option("--log-async", action="store_true", default=False)
+    op.add_option("--log-queue-size", action="store", type=int,
+                  default=QUEUE_SIZE)
+    op.add_option("--log-format", action="store", type="choice",
+                  choices=FORMATS, default=TEXT)
+    op.add_option("--log-body-rate", action="store", type=float,
+                  default=LOG_BODY_RATE)
+    op.add_option("--request-timeout", action="store", type=float,
+                  default=REQUEST_TIMEOUT,
+                  help="seconds, 0 for no limit")
+    op.add_option("--store", action="store", type="choice",
+                  choices=BACKENDS, default=TARANTOOL)
+    op.add_option("--store-host", action="store", default=HOST)
+    op.add_option("--store-port", action="store", type=int, default=None,
+                  help="defaults to the backend's standard port")
+    op.add_option("--memory-interests", action="store", default=None,
+                  help="JSON or JSONL file of {cid: [interests]} for the "
+                       "memory store")
+    op.add_option("--stream-threshold", action="store", type=int,
+                  default=STREAM_THRESHOLD,
+                  help="stream clients_interests responses for more ids, "
+                       "0 disables streaming")
+    op.add_option("--stream-batch-size", action="store", type=int,
+                  default=STREAM_BATCH_SIZE)
+    op.add_option("--pool-size", action="store", type=int, default=4)
+    op.add_option("--chunk-size", action="store", type=int, default=100)
+    op.add_option("--breaker-threshold", action="store", type=int,
+                  default=FAILURE_THRESHOLD)
+    op.add_option("--breaker-timeout", action="store", type=float,
+                  default=RESET_TIMEOUT)
+    op.add_option("--negative-ttl", action="store", type=int,
+                  default=NEGATIVE_TTL)
+    op.add_option("--l1-cache-size", action="store", type=int, default=0)
+    op.add_option("--l1-cache-ttl", action="store", type=int, default=60 * 60)
+    op.add_option("--l1-fill-ttl", action="store", type=int,
+                  default=FILL_TTL,
+                  help="L1 lifetime of values read from the store")
+    op.add_option("--write-behind", action="store_true", default=False)
+    op.add_option("--flush-interval", action="store", type=float,
+                  default=0.1)
+    op.add_option("--flush-size", action="store", type=int, default=100)
+    op.add_option("--write-queue-size", action="store", type=int,
+                  default=10000)
+    op.add_option("--write-policy", action="store", type="choice",
+                  choices=POLICIES, default=DROP)
+    op.add_option("--keepalive-timeout", action="store", type=float,
+                  default=KEEPALIVE_TIMEOUT)
+    op.add_option("--max-keepalive-requests", action="store", type=int,
+                  default=MAX_KEEPALIVE_REQUESTS)
+    op.add_option("-w", "--workers", action="store", type=int, default=1)
+    op.add_option("--mode", action="store", type="choice",
+                  choices=server.MODES, default=server.THREAD)
+    op.add_option("--replay", action="store", default=None,
+                  help="handle method requests from a JSONL file "
+                       "(- for stdin) instead of serving HTTP")
+    op.add_option("--replay-output", action="store", default="-")
+    op.add_option("--max-inflight", action="store", type=int,
+                  default=MAX_INFLIGHT,
+                  help="requests handled at once, 0 for no limit")
+    op.add_option("--queue-depth", action="store", type=int,
+                  default=QUEUE_DEPTH,
+                  help="requests waiting for a slot, the rest get a 503")
+    op.add_option("--queue-timeout", action="store", type=float,
+                  default=QUEUE_TIMEOUT)
+    op.add_option("--retry-after", action="store", type=int,
+                  default=RETRY_AFTER)
+    op.add_option("--method-limit", action="append", default=[],
+                  metavar="METHOD=N",
+                  help="requests of a method (or route) handled or waiting "
+                       "at once, may be repeated")
+    op.add_option("--method-priority", action="append", default=[],
+                  metavar="METHOD=N",
+                  help="priority for a freed slot, may be repeated")
+    op.add_option("--warmup", action="store", default=None,
+                  help="load the scores of a JSONL or CSV dump of "
+                       "online_score arguments before serving")
+    op.add_option("--warmup-target", action="store", type="choice",
+                  choices=warmup.TARGETS, default=warmup.BOTH,
+                  help="the store, the L1 cache or both")
+    op.add_option("--warmup-workers", action="store", type=int,
+                  default=warmup.WORKERS)
+    op.add_option("--warmup-rate", action="store", type=float,
+                  default=warmup.RATE,
+                  help="store writes, records per second, 0 for no limit")
     (opts, args) = op.parse_args()
-    logging.basicConfig(filename=opts.log, level=logging.INFO,
-                        format='[%(asctime)s] %(levelname).1s %(message)s',
-                        datefmt='%Y.%m.%d %H:%M:%S')
-    server = HTTPServer(("localhost", opts.port), MainHTTPHandler)
-    logging.info("Starting server at %s" % opts.port)
+    setup_logging(opts.log, queued=opts.log_async, fmt=opts.log_format,
+                  queue_size=opts.log_queue_size)
+    LOG_BODY_RATE = opts.log_body_rate
+    REQUEST_TIMEOUT = opts.request_timeout
+    STREAM_THRESHOLD = opts.stream_threshold
+    STREAM_BATCH_SIZE = opts.stream_batch_size
+
+    MainHTTPHandler.timeout = opts.keepalive_timeout
+    MainHTTPHandler.max_requests = opts.max_keepalive_requests
     try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        pass
-    server.server_close()
+        limits = parse_settings(opts.method_limit)
+        priorities = parse_settings(opts.method_priority)
+    except ValueError as e:
+        op.error(str(e))
+    memory_interests = None
+    if opts.memory_interests:
+        if opts.store != MEMORY:
+            op.error("--memory-interests needs --store %s" % MEMORY)
+        try:
+            with open(opts.memory_interests) as src:
+                memory_interests = read_interests(src)
+        except (IOError, ValueError) as e:
+            op.error("--memory-interests: %s" % e)
+        logging.info("Loaded interests of %s clients" %
+                     len(memory_interests))
+    if opts.max_inflight or limits:
+        MainHTTPHandler.admission = AdmissionControl(
+            opts.max_inflight, queue_depth=opts.queue_depth,
+            queue_timeout=opts.queue_timeout, limits=limits,
+            priorities=priorities, retry_after=opts.retry_after)
+
+    def open_store(pool_size):
+        store = make_store(opts.store, opts.store_host, opts.store_port,
+                           pool_size=pool_size,
+                           chunk_size=opts.chunk_size,
+                           breaker_threshold=opts.breaker_threshold,
+                           breaker_timeout=opts.breaker_timeout,
+                           negative_ttl=opts.negative_ttl,
+                           interests=memory_interests)
+        store.connect()
+        return store
+
+    def warm_up(store=None, cache=None, ttl=scoring.SCORE_TTL):
+        # best effort, the server starts with a cold cache on errors;
+        # only store writes are rate limited
+        rate = opts.warmup_rate if store is not None else 0
+        try:
+            with open(opts.warmup) as src:
+                warmup.warm(src, store, cache,
+                            fmt=warmup.guess_format(opts.warmup), ttl=ttl,
+                            workers=opts.warmup_workers, rate=rate,
+                            chunk_size=opts.chunk_size)
+        except Exception:
+            logging.exception("Warm-up failed")
+
+    # a shared store is warmed once, in-process caches by every worker
+    warm_store = opts.warmup and opts.warmup_target != warmup.L1
+    warm_l1 = opts.warmup and opts.warmup_target != warmup.STORE
+
+    def init_store():
+        store = open_store(max(opts.pool_size, opts.workers))
+        if warm_store and opts.store == MEMORY:
+            warm_up(store=store)
+        if opts.write_behind:
+            store = WriteBehindStore(store,
+                                     flush_interval=opts.flush_interval,
+                                     flush_size=opts.flush_size,
+                                     queue_size=opts.write_queue_size,
+                                     policy=opts.write_policy)
+        if opts.l1_cache_size:
+            cache = LRUCache(opts.l1_cache_size)
+            if warm_l1:
+                warm_up(cache=cache,
+                        ttl=min(scoring.SCORE_TTL, opts.l1_cache_ttl))
+            store = CachedStore(store, cache, ttl=opts.l1_cache_ttl,
+                                fill_ttl=opts.l1_fill_ttl)
+        MainHTTPHandler.store = store
+
+    def close_store():
+        MainHTTPHandler.store.close()
+
+    if warm_store and opts.store != MEMORY:
+        store = open_store(max(opts.pool_size, opts.warmup_workers))
+        warm_up(store=store)
+        store.close()
+
+    if opts.replay:
+        init_store()
+        src = sys.stdin if opts.replay == "-" else open(opts.replay)
+        dst = sys.stdout if opts.replay_output == "-" else \
+            open(opts.replay_output, "w")
+        start = time.time()
+        total = replay.replay(
+            src, dst, lambda item: replay_request(item, MainHTTPHandler.store),
+            workers=opts.workers)
+        logging.info("Replayed %s requests in %.2fs" %
+                     (total, time.time() - start))
+        close_store()
+        sys.exit(0)
+
+    httpd = server.make_server(("localhost", opts.port), MainHTTPHandler,
+                               workers=opts.workers, mode=opts.mode,
+                               init_worker=init_store,
+                               close_worker=close_store)
+    logging.info("Starting server at %s" % opts.port)
+    server.serve(httpd, close_worker=close_store)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import socket
+import signal
+import asyncore
+import asynchat
+import logging
+import mimetools
+from collections import deque
+from StringIO import StringIO
+from optparse import OptionParser
+from multiprocessing.pool import ThreadPool
+import api
+import fastjson
+import metrics
+from async_store import EventLoop, AsyncStore
+from asynclog import setup_logging, FORMATS, TEXT, QUEUE_SIZE
+
+WORKERS = 8
+MAX_HEADERS_SIZE = 65536
+MAX_PIPELINE = 16
+
+
+class HTTPChannel(asynchat.async_chat):
+    """One client connection. Requests are read by the event loop and
+    handed to the worker pool one at a time, so keep-alive clients cost
+    a socket, not a thread, while they are idle."""
+
+    def __init__(self, server, sock, addr):
+        asynchat.async_chat.__init__(self, sock, map=server.loop.map)
+        self.server = server
+        self.addr = addr
+        self.busy = False
+        self.queue = deque()
+        self.reset()
+
+    def reset(self):
+        self.data = []
+        self.request_line = None
+        self.headers = None
+        self.set_terminator("\r\n\r\n")
+
+    def readable(self):
+        return len(self.queue) < MAX_PIPELINE and \
+            asynchat.async_chat.readable(self)
+
+    def collect_incoming_data(self, data):
+        self.data.append(data)
+        if self.headers is None and sum(map(len, self.data)) > \
+                MAX_HEADERS_SIZE:
+            self.close()
+
+    def found_terminator(self):
+        data, self.data = "".join(self.data), []
+        if self.headers is None:
+            lines = data.lstrip("\r\n").split("\r\n", 1)
+            self.request_line = lines[0]
+            self.headers = mimetools.Message(
+                StringIO(lines[1] if len(lines) > 1 else ""))
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.set_terminator(length)
+                return
+        self.queue.append((self.request_line, self.headers, data))
+        self.reset()
+        self.dispatch_next()
+
+    def dispatch_next(self):
+        # pipelined requests are answered strictly in order
+        if not self.busy and self.queue:
+            self.busy = True
+            self.server.dispatch(self, *self.queue.popleft())
+
+    def respond(self, status, body, content_type, keep_alive):
+        head = ["HTTP/1.1 %s %s" % (status, api.ERRORS.get(status, "OK")),
+                "Content-Type: %s" % content_type,
+                "Content-Length: %s" % len(body),
+                "Connection: %s" % ("keep-alive" if keep_alive else "close")]
+        self.push("\r\n".join(head) + "\r\n\r\n" + body)
+        if keep_alive:
+            self.busy = False
+            self.dispatch_next()
+        else:
+            self.close_when_done()
+
+
+class AsyncHTTPServer(asyncore.dispatcher):
+    """Serves the ``api.MainHTTPHandler.router`` routes on an asyncore
+    event loop. Sockets are multiplexed by the loop, request handling
+    runs in a small thread pool and store calls go through AsyncStore."""
+
+    router = api.MainHTTPHandler.router
+
+    def __init__(self, server_address, loop, store, workers=WORKERS):
+        asyncore.dispatcher.__init__(self, map=loop.map)
+        self.loop = loop
+        self.store = store
+        self.pool = ThreadPool(workers)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(server_address)
+        self.listen(128)
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            HTTPChannel(self, *pair)
+
+    def dispatch(self, channel, request_line, headers, data):
+        def done(result):
+            self.loop.call_soon_threadsafe(channel.respond, *result)
+        self.pool.apply_async(self.process,
+                              (request_line, headers, data), callback=done)
+
+    def process(self, request_line, headers, data):
+        try:
+            method, path, version = request_line.split()
+        except ValueError:
+            r = api.make_envelope(None, api.BAD_REQUEST)
+            return api.BAD_REQUEST, fastjson.dumps(r), "application/json", False
+        connection = headers.get("Connection", "").lower()
+        if version == "HTTP/1.0":
+            keep_alive = connection == "keep-alive"
+        else:
+            keep_alive = connection != "close"
+        if method == "GET" and path.strip("/") == "metrics":
+            body = metrics.REGISTRY.render()
+            return api.OK, body, metrics.CONTENT_TYPE, keep_alive
+        context = {"request_id": headers.get("HTTP_X_REQUEST_ID") or
+                   api.uuid.uuid4().hex}
+        try:
+            r, code = api.process_request(self.router, path, data, headers,
+                                          context, self.store)
+        except Exception:
+            logging.exception("Unexpected error")
+            code = api.INTERNAL_ERROR
+            r = api.make_envelope(None, code)
+        # serialize in the worker thread, off the event loop
+        with api.SERIALIZE_SECONDS.time():
+            body = fastjson.dumps(r)
+        return code, body, "application/json", keep_alive
+
+    def close(self):
+        asyncore.dispatcher.close(self)
+        self.pool.close()
+        self.pool.join()
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("-p", "--port", action="store", type=int, default=8080)
+    op.add_option("-l", "--log", action="store", default=None)
+    op.add_option("--log-async", action="store_true", default=False)
+    op.add_option("--log-queue-size", action="store", type=int,
+                  default=QUEUE_SIZE)
+    op.add_option("--log-format", action="store", type="choice",
+                  choices=FORMATS, default=TEXT)
+    op.add_option("--log-body-rate", action="store", type=float,
+                  default=api.LOG_BODY_RATE)
+    op.add_option("--request-timeout", action="store", type=float,
+                  default=api.REQUEST_TIMEOUT,
+                  help="seconds, 0 for no limit")
+    op.add_option("-w", "--workers", action="store", type=int,
+                  default=WORKERS)
+    op.add_option("--connections", action="store", type=int, default=2)
+    op.add_option("--chunk-size", action="store", type=int, default=100)
+    (opts, args) = op.parse_args()
+    setup_logging(opts.log, queued=opts.log_async, fmt=opts.log_format,
+                  queue_size=opts.log_queue_size)
+    api.LOG_BODY_RATE = opts.log_body_rate
+    api.REQUEST_TIMEOUT = opts.request_timeout
+    loop = EventLoop()
+    store = AsyncStore(loop=loop, connections=opts.connections,
+                       chunk_size=opts.chunk_size)
+    server = AsyncHTTPServer(("localhost", opts.port), loop, store,
+                             workers=opts.workers)
+    signal.signal(signal.SIGTERM, lambda *args: loop.stop())
+    logging.info("Starting async server at %s" % opts.port)
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
+    server.close()
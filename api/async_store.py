@@ -0,0 +1,348 @@
+import os
+import sys
+import time
+import socket
+import asyncore
+import logging
+import threading
+import itertools
+from collections import deque
+import tarantool
+import iproto
+import deadline
+from deadline import DeadlineExceeded
+from store import HOST, PORT, SOCKET_TIMEOUT, CHUNK_SIZE, STORE_SECONDS, \
+    STORE_ERRORS, BaseStore
+
+CONNECTIONS = 2
+RECONNECT_DELAY = 0.5
+
+
+class Future(object):
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def set_exception(self, error):
+        self._error = error
+        self._event.set()
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise tarantool.NetworkError("Store request timed out")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class Waker(asyncore.file_dispatcher):
+    """Self-pipe used to interrupt select() when another thread schedules
+    work on the event loop."""
+
+    def __init__(self, map):
+        self.r, self.w = os.pipe()
+        asyncore.file_dispatcher.__init__(self, self.r, map=map)
+
+    def wake(self):
+        try:
+            os.write(self.w, "x")
+        except OSError:
+            pass
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            self.recv(4096)
+        except socket.error:
+            pass
+
+
+class EventLoop(object):
+    """asyncore loop running in its own thread with a thread-safe
+    ``call_soon_threadsafe`` for scheduling callbacks into it."""
+
+    def __init__(self, timeout=1):
+        self.map = {}
+        self.timeout = timeout
+        self.running = False
+        self.thread = None
+        self._calls = deque()
+        self._waker = Waker(self.map)
+
+    def call_soon_threadsafe(self, fn, *args):
+        self._calls.append((fn, args))
+        self._waker.wake()
+
+    def run_once(self):
+        asyncore.loop(timeout=self.timeout, map=self.map, count=1)
+        while self._calls:
+            fn, args = self._calls.popleft()
+            try:
+                fn(*args)
+            except Exception:
+                logging.exception("Event loop callback failed")
+
+    def run(self):
+        self.running = True
+        while self.running:
+            self.run_once()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="event-loop")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        def stop():
+            self.running = False
+        self.call_soon_threadsafe(stop)
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+class IprotoConnection(asyncore.dispatcher):
+    """Single Tarantool connection multiplexing any number of in-flight
+    requests, matched to their responses by the iproto sync id."""
+
+    def __init__(self, map):
+        asyncore.dispatcher.__init__(self, map=map)
+        self.pending = {}
+        self.ready = False
+        self.closed = False
+        self.out = ""
+        self.buf = ""
+
+    def open(self, host, port):
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_TCP, socket.TCP_NODELAY, 1)
+        self.connect((host, port))
+
+    def send_request(self, sync, code, body, future):
+        self.pending[sync] = future
+        self.out += iproto.pack_request(code, sync, body)
+
+    def writable(self):
+        return not self.connected or (self.ready and bool(self.out))
+
+    def handle_connect(self):
+        pass
+
+    def handle_write(self):
+        sent = self.send(self.out)
+        self.out = self.out[sent:]
+
+    def handle_read(self):
+        data = self.recv(65536)
+        if not data:
+            return
+        self.buf += data
+        if not self.ready:
+            if len(self.buf) < iproto.GREETING_SIZE:
+                return
+            self.buf = self.buf[iproto.GREETING_SIZE:]
+            self.ready = True
+        packets, self.buf = iproto.unpack_packets(self.buf)
+        for header, body in packets:
+            future = self.pending.pop(header.get(iproto.SYNC), None)
+            if future is None:
+                continue
+            if header.get(iproto.CODE) == iproto.REQUEST_OK:
+                future.set_result(body.get(iproto.DATA, []))
+            else:
+                future.set_exception(tarantool.DatabaseError(
+                    header.get(iproto.CODE) & ~iproto.REQUEST_ERROR,
+                    body.get(iproto.ERROR)))
+
+    def handle_close(self):
+        self.close()
+
+    def handle_error(self):
+        logging.warning("Store connection error: %s" % sys.exc_info()[1])
+        self.close()
+
+    def close(self):
+        self.closed = True
+        asyncore.dispatcher.close(self)
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(tarantool.NetworkError("Store disconnected"))
+
+
+class AsyncStore(BaseStore):
+    """Store with the same interface as ``store.Store`` backed by a few
+    pipelined connections driven by an event loop.
+
+    Calls may come from any thread: requests are handed to the loop and
+    the caller only waits for its own future, so ``get_many`` can keep
+    every chunk in flight at once instead of issuing them one by one.
+    """
+
+    def __init__(self, loop=None, log=True, host=HOST, port=PORT,
+                 connections=CONNECTIONS, socket_timeout=SOCKET_TIMEOUT,
+                 chunk_size=CHUNK_SIZE):
+        self.loop = loop or EventLoop().start()
+        self.host = host
+        self.port = port
+        self.socket_timeout = socket_timeout
+        self.chunk_size = chunk_size
+        self.log = log
+        self.connections = [None] * connections
+        self._sync = itertools.count(1)
+        self._next = itertools.cycle(range(connections))
+        self._retry_at = 0
+
+    def _connection(self):
+        # runs in the loop thread
+        i = next(self._next)
+        conn = self.connections[i]
+        if conn is not None and not conn.closed:
+            return conn
+        if time.time() < self._retry_at:
+            raise tarantool.NetworkError("Store reconnect backoff")
+        conn = IprotoConnection(self.loop.map)
+        try:
+            conn.open(self.host, self.port)
+        except Exception as e:
+            conn.close()
+            self._retry_at = time.time() + RECONNECT_DELAY
+            raise tarantool.NetworkError(e)
+        self.connections[i] = conn
+        return conn
+
+    def _send(self, code, body, future):
+        try:
+            self._connection().send_request(next(self._sync), code, body,
+                                             future)
+        except Exception as e:
+            future.set_exception(e)
+
+    def call_async(self, func_name, *args):
+        future = Future()
+        body = {iproto.FUNCTION_NAME: func_name, iproto.TUPLE: list(args)}
+        self.loop.call_soon_threadsafe(self._send, iproto.REQUEST_CALL,
+                                       body, future)
+        return future
+
+    def _result(self, future):
+        start = time.time()
+        try:
+            return future.result(deadline.remaining(self.socket_timeout))
+        except DeadlineExceeded:
+            STORE_ERRORS.labels("deadline").inc()
+            raise
+        except (tarantool.NetworkError, socket.error):
+            if deadline.expired():
+                STORE_ERRORS.labels("deadline").inc()
+                raise DeadlineExceeded("Request deadline exceeded")
+            STORE_ERRORS.labels("network").inc()
+            raise
+        except tarantool.Error:
+            STORE_ERRORS.labels("database").inc()
+            raise
+        finally:
+            STORE_SECONDS.observe(time.time() - start)
+
+    def call(self, func_name, *args):
+        return self._result(self.call_async(func_name, *args))
+
+    def connect(self):
+        try:
+            self.call("box.info")
+        except tarantool.Error:
+            if self.log:
+                logging.warning("Store not connected!")
+            return False
+        return True
+
+    def close(self):
+        def close():
+            for conn in self.connections:
+                if conn is not None:
+                    conn.close()
+        self.loop.call_soon_threadsafe(close)
+
+    def disconnect(self):
+        self.port = 100000
+        self.close()
+
+    def _interests(self, tt_value):
+        return list(tt_value)
+
+    def get(self, cid):
+        tt_int = self.call("get_interests", cid)
+        if not tt_int or tt_int[0] is None:
+            return None
+        return self._interests(tt_int[0])
+
+    def get_many(self, cids, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        futures = [self.call_async("get_interests_many",
+                                   list(cids[i:i + chunk_size]))
+                   for i in range(0, len(cids), chunk_size)]
+        result = []
+        for future in futures:
+            tt_int = self._result(future)
+            result.extend(self._interests(v) if v else None
+                          for v in tt_int[0])
+        return result
+
+    def cache_get(self, uid):
+        try:
+            tt_score = self.call("cache_get_score", uid)
+        except tarantool.Error:
+            return None
+        if tt_score and tt_score[0]:
+            return float("%.1f" % tt_score[0])
+        return None
+
+    def cache_get_many(self, uids, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        futures = [self.call_async("cache_get_score_many",
+                                   list(uids[i:i + chunk_size]))
+                   for i in range(0, len(uids), chunk_size)]
+        result = []
+        try:
+            for future in futures:
+                tt_scores = self._result(future)
+                result.extend(float("%.1f" % s) if s else None
+                              for s in tt_scores[0])
+        except tarantool.Error:
+            return [None] * len(uids)
+        return result
+
+    def cache_set(self, *args):
+        try:
+            return self.call("cache_set_score", args[0], args[1], args[2])
+        except tarantool.Error:
+            if self.log:
+                logging.warning("Store error!")
+            return None
+
+    def cache_set_many(self, items, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        futures = [self.call_async("cache_set_score_many",
+                                   [list(item) for item in
+                                    items[i:i + chunk_size]])
+                   for i in range(0, len(items), chunk_size)]
+        for future in futures:
+            self._result(future)
+        return len(items)
+
+    def cache_delete(self, uid):
+        try:
+            self.call("box.space.score:delete", uid.split(":", 1)[-1])
+        except tarantool.NetworkError:
+            if self.log:
+                logging.warning("Store not connected!")
+        return self
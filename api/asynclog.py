@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+import metrics
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 0.5
+TEXT = "text"
+JSON = "json"
+FORMATS = (TEXT, JSON)
+TEXT_FORMAT = "[%(asctime)s] %(levelname).1s %(message)s"
+DATE_FORMAT = "%Y.%m.%d %H:%M:%S"
+
+DROPPED = metrics.counter("log_records_dropped",
+                          "Log records dropped on a full log queue.")
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line. Dict messages, e.g. the request context,
+    are merged into the object instead of being rendered as a string.
+    """
+
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+        }
+        if isinstance(record.msg, dict) and not record.args:
+            data.update(record.msg)
+        else:
+            data["msg"] = record.getMessage()
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class QueueHandler(logging.Handler):
+    """Hands records to a background thread writing them to ``handler``.
+
+    ``emit`` only appends the record to a bounded deque, so formatting
+    and disk I/O happen off the request path. When the writer can't keep
+    up, the oldest records are dropped and counted. The writer drains up
+    to ``batch_size`` records at a time and writes them with a single
+    call. The thread is started lazily in the process that logs, so the
+    handler survives a fork of prefork workers.
+    """
+
+    def __init__(self, handler, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        logging.Handler.__init__(self)
+        self.handler = handler
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._pid = None
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._queue = deque(maxlen=self.queue_size)
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._queue) == self.queue_size:
+            self.dropped += 1
+            DROPPED.inc()
+        self._queue.append(record)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _write(self):
+        lines = []
+        queue = self._queue
+        while queue and len(lines) < self.batch_size:
+            record = queue.popleft()
+            try:
+                lines.append(self.handler.format(record))
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return False
+        stream = self.handler.stream
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+        return True
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                while self._write():
+                    pass
+            except Exception:
+                # never let a full disk or closed stream kill the writer
+                time.sleep(self.flush_interval)
+
+    def flush(self):
+        if self._pid == os.getpid():
+            while self._write():
+                pass
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._pid == os.getpid():
+            self._thread.join(self.flush_interval * 2)
+        self.flush()
+        self.handler.close()
+        logging.Handler.close(self)
+
+    def stats(self):
+        return {"queued": len(self._queue), "dropped": self.dropped}
+
+
+def setup_logging(filename=None, queued=False, fmt=TEXT,
+                  queue_size=QUEUE_SIZE, level=logging.INFO):
+    if filename:
+        handler = logging.FileHandler(filename)
+    else:
+        handler = logging.StreamHandler()
+    if fmt == JSON:
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+    if queued:
+        handler = QueueHandler(handler, queue_size=queue_size)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
@@ -0,0 +1,20 @@
+import store
+from memory_store import MemoryStore
+from redis_store import RedisStore, PORT as REDIS_PORT
+
+TARANTOOL = "tarantool"
+MEMORY = "memory"
+REDIS = "redis"
+BACKENDS = (TARANTOOL, MEMORY, REDIS)
+
+
+def make_store(backend=TARANTOOL, host=store.HOST, port=None, **kwargs):
+    """Create a store of the ``backend`` kind. ``interests`` only apply
+    to the memory backend, other ``kwargs`` (pool, breaker and chunk
+    settings) only to the network ones."""
+    interests = kwargs.pop("interests", None)
+    if backend == MEMORY:
+        return MemoryStore(log=kwargs.get("log", True), interests=interests)
+    if backend == REDIS:
+        return RedisStore(host=host, port=port or REDIS_PORT, **kwargs)
+    return store.Store(host=host, port=port or store.PORT, **kwargs)
@@ -0,0 +1,58 @@
+class BatchStore(object):
+    """Store view shared by all items of one batch request.
+
+    Interests of every client id in the batch are fetched up front with a
+    single ``get_many`` and score cache reads and writes are memoized, so
+    items repeating a uid: key or overlapping client ids cost one store
+    round trip between them.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._interests = {}
+        self._scores = {}
+        self._error = None
+        self._failed = set()
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def prefetch(self, keys):
+        missing = [k for k in set(keys) if k not in self._interests]
+        if not missing:
+            return
+        try:
+            values = self.store.get_many(missing)
+        except Exception as e:
+            # every item asking for these keys fails with the same error
+            self._error = e
+            self._failed.update(missing)
+            return
+        self._interests.update(zip(missing, values))
+
+    def _check(self, keys):
+        if self._error is not None and not self._failed.isdisjoint(keys):
+            raise self._error
+
+    def get(self, key):
+        self._check((key,))
+        if key not in self._interests:
+            self._interests[key] = self.store.get(key)
+        return self._interests[key]
+
+    def get_many(self, keys, chunk_size=None):
+        self._check(keys)
+        self.prefetch(keys)
+        self._check(keys)
+        return [self._interests[k] for k in keys]
+
+    def cache_get(self, key):
+        if key not in self._scores:
+            self._scores[key] = self.store.cache_get(key)
+        return self._scores[key]
+
+    def cache_set(self, key, value, ttl):
+        if self._scores.get(key) == value:
+            return True
+        self._scores[key] = value
+        return self.store.cache_set(key, value, ttl)
@@ -0,0 +1,100 @@
+import time
+import logging
+import threading
+import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 5
+
+TRANSITIONS = metrics.counter("circuit_breaker_transitions",
+                              "Circuit breaker state changes by new state.",
+                              labels=("name", "state"))
+
+
+class CircuitBreaker(object):
+    """Fails calls fast while a dependency is down.
+
+    Closed: calls go through, ``failure_threshold`` consecutive failures
+    open the circuit. Open: ``allow`` refuses every call for
+    ``reset_timeout`` seconds. Half-open: a single probe call is let
+    through, its success closes the circuit and its failure opens it
+    again. Every allowed call must be followed by ``success``,
+    ``failure`` or, when it says nothing about the dependency, ``release``.
+    A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, name="store", failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._open_until = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        # called with the lock held
+        if state == self.state:
+            return
+        self.state = state
+        TRANSITIONS.labels(self.name, state).inc()
+        if state == OPEN:
+            self.opened += 1
+            self._open_until = time.time() + self.reset_timeout
+            logging.warning("Circuit breaker %s open for %ss after %s "
+                            "failures", self.name, self.reset_timeout,
+                            self.failures)
+        else:
+            logging.warning("Circuit breaker %s %s", self.name, state)
+
+    def allow(self):
+        if self.state == CLOSED:
+            return True
+        with self._lock:
+            if self.state == OPEN and time.time() >= self._open_until:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            if self.state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def success(self):
+        if self.state == CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if not self.failure_threshold:
+                return
+            if self.state == HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                self._set_state(OPEN)
+
+    def release(self):
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        return {
+            "state": STATES[self.state],
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Offline scoring of large customer dumps.
+
+Streams records from a JSONL or CSV file (or stdin) with the
+online_score arguments (phone, email, birthday, gender, first_name,
+last_name and an optional id), scores them in chunks with
+``scoring.get_scores`` and writes one {"id", "score"} JSON line or
+``id,score`` CSV row (for a .csv output) per record, in input order:
+
+    $ python2 bulk_score.py -i customers.csv -o scores.csv
+"""
+
+import sys
+import csv
+import time
+import logging
+import datetime
+# strptime imports it lazily and the import races between threads
+import _strptime  # noqa: F401
+import itertools
+from optparse import OptionParser
+import scoring
+from scoring import GENDERS
+import fastjson
+from store import Store, CHUNK_SIZE
+
+JSONL = "jsonl"
+CSV = "csv"
+FORMATS = (JSONL, CSV)
+BATCH_SIZE = 10000
+FIELDS = ("phone", "email", "birthday", "gender", "first_name", "last_name")
+# JSON genders are ints, CSV ones strings
+GENDER_NAMES = dict([(g, name) for g, name in GENDERS.items()] +
+                    [(str(g), name) for g, name in GENDERS.items()])
+# what converting a record to columns raises for invalid values
+INVALID_RECORD = (ValueError, TypeError, AttributeError)
+
+
+def parse_line(line):
+    # a malformed line is kept as is and rejected as not an object
+    try:
+        return fastjson.loads(line)
+    except ValueError:
+        return line
+
+
+def read_batches(stream, fmt, batch_size):
+    """Yield lists of records, CSV records are lists of values and JSON
+    ones dicts. The first item is the list of CSV columns (or None).
+    """
+    if fmt == CSV:
+        reader = csv.reader(stream)
+        header = next(reader, [])
+    else:
+        reader = (parse_line(line) for line in stream if line.strip())
+        header = None
+    yield header
+    while True:
+        batch = list(itertools.islice(reader, batch_size))
+        if not batch:
+            break
+        yield batch
+
+
+def get_column(batch, header, field):
+    if header is None:
+        return [r.get(field) for r in batch]
+    if field not in header:
+        return None
+    i = header.index(field)
+    try:
+        return [r[i] for r in batch]
+    except IndexError:
+        # short rows are missing their trailing values
+        return [r[i] if len(r) > i else None for r in batch]
+
+
+def to_columns(batch, header, dates):
+    """Turn a batch of records into the columns ``get_scores`` takes,
+    converting values column by column the way ``online_score_handler``
+    does. ``dates`` memoizes birthday parsing across batches.
+    """
+    phones, emails, birthdays, genders, first_names, last_names = [
+        get_column(batch, header, field) for field in FIELDS]
+    if phones is not None:
+        phones = [str(p) if p or p == 0 else None for p in phones]
+    if birthdays is not None:
+        for b in birthdays:
+            if b not in dates:
+                dates[b] = datetime.datetime.strptime(b, "%d.%m.%Y") \
+                    if b else None
+        birthdays = [dates[b] for b in birthdays]
+    if genders is not None:
+        genders = [GENDER_NAMES.get(g) for g in genders]
+    emails, first_names, last_names = [
+        [v.encode("utf-8") if type(v) is unicode else v or None
+         for v in column] if column is not None else None
+        for column in (emails, first_names, last_names)]
+    for column in (emails, first_names, last_names):
+        if column is not None:
+            # raises TypeError on a value that isn't a string
+            "".join(filter(None, column))
+    return phones, emails, birthdays, genders, first_names, last_names
+
+
+def check_record(record, header, dates):
+    if header is None and type(record) is not dict:
+        raise ValueError("not a JSON object")
+    to_columns([record], header, dates)
+
+
+def to_valid_columns(batch, header, dates):
+    """``to_columns`` skipping the invalid records of ``batch``. Returns
+    the columns, the valid records and (index in ``batch``, error)
+    pairs of the invalid ones. Records are only checked one by one
+    when converting the whole batch fails.
+    """
+    try:
+        return to_columns(batch, header, dates), batch, []
+    except INVALID_RECORD:
+        pass
+    valid = []
+    invalid = []
+    for n, record in enumerate(batch):
+        try:
+            check_record(record, header, dates)
+        except INVALID_RECORD as e:
+            invalid.append((n, e))
+        else:
+            valid.append(record)
+    return to_columns(valid, header, dates), valid, invalid
+
+
+def log_invalid(invalid, offset):
+    for n, error in invalid:
+        logging.warning("Record %s skipped: %s" % (offset + n + 1, error))
+
+
+def write_scores(stream, fmt, ids, scores):
+    if fmt == CSV:
+        stream.write("".join("%s,%s\n" % (i, s) for i, s in zip(ids, scores)))
+    else:
+        stream.write("".join('{"id": %s, "score": %s}\n' % (
+            i if type(i) is int else fastjson.dumps(i), s)
+            for i, s in zip(ids, scores)))
+
+
+def score_stream(src, dst, store, fmt=JSONL, out_fmt=None,
+                 batch_size=BATCH_SIZE, chunk_size=None):
+    """Score every record of ``src`` into ``dst``, holding at most
+    ``batch_size`` records in memory. Returns the number of records read
+    and of the invalid ones skipped.
+    """
+    batches = read_batches(src, fmt, batch_size)
+    header = next(batches)
+    dates = {}
+    total = skipped = 0
+    for batch in batches:
+        columns, valid, invalid = to_valid_columns(batch, header, dates)
+        log_invalid(invalid, total)
+        # records without an id are numbered by their input position
+        positions = range(1, len(batch) + 1)
+        if invalid:
+            skip = set(n for n, _ in invalid)
+            positions = [n + 1 for n in range(len(batch)) if n not in skip]
+        ids = get_column(valid, header, "id") or [None] * len(valid)
+        ids = [i if i is not None else total + n
+               for n, i in zip(positions, ids)]
+        scores = scoring.get_scores(store, *columns, chunk_size=chunk_size)
+        write_scores(dst, out_fmt or fmt, ids, scores)
+        total += len(batch)
+        skipped += len(invalid)
+    return total, skipped
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("-i", "--input", action="store", default="-")
+    op.add_option("-o", "--output", action="store", default="-")
+    op.add_option("--format", action="store", type="choice",
+                  choices=FORMATS, default=None,
+                  help="input format, guessed from the file name")
+    op.add_option("--batch-size", action="store", type=int,
+                  default=BATCH_SIZE)
+    op.add_option("--chunk-size", action="store", type=int,
+                  default=CHUNK_SIZE)
+    op.add_option("--no-store", action="store_true", default=False,
+                  help="compute scores without the score cache")
+    (opts, args) = op.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(asctime)s] %(levelname).1s %(message)s',
+                        datefmt='%Y.%m.%d %H:%M:%S')
+    fmt = opts.format or (CSV if opts.input.endswith(".csv") else JSONL)
+    out_fmt = CSV if opts.output.endswith(".csv") else fmt
+    src = sys.stdin if opts.input == "-" else open(opts.input)
+    dst = sys.stdout if opts.output == "-" else open(opts.output, "w")
+    store = None
+    if not opts.no_store:
+        store = Store(chunk_size=opts.chunk_size)
+        store.connect()
+    start = time.time()
+    total, skipped = score_stream(src, dst, store, fmt, out_fmt,
+                                  batch_size=opts.batch_size,
+                                  chunk_size=opts.chunk_size)
+    dst.flush()
+    elapsed = time.time() - start
+    logging.info("Scored %s records in %.2fs (%.0f records/s), "
+                 "%s invalid skipped" %
+                 (total - skipped, elapsed,
+                  total / elapsed if elapsed else 0, skipped))
+    if store is not None:
+        store.close()
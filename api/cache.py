@@ -0,0 +1,154 @@
+import time
+import threading
+
+CACHE_SIZE = 10000
+CACHE_TTL = 60 * 60
+# L2 doesn't return the remaining TTL, an L1 copy of an L2 value only
+# lives this long so it never outlives the L2 entry by much
+FILL_TTL = 60
+PREV, NEXT, KEY, VALUE, EXPIRES = range(5)
+
+
+class LRUCache(object):
+    """Thread-safe bounded mapping with per-key expiry.
+
+    Holds at most ``maxsize`` keys, evicting the least recently used one
+    when full. Expired keys are dropped lazily when they are read.
+    Recency is kept in a circular doubly linked list of
+    [prev, next, key, value, expires] links, as OrderedDict is too slow
+    on the request path.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None, None]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _unlink(self, link):
+        prev, next = link[PREV], link[NEXT]
+        prev[NEXT] = next
+        next[PREV] = prev
+
+    def _append(self, link):
+        root = self._root
+        last = root[PREV]
+        last[NEXT] = root[PREV] = link
+        link[PREV] = last
+        link[NEXT] = root
+
+    def get(self, key):
+        with self._lock:
+            link = self._data.get(key)
+            if link is None:
+                self.misses += 1
+                return None
+            # inlined _unlink() and _append(), this is the hot path
+            prev, next = link[PREV], link[NEXT]
+            prev[NEXT] = next
+            next[PREV] = prev
+            if link[EXPIRES] < time.time():
+                del self._data[key]
+                self.misses += 1
+                return None
+            root = self._root
+            last = root[PREV]
+            last[NEXT] = root[PREV] = link
+            link[PREV] = last
+            link[NEXT] = root
+            self.hits += 1
+            return link[VALUE]
+
+    def set(self, key, value, ttl=CACHE_TTL):
+        with self._lock:
+            link = self._data.get(key)
+            if link is not None:
+                self._unlink(link)
+            link = [None, None, key, value, time.time() + ttl]
+            self._append(link)
+            self._data[key] = link
+            while len(self._data) > self.maxsize:
+                oldest = self._root[NEXT]
+                self._unlink(oldest)
+                del self._data[oldest[KEY]]
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            link = self._data.pop(key, None)
+            if link is not None:
+                self._unlink(link)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._root[:] = [self._root, self._root, None, None, None]
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CachedStore(object):
+    """In-process L1 score cache in front of a shared store (L2).
+
+    ``cache_get`` is served from the L1 when possible and fills it from
+    the store on a miss for at most ``fill_ttl`` seconds; ``cache_set``
+    writes through to both, to the L1 for at most ``ttl`` seconds.
+    Every other store method is delegated untouched.
+    """
+
+    def __init__(self, store, cache=None, ttl=CACHE_TTL, fill_ttl=FILL_TTL):
+        self.store = store
+        self.cache = cache if cache is not None else LRUCache()
+        self.ttl = ttl
+        self.fill_ttl = min(fill_ttl, ttl)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def cache_get(self, key):
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        value = self.store.cache_get(key)
+        if value is not None:
+            self.cache.set(key, value, self.fill_ttl)
+        return value
+
+    def cache_get_many(self, keys, chunk_size=None):
+        values = [self.cache.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            fetched = self.store.cache_get_many([keys[i] for i in missing],
+                                                chunk_size)
+            for i, value in zip(missing, fetched):
+                if value is not None:
+                    self.cache.set(keys[i], value, self.fill_ttl)
+                    values[i] = value
+        return values
+
+    def cache_set(self, key, value, ttl=CACHE_TTL):
+        self.cache.set(key, value, min(ttl, self.ttl))
+        return self.store.cache_set(key, value, ttl)
+
+    def cache_delete(self, key):
+        self.cache.delete(key)
+        return self.store.cache_delete(key)
+
+    def stats(self):
+        stats = dict(self.store.stats())
+        stats.update(("l1_%s" % k, v) for k, v in self.cache.stats().items())
+        return stats
@@ -0,0 +1,44 @@
+import time
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextmanager
+def scope(deadline):
+    """Run the block under an absolute ``deadline`` (a time.time() value,
+    None for no deadline). Store calls made by the thread meanwhile take
+    their timeouts from the remaining budget.
+    """
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def current():
+    return getattr(_local, "deadline", None)
+
+
+def remaining(timeout=None):
+    """Seconds left, at most ``timeout``. Raises DeadlineExceeded once
+    the budget is spent, returns ``timeout`` without a deadline."""
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return timeout
+    left = deadline - time.time()
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(left, timeout) if timeout is not None else left
+
+
+def expired():
+    deadline = getattr(_local, "deadline", None)
+    return deadline is not None and time.time() >= deadline
@@ -0,0 +1,32 @@
+"""JSON for request and response bodies and stored values.
+
+Uses ujson or simplejson (with its C speedups) when one is installed
+and falls back to the standard library. All of them read and write the
+same JSON for the plain dicts, lists, strings and numbers the API
+exchanges, invalid input raises ValueError with each of them.
+"""
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+import json
+
+if ujson is not None:
+    NAME = "ujson"
+    loads = ujson.loads
+
+    def dumps(obj):
+        return ujson.dumps(obj, escape_forward_slashes=False)
+elif simplejson is not None:
+    NAME = "simplejson"
+    loads = simplejson.loads
+    dumps = simplejson.dumps
+else:
+    NAME = "json"
+    loads = json.loads
+    dumps = json.dumps
@@ -0,0 +1,107 @@
+import uuid
+import base64
+import struct
+import msgpack
+
+GREETING_SIZE = 128
+LENGTH_SIZE = 5
+# prefix byte -> (prefix size, struct format) of msgpack uint encodings
+LENGTH_FORMATS = {0xcc: (2, ">B"), 0xcd: (3, ">H"), 0xce: (5, ">I")}
+
+CODE = 0x00
+SYNC = 0x01
+SCHEMA_ID = 0x05
+SPACE_ID = 0x10
+INDEX_ID = 0x11
+LIMIT = 0x12
+OFFSET = 0x13
+ITERATOR = 0x14
+KEY = 0x20
+TUPLE = 0x21
+FUNCTION_NAME = 0x22
+USER_NAME = 0x23
+DATA = 0x30
+ERROR = 0x31
+
+REQUEST_OK = 0
+REQUEST_SELECT = 1
+REQUEST_DELETE = 5
+REQUEST_AUTH = 7
+REQUEST_EVAL = 8
+REQUEST_CALL = 10
+REQUEST_PING = 64
+REQUEST_ERROR = 1 << 15
+
+
+def pack(obj):
+    return msgpack.packb(obj, use_bin_type=False)
+
+
+def pack_packet(header, body):
+    payload = pack(header) + pack(body)
+    # tarantool always frames packets with a 5-byte msgpack uint32
+    return struct.pack(">BI", 0xce, len(payload)) + payload
+
+
+def pack_request(code, sync, body):
+    return pack_packet({CODE: code, SYNC: sync}, body)
+
+
+def pack_response(sync, data=None, error=None, schema_id=1):
+    if error is not None:
+        header = {CODE: REQUEST_ERROR | 32, SYNC: sync, SCHEMA_ID: schema_id}
+        return pack_packet(header, {ERROR: error})
+    header = {CODE: REQUEST_OK, SYNC: sync, SCHEMA_ID: schema_id}
+    return pack_packet(header, {DATA: data if data is not None else []})
+
+
+def greeting(version="2.2.0", salt=None):
+    line = "Tarantool %s (Binary) %s" % (version, uuid.uuid4())
+    salt = base64.b64encode(salt or "\0" * 32)
+    return line.ljust(63) + "\n" + salt.ljust(63) + "\n"
+
+
+def unpack_length(buf, offset):
+    """Decode the packet length prefix at ``offset``.
+
+    Servers always send a 5-byte uint32 but clients may use any msgpack
+    uint, so the prefix size is returned as well. Returns None when the
+    prefix itself is not complete yet.
+    """
+    if len(buf) <= offset:
+        return None
+    prefix = ord(buf[offset])
+    if prefix < 0x80:
+        return prefix, 1
+    size, fmt = LENGTH_FORMATS[prefix]
+    if len(buf) - offset < size:
+        return None
+    return struct.unpack(fmt, buf[offset + 1:offset + size])[0], size
+
+
+def unpack_packets(buf):
+    """Split ``buf`` into complete (header, body) packets.
+
+    Returns the list of packets and the unconsumed tail of the buffer.
+    """
+    packets = []
+    offset = 0
+    while True:
+        prefix = unpack_length(buf, offset)
+        if prefix is None:
+            break
+        length, size = prefix
+        end = offset + size + length
+        if len(buf) < end:
+            break
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(buf[offset + size:end])
+        header = unpacker.unpack()
+        try:
+            body = unpacker.unpack()
+        except msgpack.OutOfData:
+            body = {}
+        packets.append((header, body))
+        offset = end
+    return packets, buf[offset:]
+
@@ -0,0 +1,153 @@
+import time
+import logging
+import threading
+import fastjson
+from store import BaseStore
+
+WHEEL_SLOTS = 512
+WHEEL_RESOLUTION = 1
+
+
+class TTLDict(object):
+    """Thread-safe dict with per-key expiry.
+
+    Keys with a TTL are also filed in a hashed timing wheel: ``slots``
+    buckets of ``resolution`` seconds, picked by expiry time. Writes
+    advance the wheel to the current time and purge only the buckets
+    passed since the previous write, so expiry costs O(expired keys)
+    instead of a scan of the dict. Keys due in a later rotation of the
+    wheel stay in their bucket until their turn. Reads take no lock and
+    check the expiry themselves, an expired key is never returned.
+    """
+
+    def __init__(self, slots=WHEEL_SLOTS, resolution=WHEEL_RESOLUTION,
+                 clock=time.time):
+        self.slots = slots
+        self.resolution = resolution
+        self.clock = clock
+        self.expired = 0
+        self._data = {}
+        self._wheel = [set() for _ in range(slots)]
+        self._tick = int(clock() / resolution)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _bucket(self, expires):
+        return self._wheel[int(expires / self.resolution) % self.slots]
+
+    def _advance(self, now):
+        # called with the lock held
+        tick = int(now / self.resolution)
+        if tick <= self._tick:
+            return
+        for t in range(self._tick, self._tick + min(tick - self._tick,
+                                                     self.slots)):
+            bucket = self._wheel[t % self.slots]
+            due = [key for key in bucket if self._data[key][1] <= now]
+            for key in due:
+                bucket.discard(key)
+                del self._data[key]
+            self.expired += len(due)
+        self._tick = tick
+
+    def _unfile(self, key):
+        # called with the lock held
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None:
+            self._bucket(entry[1]).discard(key)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= self.clock():
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        now = self.clock()
+        expires = now + ttl if ttl else None
+        with self._lock:
+            self._advance(now)
+            self._unfile(key)
+            self._data[key] = (value, expires)
+            if expires is not None:
+                self._bucket(expires).add(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._unfile(key)
+            self._data.pop(key, None)
+
+    def stats(self):
+        return {"keys": len(self._data), "expired": self.expired}
+
+
+def read_interests(stream):
+    """Interests by "i:<cid>" key from a JSON object of {cid: [interests]}
+    or JSONL lines of such objects. Raises ValueError on anything else.
+    """
+    data = stream.read()
+    try:
+        mappings = [fastjson.loads(data)]
+    except ValueError:
+        mappings = [fastjson.loads(line) for line in data.splitlines()
+                    if line.strip()]
+    interests = {}
+    for mapping in mappings:
+        if not isinstance(mapping, dict):
+            raise ValueError("Interests must map client ids to lists")
+        for cid, values in mapping.items():
+            if not isinstance(values, list):
+                raise ValueError("Interests of client %s are not a list" %
+                                 cid)
+            interests["i:%s" % cid] = values
+    return interests
+
+
+class MemoryStore(BaseStore):
+    """In-process backend for single-node deployments and tests.
+
+    Interests (``interests`` as returned by ``read_interests`` or set
+    with ``set_interests``) and scores live in TTLDicts, calls never
+    leave the process and never fail. Nothing else fills the interests,
+    without them every client has none. Every process of a prefork
+    server has its own copy.
+    """
+
+    def __init__(self, log=True, interests=None):
+        self.log = log
+        self.interests = TTLDict()
+        self.scores = TTLDict()
+        for cid, values in (interests or {}).items():
+            self.set_interests(cid, values)
+
+    def set_interests(self, cid, interests):
+        self.interests.set(cid, list(interests))
+
+    def connect(self):
+        if self.log and not len(self.interests):
+            logging.warning("Memory store has no interests, "
+                            "clients_interests returns [] for every client")
+        return True
+
+    def stats(self):
+        stats = self.scores.stats()
+        stats["interests"] = len(self.interests)
+        return stats
+
+    def get(self, cid):
+        return self.interests.get(cid)
+
+    def cache_get(self, uid):
+        return self.scores.get(uid)
+
+    def cache_set(self, uid, score, ttl):
+        self.scores.set(uid, float(score), ttl)
+
+    def cache_delete(self, uid):
+        self.scores.delete(uid)
+        return self
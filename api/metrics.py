@@ -0,0 +1,192 @@
+import time
+import bisect
+import threading
+
+# seconds, from a fast cache hit to a store call running into its timeout
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ('%s="%s"' % (n, str(v).replace("\\", r"\\").replace('"', r'\"'))
+             for n, v in zip(names, values))
+    return "{%s}" % ",".join(pairs)
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Timer(object):
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.time() - self.start)
+
+
+class CounterValue(object):
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        return [(name + "_total", labels, self.value)]
+
+
+class HistogramValue(object):
+    """Counts of observations per fixed bucket, memory never grows."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return Timer(self)
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            samples.append((name + "_bucket", labels + (("le", bound),),
+                            cumulative))
+        samples.append((name + "_sum", labels, total))
+        samples.append((name + "_count", labels, cumulative))
+        return samples
+
+
+class Metric(object):
+    """Family of values of one metric, one per combination of labels.
+
+    Label values must come from a small fixed set (routes, methods,
+    codes), as every combination seen lives until the process exits.
+    """
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._default = self.labels()
+
+    def new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        value = self._values.get(values)
+        if value is None:
+            with self._lock:
+                value = self._values.setdefault(values, self.new_value())
+        return value
+
+    def collect(self):
+        samples = []
+        for values, value in sorted(self._values.items()):
+            labels = tuple(zip(self.label_names, values))
+            samples.extend(value.samples(self.name, labels))
+        return samples
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def new_value(self):
+        return CounterValue()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        Metric.__init__(self, name, help, labels)
+
+    def new_value(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class Registry(object):
+    """Metrics of this process rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.type))
+            for name, labels, value in metric.collect():
+                names, values = zip(*labels) if labels else ((), ())
+                lines.append("%s%s %s" % (name, format_labels(names, values),
+                                          format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+def render_stats(prefix, stats):
+    """Render a ``stats()`` dict, e.g. of the store, as gauges."""
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, (int, long, float)):
+            name = "%s_%s" % (prefix, key)
+            lines.append("# TYPE %s gauge" % name)
+            lines.append("%s %s" % (name, format_value(value)))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+
+STAGE_SECONDS = histogram("request_stage_seconds",
+                          "Time spent in each stage of request handling.",
+                          labels=("stage",))
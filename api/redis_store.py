@@ -0,0 +1,92 @@
+import logging
+import resp
+import fastjson
+from store import Store, ConnectionPool, StoreError, StoreNetworkError
+
+PORT = 6379
+
+
+class RedisConnectionPool(ConnectionPool):
+    def _connect(self, timeout):
+        return resp.Connection(self.host, self.port, timeout)
+
+    def _set_timeout(self, conn, timeout):
+        conn.sock.settimeout(timeout)
+
+
+class RedisStore(Store):
+    """Backend for any server speaking the Redis protocol.
+
+    Interests are JSON lists stored under their "i:<cid>" keys, scores
+    are stored under their "uid:<hash>" keys with the TTL as expiry.
+    Pooling, the circuit breaker and negative caching work as in
+    ``Store``, batch calls are pipelined, one round trip per chunk.
+    """
+
+    pool_class = RedisConnectionPool
+
+    def __init__(self, log=True, port=PORT, **kwargs):
+        Store.__init__(self, log=log, port=port, **kwargs)
+
+    def _get(self, cid):
+        with self.pool.connection() as conn:
+            value = conn.execute("GET", cid)
+        return fastjson.loads(value) if value is not None else None
+
+    def _get_many(self, cids, chunk_size):
+        values = []
+        with self.pool.connection() as conn:
+            for i in range(0, len(cids), chunk_size):
+                self.pool.budget(conn)
+                values.extend(fastjson.loads(v) if v is not None else None
+                              for v in conn.execute("MGET",
+                                                    *cids[i:i + chunk_size]))
+        return values
+
+    def set_interests(self, cid, interests):
+        with self.pool.connection() as conn:
+            conn.execute("SET", cid, fastjson.dumps(interests))
+
+    def cache_get(self, uid):
+        return self.cache_get_many([uid])[0]
+
+    def cache_get_many(self, uids, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        result = []
+        try:
+            with self.pool.connection() as conn:
+                for i in range(0, len(uids), chunk_size):
+                    self.pool.budget(conn)
+                    scores = conn.execute("MGET", *uids[i:i + chunk_size])
+                    result.extend(float(s) if s is not None else None
+                                  for s in scores)
+        except StoreError:
+            return [None] * len(uids)
+        return result
+
+    def cache_set(self, uid, score, ttl):
+        try:
+            self.cache_set_many([(uid, score, ttl)])
+        except StoreError:
+            if self.log:
+                logging.warning("Store error!")
+
+    def cache_set_many(self, items, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        with self.pool.connection() as conn:
+            for i in range(0, len(items), chunk_size):
+                self.pool.budget(conn)
+                conn.pipeline([("SET", uid, float(score),
+                                "EX", max(int(ttl), 1))
+                               for uid, score, ttl in
+                               items[i:i + chunk_size]])
+        return len(items)
+
+    def cache_delete(self, uid):
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("DEL", uid)
+        except StoreNetworkError:
+            if self.log:
+                logging.warning("Store not connected!")
+        return self
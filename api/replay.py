@@ -0,0 +1,54 @@
+import itertools
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+WORKERS = 1
+# tasks in flight per worker, bounds memory on slow consumers
+WINDOW_PER_WORKER = 4
+
+
+def iter_lines(stream):
+    """Yield (line number, line) of every non-empty line of ``stream``."""
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            yield n, line
+
+
+def ordered_map(func, items, workers=WORKERS, window=None):
+    """Lazily yield ``func(item)`` for every item, in input order.
+
+    With more than one worker the calls run in a thread pool, but at most
+    ``window`` items are read ahead of the output, unlike
+    ``ThreadPool.imap`` which consumes the whole input up front.
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    window = window or workers * WINDOW_PER_WORKER
+    pool = ThreadPool(workers)
+    try:
+        pending = deque()
+        items = iter(items)
+        for item in itertools.islice(items, window):
+            pending.append(pool.apply_async(func, (item,)))
+        while pending:
+            result = pending.popleft().get()
+            for item in itertools.islice(items, 1):
+                pending.append(pool.apply_async(func, (item,)))
+            yield result
+    finally:
+        pool.terminate()
+
+
+def replay(src, dst, func, workers=WORKERS):
+    """Write ``func((n, line))`` for every line of ``src`` to ``dst`` as
+    one line each, in input order. Returns the number of lines.
+    """
+    total = 0
+    for output in ordered_map(func, iter_lines(src), workers):
+        dst.write(output + "\n")
+        total += 1
+    dst.flush()
+    return total
@@ -0,0 +1,98 @@
+import socket
+from store import StoreDatabaseError, StoreNetworkError
+
+CRLF = "\r\n"
+
+
+class ReplyError(StoreDatabaseError):
+    pass
+
+
+def encode(value):
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def pack_command(*args):
+    parts = ["*%d\r\n" % len(args)]
+    for arg in args:
+        arg = encode(arg)
+        parts.append("$%d\r\n%s\r\n" % (len(arg), arg))
+    return "".join(parts)
+
+
+def pack_reply(value):
+    """Encode ``value`` as a RESP reply: None as a null bulk string, ints
+    as integers, lists as arrays and ReplyErrors as errors."""
+    if value is None:
+        return "$-1\r\n"
+    if isinstance(value, ReplyError):
+        return "-%s\r\n" % value
+    if isinstance(value, bool) or isinstance(value, (int, long)):
+        return ":%d\r\n" % value
+    if isinstance(value, (list, tuple)):
+        return "*%d\r\n" % len(value) + "".join(pack_reply(v) for v in value)
+    value = encode(value)
+    return "$%d\r\n%s\r\n" % (len(value), value)
+
+
+def read_reply(stream):
+    """Read one reply from a file-like ``stream``. Error replies are
+    returned as ReplyError instances, not raised, so a pipeline can read
+    all of its replies."""
+    line = stream.readline()
+    if not line.endswith(CRLF):
+        raise StoreNetworkError("Connection closed by server")
+    kind, rest = line[0], line[1:-2]
+    if kind == "+":
+        return rest
+    if kind == "-":
+        return ReplyError(rest)
+    if kind == ":":
+        return int(rest)
+    if kind == "$":
+        size = int(rest)
+        if size < 0:
+            return None
+        data = stream.read(size + 2)
+        if len(data) != size + 2:
+            raise StoreNetworkError("Connection closed by server")
+        return data[:-2]
+    if kind == "*":
+        size = int(rest)
+        if size < 0:
+            return None
+        return [read_reply(stream) for _ in range(size)]
+    raise StoreNetworkError("Unexpected reply %r" % line)
+
+
+class Connection(object):
+    """Blocking connection to a Redis-protocol server."""
+
+    def __init__(self, host, port, socket_timeout=None):
+        self.sock = socket.create_connection((host, port), socket_timeout)
+        self.sock.setsockopt(socket.SOL_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile("rb")
+
+    def pipeline(self, commands):
+        """Send all ``commands`` in one write and return their replies,
+        raising the first error reply after all of them are read."""
+        self.sock.sendall("".join(pack_command(*c) for c in commands))
+        replies = [read_reply(self.stream) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, ReplyError):
+                raise reply
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def ping(self, notime=False):
+        return self.execute("PING")
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
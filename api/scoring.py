@@ -1,19 +1,55 @@
 import hashlib
-import json
+import metrics
+from singleflight import SingleFlight
+from deadline import DeadlineExceeded
 
-def get_score(store, phone=None, email=None, birthday=None, gender=None, first_name=None, last_name=None):
+SCORE_CACHE = metrics.counter("score_cache_requests",
+                              "Score cache lookups by result.",
+                              labels=("result",))
+SCORE_CACHE_HIT = SCORE_CACHE.labels("hit")
+SCORE_CACHE_MISS = SCORE_CACHE.labels("miss")
+# concurrent requests for the same uid: or i: key share one store lookup
+flights = SingleFlight(metrics.counter(
+    "store_lookups_coalesced",
+    "Lookups served by a concurrent identical lookup."))
+
+
+UNKNOWN = 0
+MALE = 1
+FEMALE = 2
+GENDERS = {
+    UNKNOWN: "unknown",
+    MALE: "male",
+    FEMALE: "female",
+}
+SCORE_TTL = 60 * 60
+# birthday -> "%Y%m%d" part of the score key, real birthdays are few
+DAYS_SIZE = 100000
+days = {}
+
+
+def day_key(birthday):
+    day = days.get(birthday)
+    if day is None:
+        if len(days) > DAYS_SIZE:
+            days.clear()
+        day = days[birthday] = birthday.strftime("%Y%m%d") \
+            if birthday is not None else ""
+    return day
+
+
+def score_key(phone=None, birthday=None, first_name=None, last_name=None):
     key_parts = [
         first_name or "",
         last_name or "",
         phone or "",
-        birthday.strftime("%Y%m%d") if birthday is not None else "",
+        day_key(birthday),
     ]
-    key = "uid:" + hashlib.md5("".join(key_parts)).hexdigest()
-    # try get from cache,
-    # fallback to heavy calculation in case of cache miss
-    score = store.cache_get(key) or 0
-    if score:
-        return score
+    return "uid:" + hashlib.md5("".join(key_parts)).hexdigest()
+
+
+def compute_score(phone=None, email=None, birthday=None, gender=None, first_name=None, last_name=None):
+    score = 0
     if phone:
         score += 1.5
     if email:
@@ -22,11 +58,98 @@ def get_score(store, phone=None, email=None, birthday=None, gender=None, first_n
         score += 1.5
     if first_name and last_name:
         score += 0.5
+    return score
+
+
+def get_score(store, phone=None, email=None, birthday=None, gender=None, first_name=None, last_name=None):
+    key = score_key(phone, birthday, first_name, last_name)
+    return flights.do(key, _get_score, store, key, phone, email, birthday,
+                      gender, first_name, last_name)
+
+
+def _get_score(store, key, phone, email, birthday, gender, first_name,
+               last_name):
+    # try get from cache,
+    # fallback to heavy calculation in case of cache miss
+    score = store.cache_get(key) or 0
+    if score:
+        SCORE_CACHE_HIT.inc()
+        return score
+    SCORE_CACHE_MISS.inc()
+    score = compute_score(phone, email, birthday, gender, first_name,
+                          last_name)
     # cache for 60 minutes
-    store.cache_set(key, score, 60 * 60)
+    try:
+        store.cache_set(key, score, SCORE_TTL)
+    except DeadlineExceeded:
+        # the score is known, only the cache write is out of time
+        pass
     return score
 
 
+def score_items(phones=None, emails=None, birthdays=None, genders=None,
+                first_names=None, last_names=None):
+    """Score keys and computed scores of columns of equal length, None
+    for a missing column. The keys are the ``score_key`` of each record,
+    the scores its ``compute_score``; no store is involved.
+    """
+    columns = [phones, emails, birthdays, genders, first_names, last_names]
+    lengths = set(len(c) for c in columns if c is not None)
+    if len(lengths) > 1:
+        raise ValueError("Columns must have the same length")
+    size = lengths.pop() if lengths else 0
+    none = [None] * size
+    phones, emails, birthdays, genders, first_names, last_names = [
+        c if c is not None else none for c in columns]
+
+    # birthdays repeat a lot, format each distinct date once
+    if len(days) > DAYS_SIZE:
+        days.clear()
+    for b in birthdays:
+        if b not in days:
+            days[b] = b.strftime("%Y%m%d") if b is not None else ""
+    md5 = hashlib.md5
+    keys = ["uid:" + md5((f or "") + (l or "") + (p or "") + days[b])
+            .hexdigest()
+            for f, l, p, b in zip(first_names, last_names, phones, birthdays)]
+    scores = [(1.5 if p else 0) + (1.5 if e else 0) +
+              (1.5 if b and g else 0) + (0.5 if f and l else 0)
+              for p, e, b, g, f, l in zip(phones, emails, birthdays, genders,
+                                          first_names, last_names)]
+    return keys, scores
+
+
+def get_scores(store, phones=None, emails=None, birthdays=None, genders=None,
+               first_names=None, last_names=None, chunk_size=None):
+    """Bulk ``get_score`` over columns of equal length, None for a missing
+    column. Keys are computed column-wise and the score cache is read and
+    written in chunks, so a column of N records costs N / chunk_size
+    store round trips. ``store`` may be None to skip the cache.
+    """
+    keys, scores = score_items(phones, emails, birthdays, genders,
+                               first_names, last_names)
+    if store is None:
+        return scores
+
+    cached = store.cache_get_many(keys, chunk_size)
+    writes = []
+    for i, value in enumerate(cached):
+        if value:
+            scores[i] = value
+        else:
+            writes.append((keys[i], scores[i], SCORE_TTL))
+    SCORE_CACHE_HIT.inc(len(keys) - len(writes))
+    SCORE_CACHE_MISS.inc(len(writes))
+    if writes:
+        store.cache_set_many(writes, chunk_size)
+    return scores
+
+
 def get_interests(store, cid):
-    r = store.get("i:%s" % cid)
-    return json.loads(r) if r else []
+    r = flights.do("i:%s" % cid, store.get, "i:%s" % cid)
+    return r or []
+
+
+def get_interests_many(store, cids):
+    r = flights.do_many(["i:%s" % cid for cid in cids], store.get_many)
+    return [i or [] for i in r]
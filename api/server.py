@@ -0,0 +1,167 @@
+import os
+import errno
+import signal
+import logging
+import threading
+import Queue
+from BaseHTTPServer import HTTPServer
+
+WORKERS = 1
+THREAD = "thread"
+PREFORK = "prefork"
+MODES = (THREAD, PREFORK)
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer handing accepted connections to a fixed pool of threads.
+
+    The accept queue is bounded, so the listening thread blocks once all
+    workers are busy and the backlog is full. ``server_close`` stops
+    accepting and waits for queued and in-flight requests to finish.
+    """
+
+    # other connections are served while one idles, keep-alive is safe
+    concurrent = True
+
+    def __init__(self, server_address, handler_class, workers=WORKERS,
+                 queue_size=None):
+        HTTPServer.__init__(self, server_address, handler_class)
+        self.requests = Queue.Queue(queue_size or workers * 4)
+        self.workers = []
+        for i in range(workers):
+            t = threading.Thread(target=self.process_requests,
+                                 name="worker-%s" % i)
+            t.daemon = True
+            t.start()
+            self.workers.append(t)
+
+    def process_request(self, request, client_address):
+        self.requests.put((request, client_address))
+
+    def process_requests(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        for _ in self.workers:
+            self.requests.put(None)
+        for t in self.workers:
+            t.join()
+
+
+class PreforkHTTPServer(HTTPServer):
+    """HTTPServer forking ``workers`` processes that share the listening
+    socket. ``init_worker`` is called in every child right after the fork,
+    e.g. to open a per-process store, and ``close_worker`` right before
+    the child exits. On SIGTERM the parent asks every child to finish its
+    current request and exit.
+    """
+
+    concurrent = True
+
+    def __init__(self, server_address, handler_class, workers=WORKERS,
+                 init_worker=None, close_worker=None):
+        HTTPServer.__init__(self, server_address, handler_class)
+        # children race for accept(), losers must not block in it
+        self.socket.setblocking(0)
+        self.workers = workers
+        self.init_worker = init_worker
+        self.close_worker = close_worker
+        self.children = []
+
+    def serve_forever(self, poll_interval=0.5):
+        if not self.children:
+            for i in range(self.workers):
+                pid = os.fork()
+                if not pid:
+                    self.serve_child(poll_interval)
+                self.children.append(pid)
+            logging.info("Started %s workers: %s" %
+                         (self.workers, self.children))
+        while self.children:
+            try:
+                pid, _ = os.wait()
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                break
+            if pid in self.children:
+                self.children.remove(pid)
+
+    def serve_child(self, poll_interval):
+        self.children = []
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *args: self.stop())
+        status = 0
+        try:
+            if self.init_worker:
+                self.init_worker()
+            HTTPServer.serve_forever(self, poll_interval)
+            if self.close_worker:
+                self.close_worker()
+        except Exception:
+            logging.exception("Worker %s failed" % os.getpid())
+            status = 1
+        finally:
+            # os._exit() skips atexit, flush queued log records by hand
+            logging.shutdown()
+            os._exit(status)
+
+    def stop(self):
+        # shutdown() waits for serve_forever() to exit, so it can't be
+        # called from the thread running it (e.g. inside a signal handler)
+        threading.Thread(target=self.shutdown).start()
+
+    def shutdown(self):
+        if self.children:
+            for pid in self.children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError:
+                    pass
+        else:
+            HTTPServer.shutdown(self)
+
+
+def make_server(server_address, handler_class, workers=WORKERS, mode=THREAD,
+                init_worker=None, close_worker=None):
+    if workers > 1 and mode == PREFORK:
+        return PreforkHTTPServer(server_address, handler_class,
+                                 workers=workers, init_worker=init_worker,
+                                 close_worker=close_worker)
+    if init_worker:
+        init_worker()
+    if workers > 1:
+        return ThreadPoolHTTPServer(server_address, handler_class,
+                                    workers=workers)
+    return HTTPServer(server_address, handler_class)
+
+
+def serve(server, close_worker=None):
+    def stop(*args):
+        if isinstance(server, PreforkHTTPServer):
+            server.shutdown()
+        else:
+            threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        if isinstance(server, PreforkHTTPServer):
+            # wait for the children to drain their requests
+            server.shutdown()
+            server.serve_forever()
+    server.server_close()
+    if close_worker and not isinstance(server, PreforkHTTPServer):
+        close_worker()
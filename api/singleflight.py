@@ -0,0 +1,130 @@
+import threading
+import deadline
+from deadline import DeadlineExceeded
+
+
+class Call(object):
+    """One in-flight lookup. ``done`` is set by the caller doing the work
+    once the result is known, other callers wait for it. ``retry`` is set
+    when the lookup ran out of its owner's deadline, which says nothing
+    about the deadlines of the other callers."""
+
+    __slots__ = ("done", "result", "error", "retry")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.retry = False
+
+    def wait(self):
+        """Wait for the result within the caller's own deadline."""
+        timeout = deadline.remaining()
+        if timeout is None:
+            self.done.wait()
+        elif not self.done.wait(timeout):
+            raise DeadlineExceeded("Request deadline exceeded")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight(object):
+    """Coalesces concurrent lookups of the same key.
+
+    The first caller for a key runs the lookup, callers arriving while it
+    is in flight wait for it and get the same result or exception. Nothing
+    is kept once the lookup finishes, this is not a cache. Callers served
+    by another caller's lookup are counted in ``shared`` and ``counter``.
+    Every caller waits only as long as its own request deadline allows;
+    when the lookup fails with the DeadlineExceeded of the caller running
+    it, the waiting callers retry it under their own deadlines.
+    """
+
+    def __init__(self, counter=None):
+        self.counter = counter
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _share(self):
+        self.shared += 1
+        if self.counter is not None:
+            self.counter.inc()
+
+    def _finish(self, keys, calls):
+        with self._lock:
+            for key in keys:
+                del self._calls[key]
+        for call in calls:
+            call.done.set()
+
+    def do(self, key, func, *args):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    self._share()
+                else:
+                    call = self._calls[key] = Call()
+                    break
+            result = call.wait()
+            if not call.retry:
+                return result
+        try:
+            call.result = func(*args)
+        except DeadlineExceeded:
+            call.retry = True
+            raise
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish((key,), (call,))
+        return call.result
+
+    def do_many(self, keys, func):
+        """Look up ``keys`` with ``func(keys) -> values``, called only for
+        the keys no other caller has in flight. Returns the values in the
+        order of ``keys``.
+        """
+        values = {}
+        pending = keys
+        while pending:
+            calls = {}
+            owned = []
+            with self._lock:
+                for key in pending:
+                    if key in calls:
+                        continue
+                    call = self._calls.get(key)
+                    if call is not None:
+                        self._share()
+                    else:
+                        call = self._calls[key] = Call()
+                        owned.append(key)
+                    calls[key] = call
+            if owned:
+                owned_calls = [calls[key] for key in owned]
+                try:
+                    for call, value in zip(owned_calls, func(owned)):
+                        call.result = value
+                except DeadlineExceeded:
+                    for call in owned_calls:
+                        call.retry = True
+                    raise
+                except Exception as e:
+                    for call in owned_calls:
+                        call.error = e
+                    raise
+                finally:
+                    self._finish(owned, owned_calls)
+            # keys whose lookup ran out of another caller's deadline
+            pending = []
+            for key, call in calls.items():
+                value = call.wait()
+                if call.retry:
+                    pending.append(key)
+                else:
+                    values[key] = value
+        return [values[key] for key in keys]
@@ -1,89 +1,485 @@
-import tarantool
+import time
+import socket
 import logging
+import threading
+from contextlib import contextmanager
+import tarantool
+import metrics
+import deadline
+from deadline import DeadlineExceeded
+from breaker import CircuitBreaker, FAILURE_THRESHOLD, RESET_TIMEOUT
+from cache import LRUCache
 
 HOST = "localhost"
 PORT = 33013
 SOCKET_TIMEOUT = 1
 RECONNECT_MAX_ATTEMPTS = 2
+RECONNECT_DELAY = 0.1
+RECONNECT_MAX_DELAY = 5
+POOL_SIZE = 4
+POOL_TIMEOUT = 1
+HEALTH_CHECK_INTERVAL = 30
+CHUNK_SIZE = 100
+# missing interests are remembered for a while instead of asked for again
+NEGATIVE_TTL = 30
+NEGATIVE_CACHE_SIZE = 10000
 
+STORE_SECONDS = metrics.STAGE_SECONDS.labels("store")
+STORE_ERRORS = metrics.counter("store_errors",
+                               "Failed store round trips by error kind.",
+                               labels=("kind",))
 
-class Store(object):
-    def __init__(self, log=True):
-        self.connection = None
-        self.host = HOST
-        self.port = PORT
-        self.socket_timeout = SOCKET_TIMEOUT
-        self.reconnect_max_attempts = RECONNECT_MAX_ATTEMPTS
-        self.log = log
-        self.connect()
+
+# all backends raise these, whatever their client library, callers
+# only ever catch StoreError
+StoreError = tarantool.Error
+StoreDatabaseError = tarantool.DatabaseError
+StoreNetworkError = tarantool.NetworkError
+
+
+class PoolTimeout(StoreNetworkError):
+    pass
+
+
+class CircuitOpen(StoreNetworkError):
+    pass
+
+
+class BaseStore(object):
+    """Interface of the interests and score cache backends.
+
+    Interests are read by "i:<cid>" keys and returned as lists of
+    strings, missing ones as None. ``get`` raises StoreError when the backend is
+    unavailable. The score cache is best effort: ``cache_get`` returns
+    None and ``cache_set`` gives up quietly on errors, only
+    ``cache_set_many`` raises. ``cache_delete`` takes the key given to
+    ``cache_set``. Backends override the batch methods when they can do
+    better than one round trip per key.
+    """
+
+    chunk_size = CHUNK_SIZE
 
     def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {}
+
+    def get(self, cid):
+        raise NotImplementedError
+
+    def get_many(self, cids, chunk_size=None):
+        return [self.get(cid) for cid in cids]
+
+    def cache_get(self, uid):
+        raise NotImplementedError
+
+    def cache_get_many(self, uids, chunk_size=None):
+        return [self.cache_get(uid) for uid in uids]
+
+    def cache_set(self, uid, score, ttl):
+        raise NotImplementedError
+
+    def cache_set_many(self, items, chunk_size=None):
+        for uid, score, ttl in items:
+            self.cache_set(uid, score, ttl)
+        return len(items)
+
+    def cache_delete(self, uid):
+        raise NotImplementedError
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of persistent Tarantool connections.
+
+    Connections are opened lazily up to ``size`` and checked out for the
+    duration of a single store call. Idle connections are pinged only if
+    they were not used for ``health_check_interval`` seconds. After a
+    failed connect the pool backs off exponentially (from
+    ``reconnect_delay`` up to ``reconnect_max_delay``) and fails fast
+    in between instead of hammering a dead server. Every checkout also
+    goes through ``breaker``, which fails calls fast after repeated
+    network errors or timeouts of established connections. Inside a
+    ``deadline.scope`` waits, connects and socket operations are limited
+    by the remaining request budget, running out of it raises
+    DeadlineExceeded and is not held against the server.
+    """
+
+    def __init__(self, host=HOST, port=PORT, size=POOL_SIZE,
+                 timeout=POOL_TIMEOUT, socket_timeout=SOCKET_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL,
+                 reconnect_max_attempts=RECONNECT_MAX_ATTEMPTS,
+                 reconnect_delay=RECONNECT_DELAY,
+                 reconnect_max_delay=RECONNECT_MAX_DELAY, breaker=None):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.socket_timeout = socket_timeout
+        self.health_check_interval = health_check_interval
+        self.reconnect_max_attempts = reconnect_max_attempts
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.breaker = breaker or CircuitBreaker(failure_threshold=0)
+        self.waits = 0
+        self.reconnects = 0
+        self._idle = []
+        self._open = 0
+        # slots of dropped broken connections not opened again yet
+        self._dropped = 0
+        self._failures = 0
+        self._retry_at = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    def _connect(self, timeout):
+        return tarantool.Connection(
+            host=self.host,
+            port=self.port,
+            socket_timeout=timeout,
+            reconnect_max_attempts=0,
+            reconnect_delay=0)
+
+    def _set_timeout(self, conn, timeout):
+        # tarantool-python has no public way to change it per call
+        sock = getattr(conn, "_socket", None)
+        if sock is not None:
+            sock.settimeout(timeout)
+
+    def budget(self, conn):
+        """Limit the next operations on ``conn`` by the request budget."""
+        self._set_timeout(conn, deadline.remaining(self.socket_timeout))
+
+    def _new_connection(self, timeout):
+        if time.time() < self._retry_at:
+            raise StoreNetworkError("Store reconnect backoff")
+        error = None
         for i in range(self.reconnect_max_attempts):
             try:
-                self.connection = tarantool.Connection(
-                    host=self.host,
-                    port=self.port,
-                    socket_timeout=self.socket_timeout)
-            except Exception:
-                self.connection = None
+                conn = self._connect(timeout)
+            except (StoreError, socket.error) as e:
+                error = e
+                continue
+            with self._cond:
+                self._failures = 0
+                self._retry_at = 0
+            return conn
+        with self._cond:
+            delay = self.reconnect_delay * 2 ** self._failures
+            self._failures += 1
+            self._retry_at = time.time() + min(delay, self.reconnect_max_delay)
+        raise StoreNetworkError(error)
 
-    def disconnect(self):
-        self.connection = None
-        self.port = 100000
-        self.connect()
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
 
-    def get(self, cid):
+    def _is_alive(self, conn):
         try:
-            self.conn.ping()
+            conn.ping(notime=True)
         except Exception:
-            self.connect()
-        if not self.connection:
-            raise tarantool.DatabaseError("Store not connected!")
-        tt_int = self.connection.call("get_interests", cid)
-        clients_interests = str(tt_int[0])
-        clients_interests = clients_interests.replace("\'", "\"")
-        return clients_interests
+            return False
+        return True
 
-    def cache_get(self, uid):
+    def _release(self, conn, broken=False):
+        with self._cond:
+            if broken:
+                self._open -= 1
+                self._dropped += 1
+            else:
+                self._idle.append((conn, time.time()))
+            self._cond.notify()
+        if broken:
+            self._close(conn)
+
+    def _acquire(self, timeout=None):
+        if timeout is None:
+            timeout = self.socket_timeout
+        until = time.time() + min(self.timeout, timeout)
+        waited = False
+        replaced = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn, last_used = None, None
+                    if self._dropped:
+                        self._dropped -= 1
+                        replaced = True
+                    break
+                remaining = until - time.time()
+                if remaining <= 0:
+                    raise PoolTimeout("No free store connections")
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._cond.wait(remaining)
+        if conn is not None:
+            if time.time() - last_used < self.health_check_interval:
+                return conn
+            if self._is_alive(conn):
+                return conn
+            self._close(conn)
+            replaced = True
         try:
-            self.conn.ping()
+            conn = self._new_connection(timeout)
         except Exception:
-            self.connect()
-        if not self.connection:
+            with self._cond:
+                self._open -= 1
+                if replaced:
+                    self._dropped += 1
+                self._cond.notify()
+            raise
+        if replaced:
+            with self._cond:
+                self.reconnects += 1
+        return conn
+
+    def _deadline_exceeded(self):
+        # the request ran out of time, the server is not to blame
+        self.breaker.release()
+        STORE_ERRORS.labels("deadline").inc()
+        return DeadlineExceeded("Request deadline exceeded")
+
+    @contextmanager
+    def connection(self):
+        try:
+            timeout = deadline.remaining(self.socket_timeout)
+        except DeadlineExceeded:
+            STORE_ERRORS.labels("deadline").inc()
+            raise
+        if not self.breaker.allow():
+            STORE_ERRORS.labels("circuit_open").inc()
+            raise CircuitOpen("Store circuit breaker is open")
+        start = time.time()
+        try:
+            try:
+                conn = self._acquire(timeout)
+            except Exception as e:
+                if deadline.expired():
+                    raise self._deadline_exceeded()
+                if isinstance(e, PoolTimeout):
+                    # all connections busy says nothing about the server
+                    self.breaker.release()
+                else:
+                    self.breaker.failure()
+                STORE_ERRORS.labels("connect").inc()
+                raise
+            self._set_timeout(conn, timeout)
+            try:
+                yield conn
+            except (StoreNetworkError, socket.error):
+                if deadline.expired():
+                    self._release(conn, broken=True)
+                    raise self._deadline_exceeded()
+                self.breaker.failure()
+                STORE_ERRORS.labels("network").inc()
+                self._release(conn, broken=True)
+                raise
+            except Exception as e:
+                if isinstance(e, StoreError):
+                    # the server is up and answered with an error
+                    self.breaker.success()
+                    STORE_ERRORS.labels("database").inc()
+                else:
+                    if isinstance(e, DeadlineExceeded):
+                        STORE_ERRORS.labels("deadline").inc()
+                    self.breaker.release()
+                self._release(conn)
+                raise
+            self.breaker.success()
+            self._release(conn)
+        finally:
+            STORE_SECONDS.observe(time.time() - start)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "waits": self.waits,
+                "reconnects": self.reconnects,
+            }
+
+
+class Store(BaseStore):
+    pool_class = ConnectionPool
+
+    def __init__(self, log=True, host=HOST, port=PORT, pool_size=POOL_SIZE,
+                 pool_timeout=POOL_TIMEOUT, socket_timeout=SOCKET_TIMEOUT,
+                 chunk_size=CHUNK_SIZE, breaker_threshold=FAILURE_THRESHOLD,
+                 breaker_timeout=RESET_TIMEOUT, negative_ttl=NEGATIVE_TTL):
+        self.host = host
+        self.port = port
+        self.socket_timeout = socket_timeout
+        self.reconnect_max_attempts = RECONNECT_MAX_ATTEMPTS
+        self.chunk_size = chunk_size
+        self.log = log
+        self.negative_ttl = negative_ttl
+        self.missing = LRUCache(NEGATIVE_CACHE_SIZE) if negative_ttl else None
+        self.breaker = CircuitBreaker("store",
+                                      failure_threshold=breaker_threshold,
+                                      reset_timeout=breaker_timeout)
+        self.pool = self.pool_class(
+            host=host,
+            port=port,
+            size=pool_size,
+            timeout=pool_timeout,
+            socket_timeout=socket_timeout,
+            reconnect_max_attempts=self.reconnect_max_attempts,
+            breaker=self.breaker)
+
+    def connect(self):
+        # warm up a single pooled connection, failures are retried lazily
+        try:
+            with self.pool.connection():
+                pass
+        except StoreError:
+            if self.log:
+                logging.warning("Store not connected!")
+            return False
+        return True
+
+    def close(self):
+        self.pool.close()
+
+    def disconnect(self):
+        self.pool.close()
+        self.port = self.pool.port = 100000
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats.update(("breaker_%s" % k, v)
+                     for k, v in self.breaker.stats().items())
+        if self.missing is not None:
+            stats["negative_size"] = len(self.missing)
+            stats["negative_hits"] = self.missing.hits
+        return stats
+
+    def _is_missing(self, cid):
+        return self.missing is not None and self.missing.get(cid) is not None
+
+    def _set_missing(self, cid):
+        if self.missing is not None:
+            self.missing.set(cid, True, self.negative_ttl)
+
+    def _interests(self, tt_value):
+        return list(tt_value)
+
+    def get(self, cid):
+        if self._is_missing(cid):
+            return None
+        value = self._get(cid)
+        if value is None:
+            self._set_missing(cid)
+        return value
+
+    def _get(self, cid):
+        with self.pool.connection() as conn:
+            tt_int = conn.call("get_interests", cid)
+        if not tt_int or tt_int[0] is None:
+            return None
+        return self._interests(tt_int[0])
+
+    def get_many(self, cids, chunk_size=None):
+        # missing keys are returned as None
+        chunk_size = chunk_size or self.chunk_size
+        known = set(cid for cid in cids if self._is_missing(cid))
+        keys = [cid for cid in cids if cid not in known] if known else cids
+        values = self._get_many(keys, chunk_size) if keys else []
+        for cid, value in zip(keys, values):
+            if value is None:
+                self._set_missing(cid)
+        if not known:
+            return values
+        values = iter(values)
+        return [None if cid in known else next(values) for cid in cids]
+
+    def _get_many(self, cids, chunk_size):
+        # one "get_interests_many" call per chunk over a single connection
+        values = []
+        with self.pool.connection() as conn:
+            for i in range(0, len(cids), chunk_size):
+                self.pool.budget(conn)
+                tt_int = conn.call("get_interests_many",
+                                   [list(cids[i:i + chunk_size])])
+                values.extend(self._interests(v) if v else None
+                              for v in tt_int[0])
+        return values
+
+    def cache_get(self, uid):
+        try:
+            with self.pool.connection() as conn:
+                tt_score = conn.call("cache_get_score", uid)
+        except StoreError:
             return None
-        tt_score = self.connection.call("cache_get_score", uid)
         if tt_score[0]:
             score = "%.1f" % tt_score[0]
         else:
             return None
         return float(score)
 
+    def cache_get_many(self, uids, chunk_size=None):
+        # one "cache_get_score_many" call per chunk, misses are None
+        chunk_size = chunk_size or self.chunk_size
+        result = []
+        try:
+            with self.pool.connection() as conn:
+                for i in range(0, len(uids), chunk_size):
+                    self.pool.budget(conn)
+                    tt_scores = conn.call("cache_get_score_many",
+                                          [list(uids[i:i + chunk_size])])
+                    result.extend(float("%.1f" % s) if s else None
+                                  for s in tt_scores[0])
+        except StoreError:
+            return [None] * len(uids)
+        return result
+
     def cache_set(self, *args):
         try:
-            self.conn.ping()
-        except Exception:
-            self.connect()
-        if self.connection:
-            try:
+            with self.pool.connection() as conn:
                 fresh_values = (args[0], args[1], args[2])
-                self.connection.call("cache_set_score", fresh_values)
-                tt_score = self.connection.call("cache_get_score", args[0])
+                conn.call("cache_set_score", fresh_values)
+                tt_score = conn.call("cache_get_score", args[0])
                 return tt_score
-            except Exception:
-                if self.log:
-                    logging.warning("Store error!")
-                return None
-        else:
+        except StoreError:
             if self.log:
-                logging.warning("Store not connected!")
+                logging.warning("Store error!")
             return None
 
+    def cache_set_many(self, items, chunk_size=None):
+        # items are (uid, score, ttl) triples
+        chunk_size = chunk_size or self.chunk_size
+        with self.pool.connection() as conn:
+            for i in range(0, len(items), chunk_size):
+                self.pool.budget(conn)
+                conn.call("cache_set_score_many",
+                          [[list(item) for item in items[i:i + chunk_size]]])
+        return len(items)
+
     def cache_delete(self, uid):
+        # the score space is keyed by the uid without its "uid:" prefix
         try:
-            self.conn.ping()
-        except Exception:
-            self.connect()
-        if self.connection:
-            tt = self.connection.space("score")
-            tt.delete(uid)
+            with self.pool.connection() as conn:
+                tt = conn.space("score")
+                tt.delete(uid.split(":", 1)[-1])
+        except StoreNetworkError:
+            if self.log:
+                logging.warning("Store not connected!")
         return self
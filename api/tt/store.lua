@@ -83,6 +83,19 @@ function get_interests(req)
   end
 end
 
+function get_interests_many(reqs)
+  local result = {}
+  for i, req in ipairs(reqs) do
+    local ok, interests = pcall(get_interests, req)
+    if ok and interests ~= nil then
+      result[i] = interests
+    else
+      result[i] = box.NULL
+    end
+  end
+  return result
+end
+
 function set_interests(cid)
   local interest1 = math.random(1, 11)
   local interest2 = math.random(1, 11)
@@ -98,6 +111,13 @@ function cache_set_score(req, score, ttl)
   box.space.score:replace(t)
 end
 
+function cache_set_score_many(items)
+  for _, item in ipairs(items) do
+    cache_set_score(item[1], item[2], item[3])
+  end
+  return #items
+end
+
 function cache_get_score(req)
   local temp = mysplit(req, ':')
   local uid = temp[2]
@@ -117,3 +137,16 @@ function cache_get_score(req)
     return nil
   end
 end
+
+function cache_get_score_many(reqs)
+  local result = {}
+  for i, req in ipairs(reqs) do
+    local score = cache_get_score(req)
+    if score ~= nil then
+      result[i] = score
+    else
+      result[i] = box.NULL
+    end
+  end
+  return result
+end
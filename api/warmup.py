@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Score cache warm-up from historical scoring inputs.
+
+After a deploy or a store restart every ``cache_get`` misses and all
+requests take the compute-and-``cache_set`` path at once. This reads a
+JSONL or CSV dump of online_score arguments (the bulk_score.py input),
+computes the "uid:" keys and scores exactly as ``scoring.get_score``
+does and bulk-loads them into the store and/or an in-process cache
+before the server takes traffic. Batches are loaded by parallel
+workers and store writes are spaced out chunk by chunk to a limited
+rate, so the warm-up doesn't starve the live store. Invalid records
+are skipped and counted:
+
+    $ python2 warmup.py -i history.csv [--workers 4] [--rate 20000]
+"""
+
+import sys
+import time
+import logging
+import threading
+from optparse import OptionParser
+import replay
+import scoring
+import bulk_score
+from bulk_score import JSONL, CSV, FORMATS, BATCH_SIZE
+from store import HOST, CHUNK_SIZE
+from backends import make_store, BACKENDS, TARANTOOL
+
+WORKERS = 4
+# store writes per second, 0 for no limit
+RATE = 0
+PROGRESS_INTERVAL = 5
+STORE = "store"
+L1 = "l1"
+BOTH = "both"
+TARGETS = (STORE, L1, BOTH)
+
+
+class RateLimiter(object):
+    """Spaces ``acquire(n)`` calls of all threads out to ``rate`` units
+    per second; 0 for no limit. Every call reserves the next free slot
+    and sleeps until it comes, so bursts are never larger than one call.
+    """
+
+    def __init__(self, rate, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self.clock = clock
+        self.sleep = sleep
+        self._next = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = self.clock()
+            start = max(self._next, now)
+            self._next = start + float(n) / self.rate
+        wait = start - now
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+def guess_format(path):
+    return CSV if path.endswith(".csv") else JSONL
+
+
+def warm(src, store=None, cache=None, fmt=JSONL, ttl=scoring.SCORE_TTL,
+         workers=WORKERS, rate=RATE, batch_size=BATCH_SIZE, chunk_size=None,
+         progress_interval=PROGRESS_INTERVAL):
+    """Load the scores of every record of ``src`` into ``store`` (with
+    ``cache_set_many``) and/or ``cache`` (an LRUCache), both with
+    ``ttl``. Records scoring 0 are skipped, ``get_score`` takes a cached
+    0 for a miss anyway, and so are the invalid ones, see
+    ``bulk_score.to_valid_columns``. ``rate`` limits the store writes
+    per second, every chunk of ``chunk_size`` waits for its turn.
+    Returns the number of records read and of the invalid ones.
+    """
+    batches = bulk_score.read_batches(src, fmt, batch_size)
+    header = next(batches)
+    dates = {}
+    limiter = RateLimiter(rate)
+    if store is not None:
+        chunk_size = chunk_size or getattr(store, "chunk_size", CHUNK_SIZE)
+
+    def load(item):
+        batch, offset = item
+        columns, _, invalid = bulk_score.to_valid_columns(batch, header,
+                                                          dates)
+        bulk_score.log_invalid(invalid, offset)
+        keys, scores = scoring.score_items(*columns)
+        items = [(key, score, ttl) for key, score in zip(keys, scores)
+                 if score]
+        if store is not None:
+            for i in range(0, len(items), chunk_size):
+                chunk = items[i:i + chunk_size]
+                limiter.acquire(len(chunk))
+                store.cache_set_many(chunk, chunk_size)
+        if cache is not None:
+            for key, score, _ in items:
+                cache.set(key, score, ttl)
+        return len(batch), len(invalid)
+
+    def numbered(batches):
+        # the offset of each batch numbers its skipped records
+        offset = 0
+        for batch in batches:
+            yield batch, offset
+            offset += len(batch)
+
+    total = skipped = 0
+    start = last = time.time()
+    for count, invalid in replay.ordered_map(load, numbered(batches),
+                                             workers):
+        total += count
+        skipped += invalid
+        now = time.time()
+        if now - last >= progress_interval:
+            last = now
+            logging.info("Warm-up: %s records, %.0f records/s" %
+                         (total, total / (now - start)))
+    elapsed = time.time() - start
+    logging.info("Warmed up %s records in %.2fs (%.0f records/s), "
+                 "%s invalid skipped" %
+                 (total - skipped, elapsed,
+                  total / elapsed if elapsed else 0, skipped))
+    return total, skipped
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("-i", "--input", action="store", default="-")
+    op.add_option("--format", action="store", type="choice",
+                  choices=FORMATS, default=None,
+                  help="input format, guessed from the file name")
+    op.add_option("--store", action="store", type="choice",
+                  choices=BACKENDS, default=TARANTOOL)
+    op.add_option("--store-host", action="store", default=HOST)
+    op.add_option("--store-port", action="store", type=int, default=None,
+                  help="defaults to the backend's standard port")
+    op.add_option("--ttl", action="store", type=int,
+                  default=scoring.SCORE_TTL)
+    op.add_option("--workers", action="store", type=int, default=WORKERS)
+    op.add_option("--rate", action="store", type=float, default=RATE,
+                  help="store writes per second, 0 for no limit")
+    op.add_option("--batch-size", action="store", type=int,
+                  default=BATCH_SIZE)
+    op.add_option("--chunk-size", action="store", type=int,
+                  default=CHUNK_SIZE)
+    op.add_option("--progress-interval", action="store", type=float,
+                  default=PROGRESS_INTERVAL)
+    (opts, args) = op.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='[%(asctime)s] %(levelname).1s %(message)s',
+                        datefmt='%Y.%m.%d %H:%M:%S')
+    src = sys.stdin if opts.input == "-" else open(opts.input)
+    store = make_store(opts.store, opts.store_host, opts.store_port,
+                       pool_size=opts.workers, chunk_size=opts.chunk_size)
+    store.connect()
+    warm(src, store, fmt=opts.format or guess_format(opts.input),
+         ttl=opts.ttl, workers=opts.workers, rate=opts.rate,
+         batch_size=opts.batch_size, chunk_size=opts.chunk_size,
+         progress_interval=opts.progress_interval)
+    store.close()
@@ -0,0 +1,151 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+FLUSH_INTERVAL = 0.1
+FLUSH_SIZE = 100
+QUEUE_SIZE = 10000
+BLOCK_TIMEOUT = 0.05
+DROP = "drop"
+BLOCK = "block"
+POLICIES = (DROP, BLOCK)
+
+
+class WriteBehindStore(object):
+    """Store wrapper taking ``cache_set`` off the request path.
+
+    Writes are put on a bounded queue keyed by uid, so repeated writes of
+    a key before a flush are coalesced into one. A background thread
+    flushes the queue to the store with ``cache_set_many`` every
+    ``flush_interval`` seconds or as soon as ``flush_size`` keys are
+    pending. When the queue is full a write is either dropped at once
+    (``drop``) or waits up to ``block_timeout`` for room (``block``).
+    """
+
+    def __init__(self, store, flush_interval=FLUSH_INTERVAL,
+                 flush_size=FLUSH_SIZE, queue_size=QUEUE_SIZE, policy=DROP,
+                 block_timeout=BLOCK_TIMEOUT, log=True):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.queue_size = queue_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.log = log
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_errors = 0
+        self._pending = OrderedDict()
+        self._cond = threading.Condition(threading.Lock())
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="write-behind")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def cache_get(self, key):
+        # read-your-writes for values not flushed yet
+        with self._cond:
+            item = self._pending.get(key)
+        if item is not None:
+            return item[0]
+        return self.store.cache_get(key)
+
+    def cache_get_many(self, keys, chunk_size=None):
+        with self._cond:
+            pending = [self._pending.get(key) for key in keys]
+        missing = [i for i, item in enumerate(pending) if item is None]
+        values = [item[0] if item is not None else None for item in pending]
+        if missing:
+            fetched = self.store.cache_get_many([keys[i] for i in missing],
+                                                chunk_size)
+            for i, value in zip(missing, fetched):
+                values[i] = value
+        return values
+
+    def cache_set(self, key, value, ttl):
+        with self._cond:
+            if key in self._pending:
+                self._pending[key] = (value, ttl)
+                self.coalesced += 1
+                return True
+            deadline = time.time() + self.block_timeout
+            while len(self._pending) >= self.queue_size:
+                remaining = deadline - time.time()
+                if self.policy == DROP or remaining <= 0:
+                    self.dropped += 1
+                    return None
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+            self._pending[key] = (value, ttl)
+            self.enqueued += 1
+            if len(self._pending) >= self.flush_size:
+                self._cond.notify_all()
+        return True
+
+    def _take(self):
+        items = []
+        while self._pending and len(items) < self.flush_size:
+            key, (value, ttl) = self._pending.popitem(last=False)
+            items.append((key, value, ttl))
+        self._cond.notify_all()
+        return items
+
+    def _flush(self, items):
+        try:
+            self.store.cache_set_many(items)
+        except Exception as e:
+            with self._cond:
+                self.flush_errors += 1
+            if self.log:
+                logging.warning("Store write-behind flush error: %s" % e)
+            return
+        with self._cond:
+            self.flushed += len(items)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._pending) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                items = self._take()
+                if not items and not self._running:
+                    return
+            if items:
+                self._flush(items)
+
+    def flush(self):
+        while True:
+            with self._cond:
+                items = self._take()
+            if not items:
+                return
+            self._flush(items)
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+        close = getattr(self.store, "close", None)
+        if close:
+            close()
+
+    def stats(self):
+        stats = dict(self.store.stats())
+        with self._cond:
+            stats.update({
+                "write_queue": len(self._pending),
+                "write_enqueued": self.enqueued,
+                "write_coalesced": self.coalesced,
+                "write_dropped": self.dropped,
+                "write_flushed": self.flushed,
+                "write_flush_errors": self.flush_errors,
+            })
+        return stats
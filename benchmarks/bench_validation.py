@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Micro-benchmark of request validation (CommonRequest.check_data).
+
+    $ python2 benchmarks/bench_validation.py [-n NUMBER]
+"""
+
+import os
+import sys
+import json
+import timeit
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from api import api  # noqa: E402
+
+CASES = (
+    (api.MethodRequest, {
+        "account": "horns&hoofs", "login": "h&f", "method": "online_score",
+        "token": "55cc9ce545bcd144300fe9efc28e65d415b923ebb6be1e19d2750a2c",
+        "arguments": {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+    }),
+    (api.OnlineScoreRequest, {
+        "phone": "79175002040", "email": "stupnikov@otus.ru", "gender": 1,
+        "birthday": "01.01.2000", "first_name": "a", "last_name": "b",
+    }),
+    (api.ClientsInterestsRequest, {
+        "client_ids": list(range(10)), "date": "20.07.2017",
+    }),
+)
+
+
+def bench(number):
+    results = {}
+    for cls, arguments in CASES:
+        def check():
+            cls().check_data(arguments)
+        best = min(timeit.repeat(check, number=number, repeat=3))
+        results[cls.__name__] = round(best / number * 1e6, 3)
+    return results
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("-n", "--number", action="store", type=int, default=20000)
+    (opts, args) = op.parse_args()
+    print(json.dumps({"us_per_check": bench(opts.number)}, sort_keys=True))
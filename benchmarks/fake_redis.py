@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""In-process stand-in for a Redis server backing api/redis_store.py.
+
+Speaks the subset of RESP the RedisStore uses (PING, GET, MGET, SET with
+EX, DEL, FLUSHDB) over a TTLDict, seeded with the interests of client 1
+like api/tt/store.lua.
+
+    $ python2 benchmarks/fake_redis.py [-p PORT]
+"""
+
+import os
+import sys
+import socket
+import threading
+import SocketServer
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from api import resp  # noqa: E402
+from api.memory_store import TTLDict  # noqa: E402
+
+SEED = {"i:1": '["travel", "books"]'}
+COMMANDS = {"ping": "ping", "get": "get", "mget": "mget", "set": "set",
+            "del": "delete", "flushdb": "flushdb"}
+
+
+class Database(object):
+    def __init__(self):
+        self.data = TTLDict()
+        for key, value in SEED.items():
+            self.data.set(key, value)
+
+    def ping(self):
+        return "PONG"
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, *options):
+        ttl = None
+        if options:
+            if len(options) != 2 or options[0].upper() != "EX":
+                raise resp.ReplyError("ERR syntax error")
+            ttl = int(options[1])
+        self.data.set(key, value, ttl)
+        return "OK"
+
+    def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self.data.get(key) is not None:
+                deleted += 1
+            self.data.delete(key)
+        return deleted
+
+    def flushdb(self):
+        self.data = TTLDict()
+        return "OK"
+
+    def execute(self, command):
+        if not isinstance(command, list) or not command:
+            return resp.ReplyError("ERR protocol error")
+        name = command[0].lower()
+        if name not in COMMANDS:
+            return resp.ReplyError("ERR unknown command '%s'" % command[0])
+        try:
+            return getattr(self, COMMANDS[name])(*command[1:])
+        except resp.ReplyError as e:
+            return e
+        except (TypeError, ValueError):
+            return resp.ReplyError("ERR wrong number of arguments for '%s' "
+                                   "command" % command[0])
+
+
+class RespHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        self.request.setsockopt(socket.SOL_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                command = resp.read_reply(self.rfile)
+            except (resp.StoreNetworkError, socket.error, ValueError):
+                return
+            reply = self.server.db.execute(command)
+            self.server.requests += 1
+            try:
+                self.wfile.write(resp.pack_reply(reply))
+            except socket.error:
+                return
+
+
+class FakeRedis(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address=("localhost", 0)):
+        SocketServer.ThreadingTCPServer.__init__(self, server_address,
+                                                 RespHandler)
+        self.db = Database()
+        self.requests = 0
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("-p", "--port", action="store", type=int, default=6379)
+    (opts, args) = op.parse_args()
+    server = FakeRedis(("localhost", opts.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""In-process stand-in for the Tarantool instance from api/tt/store.lua.
+
+Speaks enough of the iproto binary protocol for tarantool-python and
+AsyncStore: greeting, PING, schema SELECTs and CALL of the functions
+defined in store.lua, implemented in Python over dicts.
+
+    $ python2 benchmarks/fake_tarantool.py [-p PORT] [--latency MS]
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import threading
+import SocketServer
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from api import iproto  # noqa: E402
+
+INTERESTS = ["cars", "pets", "travel", "hi-tech", "sport", "music", "books",
+             "tv", "cinema", "geek", "otus"]
+SCORE_SPACE_ID = 512
+VSPACE_ID = 281
+VINDEX_ID = 289
+SCORE_SPACE = [SCORE_SPACE_ID, 1, "score", "memtx", 0, {},
+               [{"name": "uid", "type": "string"},
+                {"name": "score", "type": "scalar"},
+                {"name": "timestamp", "type": "unsigned"},
+                {"name": "expired_period", "type": "unsigned"}]]
+SCORE_INDEX = [SCORE_SPACE_ID, 0, "primary", "hash", {"unique": True},
+               [[0, "string"]]]
+
+
+class LuaError(Exception):
+    pass
+
+
+class Database(object):
+    """Python port of the stored procedures in api/tt/store.lua."""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.clients_interests = {1: (3, 7)}
+        self.score = {}
+
+    def _key(self, req):
+        parts = [p for p in unicode(req).split(":") if p]
+        if len(parts) < 2:
+            raise LuaError("attempt to index a nil value")
+        return parts[1]
+
+    def get_interests(self, req):
+        try:
+            cid = int(self._key(req))
+        except ValueError:
+            raise LuaError("attempt to compare nil with number")
+        if cid > 1000:
+            return None
+        if cid < 0:
+            raise LuaError("Tuple field 1 type does not match one required "
+                           "by operation: expected unsigned")
+        with self.lock:
+            if cid not in self.clients_interests:
+                self.clients_interests[cid] = (self.random.randint(1, 11),
+                                               self.random.randint(1, 11))
+            i1, i2 = self.clients_interests[cid]
+        return [INTERESTS[i1 - 1], INTERESTS[i2 - 1]]
+
+    def get_interests_many(self, reqs):
+        result = []
+        for req in reqs:
+            try:
+                result.append(self.get_interests(req))
+            except LuaError:
+                result.append(None)
+        return result
+
+    def cache_set_score(self, req, score, ttl):
+        with self.lock:
+            self.score[self._key(req)] = (score, int(time.time()), ttl)
+
+    def cache_set_score_many(self, items):
+        for req, score, ttl in items:
+            self.cache_set_score(req, score, ttl)
+        return len(items)
+
+    def cache_get_score(self, req):
+        uid = self._key(req)
+        with self.lock:
+            item = self.score.get(uid)
+            if item is None:
+                return None
+            score, timestamp, ttl = item
+            if time.time() - timestamp > ttl:
+                del self.score[uid]
+                return None
+        return score
+
+    def cache_get_score_many(self, reqs):
+        return [self.cache_get_score(req) for req in reqs]
+
+    def delete_score(self, key):
+        with self.lock:
+            item = self.score.pop(key[0] if key else None, None)
+        return [key[0]] + list(item) if item else None
+
+    def call(self, name, args):
+        functions = {
+            "get_interests": self.get_interests,
+            "get_interests_many": self.get_interests_many,
+            "cache_set_score": self.cache_set_score,
+            "cache_set_score_many": self.cache_set_score_many,
+            "cache_get_score": self.cache_get_score,
+            "cache_get_score_many": self.cache_get_score_many,
+            "box.space.score:delete": lambda *key: self.delete_score(key),
+            "box.info": lambda: {"status": "running"},
+        }
+        if name not in functions:
+            raise LuaError("Procedure '%s' is not defined" % name)
+        try:
+            return functions[name](*args)
+        except TypeError as e:
+            raise LuaError(str(e))
+
+
+class IprotoHandler(SocketServer.BaseRequestHandler):
+    def handle(self):
+        self.request.setsockopt(socket.SOL_TCP, socket.TCP_NODELAY, 1)
+        self.request.sendall(iproto.greeting())
+        buf = ""
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except socket.error:
+                return
+            if not data:
+                return
+            buf += data
+            packets, buf = iproto.unpack_packets(buf)
+            if packets and self.server.latency:
+                time.sleep(self.server.latency)
+            out = [self.respond(header, body) for header, body in packets]
+            self.server.requests += len(packets)
+            try:
+                self.request.sendall("".join(out))
+            except socket.error:
+                return
+
+    def respond(self, header, body):
+        sync = header.get(iproto.SYNC, 0)
+        code = header.get(iproto.CODE)
+        db = self.server.db
+        try:
+            if code == iproto.REQUEST_PING:
+                return iproto.pack_response(sync)
+            if code == iproto.REQUEST_SELECT:
+                return iproto.pack_response(sync, self.select(body))
+            if code == iproto.REQUEST_DELETE:
+                deleted = db.delete_score(body.get(iproto.KEY))
+                return iproto.pack_response(sync, [deleted] if deleted else [])
+            if code == iproto.REQUEST_CALL:
+                result = db.call(body.get(iproto.FUNCTION_NAME),
+                                 body.get(iproto.TUPLE, []))
+                return iproto.pack_response(sync, [result])
+        except LuaError as e:
+            return iproto.pack_response(sync, error=str(e))
+        return iproto.pack_response(sync, error="Unsupported request type")
+
+    def select(self, body):
+        space = body.get(iproto.SPACE_ID)
+        key = body.get(iproto.KEY) or []
+        if space == VSPACE_ID:
+            if not key or key[0] in (SCORE_SPACE_ID, "score"):
+                return [SCORE_SPACE]
+            return []
+        if space == VINDEX_ID:
+            if not key or key[0] == SCORE_SPACE_ID:
+                return [SCORE_INDEX]
+            return []
+        return []
+
+
+class FakeTarantool(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address=("localhost", 0), latency=0, seed=0):
+        SocketServer.ThreadingTCPServer.__init__(self, server_address,
+                                                 IprotoHandler)
+        self.db = Database(seed)
+        self.latency = latency
+        self.requests = 0
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("-p", "--port", action="store", type=int, default=33013)
+    op.add_option("--latency", action="store", type=float, default=0,
+                  help="extra latency per request batch, ms")
+    (opts, args) = op.parse_args()
+    server = FakeTarantool(("localhost", opts.port), opts.latency / 1000.0)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
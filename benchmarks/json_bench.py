@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Cost of building a clients_interests response body per request.
+
+Compares the old path (store values rendered with ``str`` and quote
+replacement, decoded with ``json.loads``, response encoded with
+``json.dumps``) with native store lists encoded by ``fastjson``:
+
+    $ python2 benchmarks/json_bench.py [--clients 1000] [-n 200]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from api import fastjson  # noqa: E402
+from benchmarks.fake_tarantool import INTERESTS  # noqa: E402
+
+
+def old_path(values):
+    strings = [str(v).replace("'", '"') for v in values]
+    interests = [json.loads(s) if s else [] for s in strings]
+    return json.dumps(dict((str(i), v) for i, v in enumerate(interests)))
+
+
+def new_path(values):
+    interests = [list(v) for v in values]
+    return fastjson.dumps(dict((str(i), v) for i, v in enumerate(interests)))
+
+
+def measure(func, values, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        func(values)
+    return (time.time() - start) / repeat
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("--clients", action="store", type=int, default=1000)
+    op.add_option("-n", "--repeat", action="store", type=int, default=200)
+    (opts, args) = op.parse_args()
+    rnd = random.Random(0)
+    # tarantool-python hands tuples over as lists of byte strings
+    values = [[rnd.choice(INTERESTS), rnd.choice(INTERESTS)]
+              for _ in range(opts.clients)]
+    old = measure(old_path, values, opts.repeat)
+    new = measure(new_path, values, opts.repeat)
+    print(json.dumps({
+        "clients": opts.clients,
+        "json": fastjson.NAME,
+        "old_ms": round(old * 1000, 3),
+        "new_ms": round(new * 1000, 3),
+        "saved_ms": round((old - new) * 1000, 3),
+    }, sort_keys=True))
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Load generator for the scoring API.
+
+Unless ``--url`` points to a running server, starts the API server
+in-process over the ``--store`` backend (with the fake Tarantool or
+Redis stand-in behind it), then replays a mix of online_score and
+clients_interests requests over keep-alive connections from
+``--concurrency`` threads. Prints a JSON report with throughput and
+latency percentiles, so runs can be diffed between changes:
+
+    $ python2 benchmarks/loadgen.py -c 8 -d 10 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import httplib
+import threading
+import urlparse
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from api import api, server  # noqa: E402
+from api.backends import make_store, BACKENDS, TARANTOOL, REDIS  # noqa
+from benchmarks.fake_tarantool import FakeTarantool  # noqa: E402
+from benchmarks.fake_redis import FakeRedis  # noqa: E402
+
+ACCOUNT = "horns&hoofs"
+LOGIN = "h&f"
+FIRST_NAMES = ["Vasiliy", "Ivan", "Anna", "Maria"]
+LAST_NAMES = ["Ivanov", "Petrov", "Sidorova", "Smirnova"]
+PERCENTILES = (50, 95, 99)
+
+
+def online_score_request(rnd):
+    arguments = {
+        "phone": "7%010d" % rnd.randint(0, 10 ** 10 - 1),
+        "email": "user%s@otus.ru" % rnd.randint(0, 10000),
+        "first_name": rnd.choice(FIRST_NAMES),
+        "last_name": rnd.choice(LAST_NAMES),
+    }
+    if rnd.random() < 0.5:
+        arguments.update(gender=rnd.randint(0, 2), birthday="01.01.1990")
+    return "online_score", arguments
+
+
+def clients_interests_request(rnd, clients):
+    ids = [rnd.randint(0, 1000) for _ in range(clients)]
+    return "clients_interests", {"client_ids": ids, "date": "20.07.2017"}
+
+
+def make_body(rnd, opts):
+    if rnd.random() < opts.interests_ratio:
+        method, arguments = clients_interests_request(rnd, opts.clients)
+    else:
+        method, arguments = online_score_request(rnd)
+    return json.dumps({
+        "account": ACCOUNT, "login": LOGIN, "method": method,
+        "token": hashlib.sha512(ACCOUNT + LOGIN + api.SALT).hexdigest(),
+        "arguments": arguments,
+    })
+
+
+def percentile(sorted_values, p):
+    index = int(round(p / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class Client(threading.Thread):
+    """Sends requests over one keep-alive connection until ``deadline``
+    or until ``requests`` are done, reconnecting when the server closes
+    the connection.
+    """
+
+    def __init__(self, host, port, path, opts, deadline, seed):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.host, self.port, self.path = host, port, path
+        self.opts = opts
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.latencies = []
+        self.codes = {}
+        self.errors = 0
+        self.connection = None
+
+    def request(self, body):
+        if self.connection is None:
+            self.connection = httplib.HTTPConnection(self.host, self.port,
+                                                     timeout=10)
+        self.connection.request("POST", self.path, body,
+                                {"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        response.read()
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status
+
+    def run(self):
+        for _ in xrange(self.opts.requests):
+            if time.time() > self.deadline:
+                break
+            body = make_body(self.random, self.opts)
+            start = time.time()
+            try:
+                code = self.request(body)
+            except (httplib.HTTPException, IOError):
+                self.errors += 1
+                if self.connection is not None:
+                    self.connection.close()
+                    self.connection = None
+                continue
+            self.latencies.append(time.time() - start)
+            self.codes[code] = self.codes.get(code, 0) + 1
+        if self.connection is not None:
+            self.connection.close()
+
+
+def start_api(opts):
+    """Start the store stand-in and the API server behind it.
+
+    Returns the API port, the stand-in (None for the memory backend) and
+    a function stopping both.
+    """
+    backend = None
+    if opts.store == TARANTOOL:
+        backend = FakeTarantool(latency=opts.tarantool_latency / 1000.0)
+    elif opts.store == REDIS:
+        backend = FakeRedis()
+    if backend is not None:
+        backend.start()
+
+    class Handler(api.MainHTTPHandler):
+        store = make_store(opts.store, log=False,
+                           port=backend.port if backend else None,
+                           pool_size=max(opts.pool_size, opts.workers))
+
+        def log_message(self, format, *args):
+            pass
+
+    Handler.store.connect()
+    httpd = server.make_server(("localhost", 0), Handler,
+                               workers=opts.workers)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    def stop():
+        httpd.shutdown()
+        httpd.server_close()
+        Handler.store.close()
+        if backend is not None:
+            backend.stop()
+
+    return httpd.server_address[1], backend, stop
+
+
+def run(opts):
+    backend = None
+    stop = None
+    if opts.url:
+        url = urlparse.urlparse(opts.url)
+        host, port, path = url.hostname, url.port or 80, url.path or "/method"
+    else:
+        port, backend, stop = start_api(opts)
+        host, path = "localhost", "/method"
+
+    deadline = time.time() + opts.duration
+    clients = [Client(host, port, path, opts, deadline, opts.seed + i)
+               for i in range(opts.concurrency)]
+    start = time.time()
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    elapsed = time.time() - start
+    if stop is not None:
+        stop()
+
+    latencies = sorted(l for c in clients for l in c.latencies)
+    codes = {}
+    for c in clients:
+        for code, count in c.codes.items():
+            codes[str(code)] = codes.get(str(code), 0) + count
+    report = {
+        "concurrency": opts.concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": sum(c.errors for c in clients),
+        "codes": codes,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {},
+    }
+    if latencies:
+        for p in PERCENTILES:
+            report["latency_ms"]["p%s" % p] = round(
+                percentile(latencies, p) * 1000, 3)
+        report["latency_ms"]["max"] = round(latencies[-1] * 1000, 3)
+    if backend is not None:
+        report["store_requests"] = backend.requests
+    return report
+
+
+if __name__ == "__main__":
+    op = OptionParser()
+    op.add_option("--url", action="store", default=None,
+                  help="target a running server instead of starting one")
+    op.add_option("-c", "--concurrency", action="store", type=int, default=4)
+    op.add_option("-d", "--duration", action="store", type=float, default=5)
+    op.add_option("-n", "--requests", action="store", type=int,
+                  default=10 ** 9, help="requests per client")
+    op.add_option("--interests-ratio", action="store", type=float,
+                  default=0.5)
+    op.add_option("--clients", action="store", type=int, default=10,
+                  help="client ids per clients_interests request")
+    op.add_option("-w", "--workers", action="store", type=int, default=4)
+    op.add_option("--store", action="store", type="choice",
+                  choices=BACKENDS, default=TARANTOOL)
+    op.add_option("--pool-size", action="store", type=int, default=4)
+    op.add_option("--tarantool-latency", action="store", type=float,
+                  default=0, help="ms")
+    op.add_option("--seed", action="store", type=int, default=0)
+    (opts, args) = op.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run(opts), sort_keys=True))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import socket
+import hashlib
+import httplib
+import unittest
+
+from api import api
+from api.async_server import AsyncHTTPServer
+from api.async_store import EventLoop
+from tests.cases import cases
+from tests.unit.test_stream import SlowStore
+
+INVALID = json.dumps({"login": "h&f"})
+INTERESTS = json.dumps({
+    "account": "horns&hoofs", "login": "h&f", "method": "clients_interests",
+    "token": hashlib.sha512("horns&hoofsh&f" + api.SALT).hexdigest(),
+    "arguments": {"client_ids": [1]}})
+
+
+def request(path, body, version="HTTP/1.1", headers=()):
+    lines = ["POST %s %s" % (path, version),
+             "Content-Length: %s" % len(body)]
+    lines.extend("%s: %s" % header for header in headers)
+    return "\r\n".join(lines) + "\r\n\r\n" + body
+
+
+class TestAsyncHTTPServer(unittest.TestCase):
+    def setUp(self):
+        self.loop = EventLoop(timeout=0.05)
+        # lookups take a while, later requests would overtake them
+        store = SlowStore(0.1, interests={"i:1": ["travel"]})
+        self.server = AsyncHTTPServer(("localhost", 0), self.loop, store,
+                                      workers=4)
+        self.port = self.server.socket.getsockname()[1]
+        self.loop.start()
+        self.sock = socket.create_connection(("localhost", self.port), 5)
+
+    def tearDown(self):
+        self.sock.close()
+        self.loop.stop()
+        self.server.close()
+
+    def read_response(self):
+        response = httplib.HTTPResponse(self.sock)
+        response.begin()
+        return response, response.read()
+
+    def assert_closed(self):
+        self.assertEqual(self.sock.recv(1), "")
+
+    def test_keep_alive(self):
+        for _ in range(3):
+            self.sock.sendall(request("/method", INVALID))
+            response, data = self.read_response()
+            self.assertEqual(response.status, api.INVALID_REQUEST)
+            self.assertEqual(response.getheader("Connection"), "keep-alive")
+            self.assertEqual(json.loads(data)["code"], api.INVALID_REQUEST)
+
+    def test_pipelined_responses_in_order(self):
+        self.sock.sendall(request("/method", INTERESTS) +
+                          request("/unknown", INVALID) +
+                          request("/method", "{") +
+                          request("/method", INVALID))
+        codes = []
+        for _ in range(4):
+            response, data = self.read_response()
+            codes.append(response.status)
+            self.assertEqual(json.loads(data)["code"], response.status)
+        self.assertEqual(codes, [api.OK, api.NOT_FOUND, api.BAD_REQUEST,
+                                 api.INVALID_REQUEST])
+
+    @cases([
+        ("HTTP/1.1", (("Connection", "close"),)),
+        ("HTTP/1.0", ()),
+    ])
+    def test_connection_close(self, version, headers):
+        self.sock.sendall(request("/method", INVALID, version, headers))
+        response, _ = self.read_response()
+        self.assertEqual(response.status, api.INVALID_REQUEST)
+        self.assertEqual(response.getheader("Connection"), "close")
+        self.assert_closed()
+        self.sock = socket.create_connection(("localhost", self.port), 5)
+
+    def test_http10_keep_alive(self):
+        self.sock.sendall(request("/method", INVALID, "HTTP/1.0",
+                                  (("Connection", "keep-alive"),)))
+        response, _ = self.read_response()
+        self.assertEqual(response.getheader("Connection"), "keep-alive")
+        self.sock.sendall(request("/method", INVALID))
+        response, _ = self.read_response()
+        self.assertEqual(response.status, api.INVALID_REQUEST)
+
+    def test_bad_request_line(self):
+        self.sock.sendall("GARBAGE\r\n\r\n")
+        response, data = self.read_response()
+        self.assertEqual(response.status, api.BAD_REQUEST)
+        self.assertEqual(json.loads(data)["code"], api.BAD_REQUEST)
+        self.assertEqual(response.getheader("Connection"), "close")
+        self.assert_closed()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from api import backends, resp, store
+from api.redis_store import RedisStore
+from benchmarks.fake_redis import FakeRedis
+from tests.cases import cases
+
+
+class TestRedisStore(unittest.TestCase):
+    """RedisStore against the local RESP stand-in."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.redis = FakeRedis().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redis.stop()
+
+    def setUp(self):
+        self.store = backends.make_store(backends.REDIS, log=False,
+                                         port=self.redis.port)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_get(self):
+        self.assertTrue(self.store.connect())
+        self.assertEqual(self.store.get("i:1"), ["travel", "books"])
+        self.assertIsNone(self.store.get("i:2"))
+
+    def test_get_many(self):
+        self.store.set_interests("i:3", ["cars", "pets"])
+        self.assertEqual(self.store.get_many(["i:1", "i:-1", "i:3"],
+                                             chunk_size=2),
+                         [["travel", "books"], None, ["cars", "pets"]])
+
+    @cases([1, 100])
+    def test_cache_set_get_delete(self, chunk_size):
+        self.store.cache_set_many([("uid:a", 1.5, 3600), ("uid:b", 3, 3600)],
+                                  chunk_size)
+        self.assertEqual(self.store.cache_get_many(["uid:a", "uid:x",
+                                                    "uid:b"], chunk_size),
+                         [1.5, None, 3.0])
+        self.store.cache_delete("uid:a")
+        self.assertIsNone(self.store.cache_get("uid:a"))
+
+    def test_error_reply(self):
+        with self.store.pool.connection() as conn:
+            self.assertRaises(resp.ReplyError, conn.execute, "SET", "a")
+            self.assertEqual(conn.execute("PING"), "PONG")
+
+    def test_unavailable_server(self):
+        unavailable = RedisStore(log=False, port=1, breaker_threshold=1)
+        self.assertFalse(unavailable.connect())
+        self.assertRaises(store.CircuitOpen, unavailable.get, "i:1")
+        self.assertIsNone(unavailable.cache_get("uid:a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+from tarantool import DatabaseError
+
+from api import store, deadline
+from api.async_store import AsyncStore
+from benchmarks.fake_tarantool import FakeTarantool
+from tests.cases import cases
+
+
+class TestFakeTarantool(unittest.TestCase):
+    """The benchmark stand-in must behave like api/tt/store.lua."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tarantool = FakeTarantool().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tarantool.stop()
+
+    def setUp(self):
+        self.store = store.Store(log=False, port=self.tarantool.port)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_get_existent_cid(self):
+        self.assertEqual(self.store.get("i:1"), ["travel", "books"])
+
+    @cases(["i:-1", "i:qwerty"])
+    def test_get_nonexistent_cid(self, key):
+        self.assertRaises(DatabaseError, self.store.get, key)
+
+    def test_get_many(self):
+        self.assertEqual(self.store.get_many(["i:1", "i:-1", "i:1001"]),
+                         [["travel", "books"], None, None])
+
+    def test_get_many_negative_cache(self):
+        self.store.get_many(["i:1", "i:1002"])
+        requests = self.tarantool.requests
+        self.assertEqual(self.store.get_many(["i:1002"]), [None])
+        self.assertEqual(self.tarantool.requests, requests)
+        self.assertEqual(self.store.get_many(["i:1002", "i:1", "i:1002"]),
+                         [None, ["travel", "books"], None])
+        self.assertEqual(self.store.stats()["negative_size"], 1)
+
+    def test_deadline_limits_store_calls(self):
+        slow = FakeTarantool(latency=0.3).start()
+        slow_store = store.Store(log=False, port=slow.port,
+                                 breaker_threshold=1)
+        try:
+            self.assertTrue(slow_store.connect())
+            start = time.time()
+            with deadline.scope(start + 0.05):
+                self.assertRaises(deadline.DeadlineExceeded,
+                                  slow_store.get_many, ["i:1"])
+            self.assertLess(time.time() - start, 0.2)
+            self.assertEqual(slow_store.breaker.state, "closed")
+        finally:
+            slow_store.close()
+            slow.stop()
+
+    def test_cache_set_get_delete(self):
+        self.store.cache_set_many([("uid:fake", 1.5, 3600)])
+        self.assertEqual(self.store.cache_get("uid:fake"), 1.5)
+        self.store.cache_delete("fake")
+        self.assertIsNone(self.store.cache_get("uid:fake"))
+
+    def test_cache_get_many(self):
+        self.store.cache_set_many([("uid:fake_many", 2.5, 3600)])
+        self.assertEqual(
+            self.store.cache_get_many(["uid:fake_many", "uid:none"],
+                                      chunk_size=1),
+            [2.5, None])
+
+    def test_async_store(self):
+        async_store = AsyncStore(log=False, port=self.tarantool.port)
+        try:
+            self.assertIsNotNone(async_store.get("i:1"))
+            async_store.cache_set("uid:fake_async", 3.0, 3600)
+            self.assertEqual(async_store.cache_get("uid:fake_async"), 3.0)
+        finally:
+            async_store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
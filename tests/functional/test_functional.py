@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
 import hashlib
 import datetime
 import unittest
 
-from api import api, store
+from api import api, store, breaker
 from tests.cases import cases
 
 
@@ -18,6 +19,10 @@ class TestSuite(unittest.TestCase):
     def get_response(self, request):
         return api.method_handler({"body": request, "headers": self.headers}, self.context, self.store)
 
+    def get_batch_response(self, requests):
+        self.context["request_id"] = "batch"
+        return api.batch_handler({"body": requests, "headers": self.headers}, self.context, self.store)
+
     def set_valid_auth(self, request):
         if request.get("login") == api.ADMIN_LOGIN:
             request["token"] = hashlib.sha512(datetime.datetime.now().strftime("%Y%m%d%H") + api.ADMIN_SALT).hexdigest()
@@ -171,6 +176,63 @@ class TestSuite(unittest.TestCase):
         score = response.get("score")
         self.assertEqual(score, 42)
 
+    @cases([{}, "", 1, [{}] * (api.MAX_BATCH_SIZE + 1)])
+    def test_invalid_batch_request(self, requests):
+        response, code = self.get_batch_response(requests)
+        self.assertEqual(api.INVALID_REQUEST, code)
+        self.assertTrue(len(response))
+
+    @cases([
+        {"method": "clients_interests", "arguments": {"client_ids": [1, 2]}},
+        {"method": "online_score", "arguments": {"phone": "79175002040", "email": "stupnikov@otus.ru"}},
+    ])
+    def test_deadline_exceeded(self, request):
+        request.update({"account": "horns&hoofs", "login": "h&f"})
+        self.set_valid_auth(request)
+        self.context["deadline"] = time.time() - 1
+        response, code = self.get_response(request)
+        self.assertEqual(api.GATEWAY_TIMEOUT, code)
+        self.assertEqual(self.store.breaker.state, breaker.CLOSED)
+
+    def test_batch_request(self):
+        requests = [
+            {"account": "horns&hoofs", "login": "h&f", "method": "online_score",
+             "arguments": {"phone": "79175002040", "email": "stupnikov@otus.ru"}},
+            {"account": "horns&hoofs", "login": "admin", "method": "online_score",
+             "arguments": {"phone": "79175002040", "email": "stupnikov@otus.ru"}},
+            {"account": "horns&hoofs", "login": "h&f", "method": "online_score",
+             "arguments": {"phone": "79175002040"}},
+            {"account": "horns&hoofs", "login": "h&f", "method": "online_score", "token": "",
+             "arguments": {"phone": "79175002040", "email": "stupnikov@otus.ru"}},
+            {"login": "h&f", "method": "clients_interests", "token": "x",
+             "arguments": {"client_ids": [1]}},
+        ]
+        for request in requests[:3]:
+            self.set_valid_auth(request)
+        self.store.disconnect()
+        response, code = self.get_batch_response(requests)
+        self.assertEqual(api.OK, code)
+        self.assertEqual([r["code"] for r in response],
+                         [api.OK, api.OK, api.INVALID_REQUEST, api.FORBIDDEN,
+                          api.INVALID_REQUEST])
+        self.assertEqual(response[0]["response"], {"score": 3.0})
+        self.assertEqual(response[1]["response"], {"score": 42})
+        self.assertEqual(self.context["nitems"], len(requests))
+
+    def test_disconnected_store_batch_interests_request(self):
+        requests = [
+            {"account": "horns&hoofs", "login": "h&f", "method": "clients_interests",
+             "arguments": {"client_ids": [1, 2]}},
+            {"account": "horns&hoofs", "login": "h&f", "method": "clients_interests",
+             "arguments": {"client_ids": [2, 3]}},
+        ]
+        for request in requests:
+            self.set_valid_auth(request)
+        self.store.disconnect()
+        response, code = self.get_batch_response(requests)
+        self.assertEqual(api.OK, code)
+        self.assertEqual([r["code"] for r in response], [api.INTERNAL_ERROR] * 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import hashlib
+import httplib
+import unittest
+import threading
+from BaseHTTPServer import HTTPServer
+
+from api import api, server
+from api.memory_store import MemoryStore
+from tests.cases import cases
+from tests.unit.test_stream import SlowStore
+
+
+class TestHTTPHandler(unittest.TestCase):
+    def setUp(self):
+        class Handler(api.MainHTTPHandler):
+            store = api.Store(log=False)
+            timeout = 1
+            max_requests = 3
+
+            def log_message(self, *args):
+                pass
+
+        self.handler = Handler
+        self.start(server.ThreadPoolHTTPServer(("localhost", 0), Handler,
+                                               workers=4))
+
+    def start(self, httpd):
+        self.server = httpd
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.conn = httplib.HTTPConnection("localhost", self.server.server_port)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def post(self, path, body):
+        self.conn.request("POST", path, body)
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def idle_client(self):
+        # sends one request and leaves its connection open
+        conn = httplib.HTTPConnection("localhost", self.server.server_port)
+        conn.request("POST", "/method", json.dumps({"login": "h&f"}))
+        response = conn.getresponse()
+        response.read()
+        return conn, response
+
+    @cases([
+        ("/method", json.dumps({"login": "h&f"}), api.INVALID_REQUEST),
+        ("/unknown", json.dumps({"login": "h&f"}), api.NOT_FOUND),
+        ("/method", "{", api.BAD_REQUEST),
+    ])
+    def test_response_envelope(self, path, body, code):
+        response, data = self.post(path, body)
+        self.assertEqual(response.status, code)
+        self.assertEqual(int(response.getheader("Content-Length")), len(data))
+        self.assertEqual(json.loads(data)["code"], code)
+
+    def test_keep_alive(self):
+        sockets = []
+        for i in range(self.handler.max_requests - 1):
+            response, _ = self.post("/method", "{}")
+            self.assertFalse(response.will_close)
+            sockets.append(self.conn.sock)
+        self.assertEqual(len(set(sockets)), 1)
+        response, _ = self.post("/method", "{}")
+        self.assertEqual(response.getheader("Connection"), "close")
+
+    @cases([True, False])
+    def test_idle_client_does_not_block_others(self, concurrent):
+        if not concurrent:
+            self.tearDown()
+            self.start(HTTPServer(("localhost", 0), self.handler))
+        idle, response = self.idle_client()
+        try:
+            # a single-threaded server closes instead of keeping it alive
+            self.assertEqual(response.will_close, not concurrent)
+            start = time.time()
+            response, _ = self.post("/method", json.dumps({"login": "h&f"}))
+            self.assertEqual(response.status, api.INVALID_REQUEST)
+            self.assertLess(time.time() - start, self.handler.timeout / 2.0)
+        finally:
+            idle.close()
+
+    def test_metrics(self):
+        self.post("/method", json.dumps({"login": "h&f"}))
+        self.conn.request("GET", "/metrics")
+        response = self.conn.getresponse()
+        data = response.read()
+        self.assertEqual(response.status, api.OK)
+        self.assertIn('method_responses_total{method="unknown",code="422"}',
+                      data)
+        self.assertIn('request_stage_seconds_count{stage="validate"}', data)
+        self.assertIn("store_reconnects ", data)
+
+    @cases([(2, 2), (2, 3), (10, 2)])
+    def test_streamed_interests(self, threshold, batch_size):
+        self.handler.store = MemoryStore(log=False, interests={
+            "i:1": ["travel", "books"], "i:3": ["cars", "pets"]})
+        limits = api.STREAM_THRESHOLD, api.STREAM_BATCH_SIZE
+        api.STREAM_THRESHOLD, api.STREAM_BATCH_SIZE = threshold, batch_size
+        try:
+            request = {"account": "horns&hoofs", "login": "h&f",
+                       "method": "clients_interests",
+                       "token": hashlib.sha512("horns&hoofsh&f" +
+                                               api.SALT).hexdigest(),
+                       "arguments": {"client_ids": [1, 2, 3, 1, 4]}}
+            response, data = self.post("/method", json.dumps(request))
+        finally:
+            api.STREAM_THRESHOLD, api.STREAM_BATCH_SIZE = limits
+        self.assertEqual(response.status, api.OK)
+        self.assertEqual(response.getheader("Transfer-Encoding") == "chunked",
+                         threshold < 5)
+        self.assertEqual(json.loads(data), {"code": api.OK, "response": {
+            "1": ["travel", "books"], "2": [], "3": ["cars", "pets"],
+            "4": []}})
+
+    def test_long_stream_with_default_timeout(self):
+        # 5 batches of 0.5s outlast the whole-request timeout
+        self.handler.store = SlowStore(0.5, interests={"i:1": ["a"]})
+        limits = api.STREAM_THRESHOLD, api.STREAM_BATCH_SIZE
+        api.STREAM_THRESHOLD, api.STREAM_BATCH_SIZE = 2, 2
+        try:
+            request = {"account": "horns&hoofs", "login": "h&f",
+                       "method": "clients_interests",
+                       "token": hashlib.sha512("horns&hoofsh&f" +
+                                               api.SALT).hexdigest(),
+                       "arguments": {"client_ids": range(1, 11)}}
+            start = time.time()
+            response, data = self.post("/method", json.dumps(request))
+        finally:
+            api.STREAM_THRESHOLD, api.STREAM_BATCH_SIZE = limits
+        self.assertGreater(time.time() - start, api.REQUEST_TIMEOUT)
+        self.assertEqual(response.getheader("Transfer-Encoding"), "chunked")
+        response = json.loads(data)["response"]
+        self.assertEqual(len(response), 10)
+        self.assertEqual(response["1"], ["a"])
+
+    def test_admission(self):
+        self.handler.admission = api.AdmissionControl(
+            0, limits={"clients_interests": 0}, retry_after=2)
+        request = {"account": "horns&hoofs", "login": "h&f",
+                   "method": "clients_interests",
+                   "token": hashlib.sha512("horns&hoofsh&f" +
+                                           api.SALT).hexdigest(),
+                   "arguments": {"client_ids": [1]}}
+        response, data = self.post("/method", json.dumps(request))
+        self.assertEqual(response.status, api.SERVICE_UNAVAILABLE)
+        self.assertEqual(response.getheader("Retry-After"), "2")
+        self.assertEqual(json.loads(data)["code"], api.SERVICE_UNAVAILABLE)
+        response, _ = self.post("/method", json.dumps({"login": "h&f"}))
+        self.assertEqual(response.status, api.INVALID_REQUEST)
+        # the slot is released right after the response is sent
+        for _ in range(100):
+            if not self.handler.admission.stats()["inflight"]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.handler.admission.stats()["inflight"], 0)
+        self.conn.request("GET", "/metrics")
+        data = self.conn.getresponse().read()
+        self.assertIn('admission_shed_total{method="clients_interests",'
+                      'reason="method_limit"}', data)
+        self.assertIn("admission_shed 1", data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import signal
+import socket
+import httplib
+import unittest
+import threading
+import subprocess
+
+from api import server
+from tests.cases import cases
+
+# a server process whose GET /<seconds> answers with its pid after
+# <seconds>, prints its port once listening and "stopped" on exit
+SERVER = """
+import os
+import sys
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler
+from api import server
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # a signal cuts time.sleep short, sleep in small steps
+        until = time.time() + float(self.path.strip("/") or 0)
+        while time.time() < until:
+            time.sleep(0.01)
+        body = str(os.getpid())
+        self.send_response(200)
+        self.send_header("Content-Length", len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+httpd = server.make_server(("localhost", 0), Handler, mode=sys.argv[1],
+                           workers=int(sys.argv[2]))
+sys.stdout.write("%s\\n" % httpd.server_address[1])
+sys.stdout.flush()
+server.serve(httpd)
+sys.stdout.write("stopped\\n")
+"""
+
+
+def get(port, seconds=0):
+    conn = httplib.HTTPConnection("localhost", port, timeout=10)
+    try:
+        conn.request("GET", "/%s" % seconds)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def get_concurrently(port, count, seconds):
+    results = [None] * count
+
+    def run(i):
+        results[i] = get(port, seconds)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestServerModes(unittest.TestCase):
+    def start(self, mode, workers):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", SERVER, mode, str(workers)],
+            cwd=root, stdout=subprocess.PIPE)
+        self.port = int(self.process.stdout.readline())
+        # prefork children start accepting after the parent forks them
+        for _ in range(100):
+            try:
+                get(self.port)
+                return
+            except socket.error:
+                time.sleep(0.05)
+
+    def stop(self):
+        self.process.send_signal(signal.SIGTERM)
+        output = self.process.stdout.read()
+        self.assertEqual(self.process.wait(), 0)
+        return output
+
+    def tearDown(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    @cases([(server.THREAD, 4, 4), (server.PREFORK, 2, 2)])
+    def test_concurrent_requests(self, mode, workers, count):
+        self.start(mode, workers)
+        start = time.time()
+        results = get_concurrently(self.port, count, 0.3)
+        elapsed = time.time() - start
+        self.assertEqual([status for status, _ in results], [200] * count)
+        # served at once, not one after another
+        self.assertLess(elapsed, 0.3 * 2)
+        pids = set(int(body) for _, body in results)
+        if mode == server.PREFORK:
+            self.assertEqual(len(pids), workers)
+            self.assertNotIn(self.process.pid, pids)
+        else:
+            self.assertEqual(pids, set([self.process.pid]))
+        self.assertEqual(self.stop(), "stopped\n")
+
+    @cases([(server.THREAD, 4), (server.PREFORK, 2)])
+    def test_sigterm_drains_requests(self, mode, workers):
+        self.start(mode, workers)
+        results = []
+        t = threading.Thread(target=lambda: results.append(
+            get(self.port, 0.5)))
+        t.start()
+        time.sleep(0.2)
+        self.assertEqual(self.stop(), "stopped\n")
+        t.join()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][0], 200)
+        self.assertTrue(results[0][1].isdigit())
+        self.assertRaises(socket.error, get, self.port)
+
+
+class TestMakeServer(unittest.TestCase):
+    class Handler(object):
+        pass
+
+    @cases([
+        (1, server.THREAD, False),
+        (1, server.PREFORK, False),
+        (4, server.THREAD, True),
+    ])
+    def test_server_class(self, workers, mode, concurrent):
+        httpd = server.make_server(("localhost", 0), self.Handler,
+                                   workers=workers, mode=mode)
+        try:
+            self.assertEqual(getattr(httpd, "concurrent", False),
+                             concurrent)
+            self.assertNotIsInstance(httpd, server.PreforkHTTPServer)
+        finally:
+            httpd.server_close()
+
+    def test_prefork_class(self):
+        httpd = server.make_server(("localhost", 0), self.Handler,
+                                   workers=2, mode=server.PREFORK)
+        try:
+            self.assertIsInstance(httpd, server.PreforkHTTPServer)
+            self.assertTrue(httpd.concurrent)
+        finally:
+            httpd.server_close()
+
+    def test_init_worker_called_once(self):
+        calls = []
+        httpd = server.make_server(("localhost", 0), self.Handler,
+                                   workers=4,
+                                   init_worker=lambda: calls.append(1))
+        httpd.server_close()
+        self.assertEqual(calls, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -26,7 +26,13 @@ class TestStore(unittest.TestCase):
     @cases(["i: 1"])
     def test_get_existent_cid(self, args):
         interests = self.store.get(args)
-        self.assertEqual(interests, '["travel", "books"]')
+        self.assertEqual(interests, ["travel", "books"])
+
+    @cases([["i: 1"], ["i: 1", "i:-1"]])
+    def test_get_many(self, args):
+        interests = self.store.get_many(args, chunk_size=1)
+        self.assertEqual(interests[0], ["travel", "books"])
+        self.assertTrue(all(i is None for i in interests[1:]))
 
     @cases(["uid: -1"])
     def test_cache_get_nonexistent_uid(self, args):
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+import threading
+
+from api import admission
+from tests.cases import cases
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def admit_later(self, ac, method, results):
+        queued = len(ac._waiters)
+        t = threading.Thread(target=lambda: results.append(
+            (method, ac.admit(method))))
+        t.start()
+        # wait for the request to queue
+        while len(ac._waiters) == queued and t.is_alive():
+            time.sleep(0.001)
+        return t
+
+    @cases([0, 1])
+    def test_shed_when_queue_full(self, depth):
+        ac = admission.AdmissionControl(2, queue_depth=depth,
+                                        queue_timeout=0.01)
+        self.assertTrue(ac.admit("online_score"))
+        self.assertTrue(ac.admit("online_score"))
+        self.assertFalse(ac.admit("online_score"))
+        stats = ac.stats()
+        self.assertEqual(stats["inflight"], 2)
+        self.assertEqual(stats["shed"], 1)
+        self.assertEqual(stats["queued"], 0)
+
+    def test_release(self):
+        ac = admission.AdmissionControl(1)
+        for _ in range(3):
+            self.assertTrue(ac.admit("batch"))
+            ac.release("batch")
+        self.assertEqual(ac.stats()["inflight"], 0)
+        self.assertEqual(ac.stats()["admitted"], 3)
+
+    def test_waiter_gets_released_slot(self):
+        ac = admission.AdmissionControl(1, queue_depth=1, queue_timeout=5)
+        ac.admit("online_score")
+        results = []
+        t = self.admit_later(ac, "online_score", results)
+        ac.release("online_score")
+        t.join()
+        self.assertEqual(results, [("online_score", True)])
+        self.assertEqual(ac.stats()["inflight"], 1)
+
+    def test_priority(self):
+        ac = admission.AdmissionControl(1, queue_depth=2, queue_timeout=5)
+        ac.admit("online_score")
+        results = []
+        threads = [self.admit_later(ac, "clients_interests", results)]
+        threads.append(self.admit_later(ac, "online_score", results))
+        ac.release("online_score")
+        threads[1].join()
+        self.assertEqual(results, [("online_score", True)])
+        ac.release("online_score")
+        threads[0].join()
+        self.assertEqual(results[1], ("clients_interests", True))
+
+    @cases([(0.01, None), (5, 0.01), (5, -1)])
+    def test_queue_timeout(self, queue_timeout, budget):
+        ac = admission.AdmissionControl(1, queue_depth=1,
+                                        queue_timeout=queue_timeout)
+        ac.admit("online_score")
+        deadline = time.time() + budget if budget is not None else None
+        start = time.time()
+        self.assertFalse(ac.admit("online_score", deadline))
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(ac.stats()["queued"], 0)
+        ac.release("online_score")
+        self.assertEqual(ac.stats()["inflight"], 0)
+
+    def test_method_limit(self):
+        ac = admission.AdmissionControl(0, limits={"clients_interests": 1})
+        self.assertTrue(ac.admit("clients_interests"))
+        self.assertFalse(ac.admit("clients_interests"))
+        for _ in range(5):
+            self.assertTrue(ac.admit("online_score"))
+        ac.release("clients_interests")
+        self.assertTrue(ac.admit("clients_interests"))
+
+    def test_method_limit_counts_waiters(self):
+        ac = admission.AdmissionControl(1, queue_depth=5, queue_timeout=5,
+                                        limits={"clients_interests": 2})
+        ac.admit("clients_interests")
+        results = []
+        t = self.admit_later(ac, "clients_interests", results)
+        self.assertFalse(ac.admit("clients_interests"))
+        ac.release("clients_interests")
+        t.join()
+        self.assertEqual(results, [("clients_interests", True)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import unittest
+from StringIO import StringIO
+
+from api import asynclog
+from tests.cases import cases
+
+
+class TestQueueHandler(unittest.TestCase):
+    def get_logger(self, fmt=asynclog.TEXT, **kwargs):
+        self.stream = StringIO()
+        target = logging.StreamHandler(self.stream)
+        if fmt == asynclog.JSON:
+            target.setFormatter(asynclog.JSONFormatter())
+        kwargs.setdefault("flush_interval", 60)
+        self.handler = asynclog.QueueHandler(target, **kwargs)
+        logger = logging.Logger("test_asynclog")
+        logger.addHandler(self.handler)
+        return logger
+
+    def tearDown(self):
+        self.handler.close()
+
+    def test_records_written_in_background(self):
+        logger = self.get_logger()
+        logger.info("request %s", 1)
+        self.assertEqual(self.stream.getvalue(), "")
+        self.handler.flush()
+        self.assertEqual(self.stream.getvalue(), "request 1\n")
+
+    @cases([1, 3])
+    def test_drop_oldest(self, overflow):
+        logger = self.get_logger(queue_size=2)
+        for i in range(2 + overflow):
+            logger.info("request %s", i)
+        self.handler.flush()
+        self.assertEqual(self.stream.getvalue().split(),
+                         ["request", str(overflow), "request",
+                          str(overflow + 1)])
+        self.assertEqual(self.handler.stats()["dropped"], overflow)
+
+    def test_close_flushes_queue(self):
+        logger = self.get_logger()
+        logger.info("last words")
+        self.handler.close()
+        self.assertEqual(self.stream.getvalue(), "last words\n")
+
+    def test_json_lines(self):
+        logger = self.get_logger(fmt=asynclog.JSON)
+        logger.info({"request_id": "abc", "code": 200})
+        logger.info("request %s", 1)
+        self.handler.flush()
+        lines = [json.loads(l) for l in self.stream.getvalue().splitlines()]
+        self.assertEqual(lines[0]["request_id"], "abc")
+        self.assertEqual(lines[0]["code"], 200)
+        self.assertEqual(lines[1]["msg"], "request 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import datetime
+import unittest
+
+from api import api
+from tests.cases import cases
+
+
+def admin_token(hours_ago=0):
+    hour = datetime.datetime.now() - datetime.timedelta(hours=hours_ago)
+    return hashlib.sha512(hour.strftime("%Y%m%d%H") + api.ADMIN_SALT).hexdigest()
+
+
+def user_token(account, login):
+    return hashlib.sha512(account + login + api.SALT).hexdigest()
+
+
+class TestAuthenticator(unittest.TestCase):
+    def get_request(self, login, token, account="horns&hoofs"):
+        request = api.MethodRequest()
+        request.check_data({"account": account, "login": login, "token": token,
+                            "arguments": {}, "method": "online_score"})
+        return request
+
+    @cases([
+        ("h&f", user_token("horns&hoofs", "h&f"), True),
+        ("h&f", unicode(user_token("horns&hoofs", "h&f")), True),
+        ("h&f", user_token("horns&hoofs", "h&g"), False),
+        ("h&f", "", False),
+        ("h&f", u"Василий", False),
+        ("admin", admin_token(), True),
+        ("admin", user_token("horns&hoofs", "admin"), False),
+    ])
+    def test_check(self, login, token, valid):
+        authenticator = api.Authenticator()
+        self.assertEqual(authenticator.check(self.get_request(login, token)), valid)
+
+    @cases([(3600, True), (0, False)])
+    def test_previous_admin_token(self, grace, valid):
+        authenticator = api.Authenticator(grace=grace)
+        request = self.get_request("admin", admin_token(hours_ago=1))
+        self.assertEqual(authenticator.check(request), valid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from tarantool import DatabaseError
+
+from api import batch, scoring
+from tests.cases import cases
+from tests.unit.test_scoring import MockedStore
+
+
+class CountingStore(MockedStore):
+    def __init__(self):
+        MockedStore.__init__(self)
+        self.calls = []
+
+    def get_many(self, keys):
+        self.calls.append(("get_many", sorted(keys)))
+        return MockedStore.get_many(self, keys)
+
+    def cache_get(self, key):
+        self.calls.append(("cache_get", key))
+        return MockedStore.cache_get(self, key)
+
+
+class TestBatchStore(unittest.TestCase):
+    def setUp(self):
+        self.l2 = CountingStore()
+        self.store = batch.BatchStore(self.l2)
+
+    @cases([([[1, 2], [2, 1]], ["i:1", "i:2"]), ([[1], [2], [1, 2]], ["i:1", "i:2"])])
+    def test_interests_prefetched_once(self, cids_list, keys):
+        self.l2.calls = []
+        self.store = batch.BatchStore(self.l2)
+        self.store.prefetch(["i:%s" % cid for cids in cids_list for cid in cids])
+        for cids in cids_list:
+            scoring.get_interests_many(self.store, cids)
+        self.assertEqual(self.l2.calls, [("get_many", keys)])
+
+    def test_score_cache_memoized(self):
+        args = {"phone": "79991234567", "email": "user@domain.com"}
+        scores = [scoring.get_score(self.store, **args) for _ in range(3)]
+        self.assertEqual(scores, [3.0] * 3)
+        self.assertEqual(len(self.l2.calls), 1)
+
+    def test_prefetch_error(self):
+        self.l2.disconnect()
+        self.store.prefetch(["i:1", "i:2"])
+        self.assertRaises(DatabaseError, scoring.get_interests_many, self.store, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
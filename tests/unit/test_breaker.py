@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from api import breaker
+from tests.cases import cases
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def get_breaker(self, threshold=3, timeout=60):
+        return breaker.CircuitBreaker("test", failure_threshold=threshold,
+                                      reset_timeout=timeout)
+
+    @cases([1, 3])
+    def test_opens_after_threshold(self, threshold):
+        cb = self.get_breaker(threshold)
+        for _ in range(threshold - 1):
+            self.assertTrue(cb.allow())
+            cb.failure()
+        self.assertEqual(cb.state, breaker.CLOSED)
+        cb.failure()
+        self.assertEqual(cb.state, breaker.OPEN)
+        self.assertFalse(cb.allow())
+        self.assertEqual(cb.stats()["rejected"], 1)
+        self.assertEqual(cb.stats()["opened"], 1)
+
+    def test_success_resets_failures(self):
+        cb = self.get_breaker(2)
+        cb.failure()
+        cb.success()
+        cb.failure()
+        self.assertEqual(cb.state, breaker.CLOSED)
+
+    def test_disabled(self):
+        cb = self.get_breaker(0)
+        for _ in range(10):
+            cb.failure()
+        self.assertTrue(cb.allow())
+
+    @cases([(True, breaker.CLOSED), (False, breaker.OPEN)])
+    def test_half_open_probe(self, succeeded, state):
+        cb = self.get_breaker(1, timeout=0)
+        cb.failure()
+        self.assertTrue(cb.allow())
+        self.assertEqual(cb.state, breaker.HALF_OPEN)
+        # only a single probe is let through
+        self.assertFalse(cb.allow())
+        if succeeded:
+            cb.success()
+        else:
+            cb.failure()
+        self.assertEqual(cb.state, state)
+
+    def test_release_frees_probe(self):
+        cb = self.get_breaker(1, timeout=0)
+        cb.failure()
+        self.assertTrue(cb.allow())
+        cb.release()
+        self.assertTrue(cb.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
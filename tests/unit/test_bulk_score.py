@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+from StringIO import StringIO
+
+from api import bulk_score
+from tests.cases import cases
+from tests.unit.test_scoring import MockedStore
+
+CSV = """id,phone,email,birthday,gender,first_name,last_name
+a,79175002040,stupnikov@otus.ru,01.01.2000,1,Stanislav,Stupnikov
+b,79175002040,,,,,
+c,,,01.01.2000,0,,
+"""
+JSONL = """{"id": "a", "phone": 79175002040, "email": "stupnikov@otus.ru", \
+"birthday": "01.01.2000", "gender": 1, "first_name": "Stanislav", \
+"last_name": "Stupnikov"}
+{"id": "b", "phone": "79175002040"}
+
+{"id": "c", "birthday": "01.01.2000", "gender": 0}
+"""
+
+
+class TestBulkScore(unittest.TestCase):
+    @cases([
+        (bulk_score.CSV, CSV, 1),
+        (bulk_score.CSV, CSV, 10),
+        (bulk_score.JSONL, JSONL, 2),
+    ])
+    def test_score_stream(self, fmt, data, batch_size):
+        out = StringIO()
+        total = bulk_score.score_stream(StringIO(data), out, MockedStore(),
+                                        fmt, bulk_score.JSONL,
+                                        batch_size=batch_size)
+        self.assertEqual(total, (3, 0))
+        self.assertEqual([json.loads(l) for l in out.getvalue().splitlines()],
+                         [{"id": "a", "score": 5.0}, {"id": "b", "score": 1.5},
+                          {"id": "c", "score": 1.5}])
+
+    def test_csv_output_without_ids(self):
+        out = StringIO()
+        bulk_score.score_stream(StringIO('{"phone": "79175002040"}\n' * 2),
+                                out, None, bulk_score.JSONL, bulk_score.CSV)
+        self.assertEqual(out.getvalue(), "1,1.5\n2,1.5\n")
+
+    @cases([
+        (bulk_score.JSONL, '{"birthday": "31.02.1990"}', 1),
+        (bulk_score.JSONL, '{"birthday": 1990}', 1),
+        (bulk_score.JSONL, '{"first_name": 1, "last_name": "a"}', 1),
+        (bulk_score.JSONL, '{"gender": [1]}', 1),
+        (bulk_score.JSONL, '[1, 2]', 1),
+        (bulk_score.JSONL, '"a"', 1),
+        (bulk_score.JSONL, '{"phone": ', 1),
+        (bulk_score.JSONL, '{"birthday": "31.02.1990"}', 10),
+        (bulk_score.CSV, 'x,,,31.02.1990,,,', 1),
+        (bulk_score.CSV, 'x,,,31.02.1990,,,', 10),
+    ])
+    def test_invalid_records_skipped(self, fmt, bad, batch_size):
+        lines = (CSV if fmt == bulk_score.CSV else JSONL).splitlines()
+        lines = [l for l in lines if l]
+        # the first, a middle and the last record, after the CSV header
+        n = len(lines) - 3
+        data = "\n".join(lines[:n] + [bad] + lines[n:n + 2] + [bad] +
+                          lines[n + 2:] + [bad]) + "\n"
+        out = StringIO()
+        total = bulk_score.score_stream(StringIO(data), out, MockedStore(),
+                                        fmt, bulk_score.JSONL,
+                                        batch_size=batch_size)
+        self.assertEqual(total, (6, 3))
+        self.assertEqual([json.loads(l) for l in out.getvalue().splitlines()],
+                         [{"id": "a", "score": 5.0}, {"id": "b", "score": 1.5},
+                          {"id": "c", "score": 1.5}])
+
+    def test_skipped_records_keep_positions(self):
+        out = StringIO()
+        data = '{"phone": 1}\n{"birthday": "31.02.1990"}\n{"phone": 2}\n'
+        total = bulk_score.score_stream(StringIO(data), out, None,
+                                        bulk_score.JSONL, bulk_score.CSV)
+        self.assertEqual(total, (3, 1))
+        self.assertEqual(out.getvalue(), "1,1.5\n3,1.5\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
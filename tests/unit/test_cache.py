@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+
+from api import cache, scoring
+from tests.cases import cases
+from tests.unit.test_scoring import MockedStore
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.LRUCache(maxsize=2)
+
+    @cases([("uid:1", 1.5), ("uid:2", 3.0)])
+    def test_cache_hit(self, key, value):
+        self.cache.set(key, value)
+        self.assertEqual(self.cache.get(key), value)
+
+    def test_cache_miss(self):
+        self.assertIsNone(self.cache.get("uid:1"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_cache_expired(self):
+        self.cache.set("uid:1", 1.5, ttl=-1)
+        self.assertIsNone(self.cache.get("uid:1"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_cache_lru_eviction(self):
+        self.cache.set("uid:1", 1.5)
+        self.cache.set("uid:2", 3.0)
+        self.cache.get("uid:1")
+        self.cache.set("uid:3", 4.5)
+        self.assertIsNone(self.cache.get("uid:2"))
+        self.assertEqual(self.cache.get("uid:1"), 1.5)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+
+class TestCachedStore(unittest.TestCase):
+    def setUp(self):
+        self.l2 = MockedStore()
+        self.store = cache.CachedStore(self.l2, cache.LRUCache(maxsize=10))
+
+    @cases([
+        {"phone": "79991234567", "email": "user@domain.com", "first_name": "Vasiliy", "last_name": "Ivanov"}
+    ])
+    def test_score_served_from_l1(self, args):
+        score = scoring.get_score(self.store, **args)
+        self.l2.disconnect()
+        self.assertEqual(scoring.get_score(self.store, **args), score)
+        self.assertEqual(self.store.cache.stats()["hits"], 1)
+
+    def test_l1_filled_from_l2(self):
+        self.assertEqual(self.store.cache_get("i:1"), self.l2.items["i:1"])
+        self.l2.disconnect()
+        self.assertEqual(self.store.cache_get("i:1"), self.l2.items["i:1"])
+
+    def test_cache_get_many_fills_l1(self):
+        self.store.cache.set("uid:l1", 1.5)
+        self.assertEqual(self.store.cache_get_many(["uid:l1", "i:1", "i:x"]),
+                         [1.5, self.l2.items["i:1"], None])
+        self.l2.disconnect()
+        self.assertEqual(self.store.cache_get("i:1"), self.l2.items["i:1"])
+
+    def expires_in(self, key):
+        return self.store.cache._data[key][cache.EXPIRES] - time.time()
+
+    @cases([
+        lambda store: store.cache_get("i:1"),
+        lambda store: store.cache_get_many(["i:1"]),
+    ])
+    def test_fill_from_l2_uses_fill_ttl(self, get):
+        get(self.store)
+        self.assertTrue(0 < self.expires_in("i:1") <= cache.FILL_TTL)
+
+    def test_set_uses_full_ttl(self):
+        self.store.cache_set("uid:1", 1.5, 2 * cache.CACHE_TTL)
+        self.assertTrue(cache.FILL_TTL < self.expires_in("uid:1") <=
+                        cache.CACHE_TTL)
+
+    def test_fill_ttl_capped_by_ttl(self):
+        store = cache.CachedStore(self.l2, ttl=10, fill_ttl=60)
+        self.assertEqual(store.fill_ttl, 10)
+
+    def test_delegates_to_l2(self):
+        self.assertEqual(self.store.get("i:2"), self.l2.items["i:2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+
+from api import api, deadline
+from tests.cases import cases
+
+
+class TestDeadline(unittest.TestCase):
+    def test_no_deadline(self):
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(deadline.remaining(1), 1)
+        self.assertFalse(deadline.expired())
+
+    def test_remaining_is_capped(self):
+        with deadline.scope(time.time() + 10):
+            self.assertEqual(deadline.remaining(1), 1)
+            self.assertTrue(9 < deadline.remaining() <= 10)
+        self.assertIsNone(deadline.current())
+
+    def test_nested_scopes(self):
+        outer = time.time() + 10
+        with deadline.scope(outer):
+            with deadline.scope(None):
+                self.assertIsNone(deadline.remaining())
+            self.assertEqual(deadline.current(), outer)
+
+    def test_spent_budget(self):
+        with deadline.scope(time.time() - 1):
+            self.assertTrue(deadline.expired())
+            self.assertRaises(deadline.DeadlineExceeded, deadline.remaining,
+                              1)
+
+
+class TestRequestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.timeout = api.REQUEST_TIMEOUT
+
+    def tearDown(self):
+        api.REQUEST_TIMEOUT = self.timeout
+
+    @cases([
+        (2, {}, 102),
+        (2, {"X-Request-Timeout": "0.5"}, 100.5),
+        (2, {"X-Request-Timeout": "5"}, 102),
+        (2, {"X-Request-Timeout": "soon"}, 102),
+        (0, {"X-Request-Timeout": "5"}, 105),
+        (0, {}, None),
+    ])
+    def test_request_deadline(self, timeout, headers, expected):
+        api.REQUEST_TIMEOUT = timeout
+        self.assertEqual(api.request_deadline(headers, 100), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+
+from api import fastjson
+from tests.cases import cases
+
+
+class TestFastJSON(unittest.TestCase):
+    @cases([
+        {"code": 200, "response": {"1": ["travel", "books"], "2": []}},
+        {"score": 3.5},
+        [u"путешествия", "a/b", None, True],
+    ])
+    def test_roundtrip(self, value):
+        body = fastjson.dumps(value)
+        self.assertEqual(fastjson.loads(body), value)
+        self.assertEqual(json.loads(body), value)
+
+    @cases(["", "{", '{"a": }', "[1, 2"])
+    def test_invalid(self, body):
+        self.assertRaises(ValueError, fastjson.loads, body)
+
+
+if __name__ == "__main__":
+    unittest.main()
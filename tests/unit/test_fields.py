@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import sys
+import datetime
 import unittest
+import subprocess
 
 from api import api
 from tests.cases import cases
@@ -76,6 +80,62 @@ class TestDateField(unittest.TestCase):
             required=True, nullable=True).validate_value(value)
         self.assertIs(checked_value, value)
 
+    @cases(["10.10.2019", u"1.1.1900"])
+    def test_date_parsed_once(self, value):
+        api.dates.pop(value, None)
+        field = api.DateField(required=True, nullable=True)
+        date = field.clean(value)
+        self.assertEqual(date, datetime.datetime.strptime(value, "%d.%m.%Y"))
+        self.assertIs(field.clean(value), date)
+
+
+    @cases([
+        ("api", 'api.DateField(required=True, nullable=True)'
+                '.clean("20.07.2017")'),
+        ("bulk_score", 'bulk_score.to_columns([{"birthday": "20.07.2017"}], '
+                       'None, {})'),
+    ])
+    def test_date_parsed_in_threads(self, module, call):
+        # a fresh interpreter, _strptime is imported in this one already
+        script = """
+import sys
+import threading
+sys.path.insert(0, "api")
+import %s
+
+errors = []
+start = threading.Event()
+
+def parse():
+    start.wait()
+    try:
+        %s
+    except Exception as e:
+        errors.append(e)
+threads = [threading.Thread(target=parse) for _ in range(16)]
+for t in threads:
+    t.start()
+start.set()
+for t in threads:
+    t.join()
+sys.stdout.write(repr(errors))
+""" % (module, call)
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        output = subprocess.check_output([sys.executable, "-c", script],
+                                         cwd=root)
+        self.assertEqual(output, "[]")
+
+
+class TestToday(unittest.TestCase):
+    def test_refreshed_on_rollover(self):
+        today = api.Today()
+        self.assertEqual(today(), datetime.date.today())
+        today._date = datetime.date(2000, 1, 1)
+        self.assertEqual(today(), datetime.date(2000, 1, 1))
+        today._until = 0
+        self.assertEqual(today(), datetime.date.today())
+
 
 class TestBirthDayField(unittest.TestCase):
     @cases(["10.10.1900"])
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from api import iproto
+from tests.cases import cases
+
+
+class TestIproto(unittest.TestCase):
+    @cases([
+        (iproto.REQUEST_CALL, 1, {iproto.FUNCTION_NAME: "get_interests", iproto.TUPLE: ["i:1"]}),
+        (iproto.REQUEST_PING, 2, {}),
+    ])
+    def test_request_roundtrip(self, code, sync, body):
+        packet = iproto.pack_request(code, sync, body)
+        packets, tail = iproto.unpack_packets(packet + packet[:3])
+        self.assertEqual(tail, packet[:3])
+        self.assertEqual(len(packets), 1)
+        header, unpacked = packets[0]
+        self.assertEqual(header, {iproto.CODE: code, iproto.SYNC: sync})
+        self.assertEqual(unpacked, body)
+
+    @cases([0, 1, 4])
+    def test_partial_packet(self, size):
+        packet = iproto.pack_request(iproto.REQUEST_PING, 1, {})
+        packets, tail = iproto.unpack_packets(packet[:size])
+        self.assertEqual(packets, [])
+        self.assertEqual(tail, packet[:size])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+from StringIO import StringIO
+
+from api import memory_store, backends
+from tests.cases import cases
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLDict(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.data = memory_store.TTLDict(slots=8, clock=self.clock)
+
+    @cases([("a", 1, None), ("b", 2.5, 10)])
+    def test_set_get(self, key, value, ttl):
+        self.data.set(key, value, ttl)
+        self.assertEqual(self.data.get(key), value)
+
+    def test_expired_key_is_not_returned(self):
+        self.data.set("a", 1, 5)
+        self.clock.now += 5
+        self.assertIsNone(self.data.get("a"))
+
+    def test_wheel_purges_expired_keys(self):
+        self.data.set("a", 1, 2)
+        self.data.set("b", 2)
+        self.clock.now += 3
+        self.data.set("c", 3, 2)
+        self.assertEqual(len(self.data), 2)
+        self.assertEqual(self.data.stats()["expired"], 1)
+
+    def test_wheel_keeps_keys_of_later_rotations(self):
+        # 20s is more than a full rotation of the 8 one-second slots
+        self.data.set("a", 1, 20)
+        self.clock.now += 9
+        self.data.set("b", 2, 1)
+        self.assertEqual(self.data.get("a"), 1)
+        self.clock.now += 12
+        self.data.set("c", 3)
+        self.assertIsNone(self.data.get("a"))
+        self.assertEqual(len(self.data), 1)
+
+    def test_overwrite_moves_expiry(self):
+        self.data.set("a", 1, 2)
+        self.data.set("a", 2, 60)
+        self.clock.now += 3
+        self.data.set("b", 2)
+        self.assertEqual(self.data.get("a"), 2)
+
+    def test_delete(self):
+        self.data.set("a", 1, 2)
+        self.data.delete("a")
+        self.data.delete("missing")
+        self.assertIsNone(self.data.get("a"))
+        self.assertEqual(len(self.data), 0)
+
+    def test_concurrent_writes(self):
+        def write(n):
+            for i in range(1000):
+                self.data.set("%s:%s" % (n, i), i, i % 3 or None)
+        threads = [threading.Thread(target=write, args=(n,))
+                   for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.data), 4000)
+
+
+class TestMemoryStore(unittest.TestCase):
+    def setUp(self):
+        self.store = memory_store.MemoryStore(
+            log=False, interests={"i:1": ["travel", "books"]})
+
+    def test_get(self):
+        self.assertEqual(self.store.get("i:1"), ["travel", "books"])
+        self.assertEqual(self.store.get_many(["i:1", "i:2"]),
+                         [["travel", "books"], None])
+
+    def test_cache(self):
+        self.store.cache_set_many([("uid:1", 1.5, 3600), ("uid:2", 3, 3600)])
+        self.assertEqual(self.store.cache_get_many(["uid:1", "uid:2",
+                                                    "uid:3"]),
+                         [1.5, 3.0, None])
+        self.store.cache_delete("uid:1")
+        self.assertIsNone(self.store.cache_get("uid:1"))
+
+    @cases([
+        '{"1": ["travel", "books"], "2": []}',
+        '{"1": ["travel", "books"]}\n\n{"2": []}\n',
+    ])
+    def test_read_interests(self, data):
+        interests = memory_store.read_interests(StringIO(data))
+        self.assertEqual(interests, {"i:1": ["travel", "books"], "i:2": []})
+        store = backends.make_store(backends.MEMORY, log=False,
+                                    interests=interests)
+        self.assertEqual(store.get_many(["i:1", "i:2", "i:3"]),
+                         [["travel", "books"], [], None])
+
+    @cases(['[["travel"]]', '{"1": "travel"}', '{"1": []}\n[]', '{"1": '])
+    def test_read_invalid_interests(self, data):
+        self.assertRaises(ValueError, memory_store.read_interests,
+                          StringIO(data))
+
+    @cases([({}, 1), ({"i:1": []}, 0)])
+    def test_warns_without_interests(self, interests, warnings):
+        logged = []
+        warning = memory_store.logging.warning
+        memory_store.logging.warning = logged.append
+        try:
+            memory_store.MemoryStore(interests=interests).connect()
+        finally:
+            memory_store.logging.warning = warning
+        self.assertEqual(len(logged), warnings)
+
+    def test_network_backends_ignore_interests(self):
+        store = backends.make_store(backends.REDIS, interests={"i:1": []})
+        self.assertNotIsInstance(store, memory_store.MemoryStore)
+
+
+if __name__ == "__main__":
+    unittest.main()
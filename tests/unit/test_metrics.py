@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from api import metrics
+from tests.cases import cases
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_counter(self):
+        counter = self.registry.counter("responses", "Responses.",
+                                        labels=("method", "code"))
+        counter.labels("online_score", 200).inc()
+        counter.labels("online_score", 200).inc()
+        counter.labels("clients_interests", 422).inc()
+        text = self.registry.render()
+        self.assertIn("# TYPE responses counter", text)
+        self.assertIn(
+            'responses_total{method="online_score",code="200"} 2', text)
+        self.assertIn(
+            'responses_total{method="clients_interests",code="422"} 1', text)
+
+    @cases([0.00001, 0.003, 10])
+    def test_histogram_buckets(self, value):
+        histogram = self.registry.histogram("latency", "Latency.",
+                                            buckets=(0.001, 0.01))
+        histogram.observe(value)
+        samples = dict((name + str(labels), v) for name, labels, v
+                       in histogram.collect())
+        self.assertEqual(samples["latency_bucket(('le', 0.001),)"],
+                         int(value <= 0.001))
+        self.assertEqual(samples["latency_bucket(('le', 0.01),)"],
+                         int(value <= 0.01))
+        self.assertEqual(samples["latency_bucket(('le', '+Inf'),)"], 1)
+        self.assertEqual(samples["latency_count()"], 1)
+
+    def test_histogram_memory_is_fixed(self):
+        histogram = self.registry.histogram("latency", "Latency.")
+        for i in range(1000):
+            with histogram.time():
+                pass
+        self.assertEqual(len(histogram.collect()),
+                         len(metrics.LATENCY_BUCKETS) + 3)
+
+    def test_render_stats(self):
+        text = metrics.render_stats("store", {"open": 2, "host": "x"})
+        self.assertEqual(text, "# TYPE store_open gauge\nstore_open 2\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
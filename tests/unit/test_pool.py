@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+import tarantool
+
+from api import store, breaker, deadline
+from tests.cases import cases
+
+
+class MockedConnection(object):
+    opened = 0
+    alive = True
+
+    def __init__(self, host, port, **kwargs):
+        if port == 100000:
+            raise tarantool.NetworkError("Connection refused")
+        MockedConnection.opened += 1
+
+    def ping(self, notime=False):
+        if not self.alive:
+            raise tarantool.NetworkError("Lost connection")
+        return "Success"
+
+    def close(self):
+        pass
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.connection_class = tarantool.Connection
+        tarantool.Connection = MockedConnection
+        MockedConnection.opened = 0
+        MockedConnection.alive = True
+
+    def tearDown(self):
+        tarantool.Connection = self.connection_class
+
+    @cases([1, 5, 10])
+    def test_pool_reuses_connections(self, calls):
+        MockedConnection.opened = 0
+        pool = store.ConnectionPool(size=2)
+        for _ in range(calls):
+            with pool.connection():
+                pass
+        self.assertEqual(MockedConnection.opened, 1)
+        self.assertEqual(pool.stats()["open"], 1)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_pool_timeout(self):
+        pool = store.ConnectionPool(size=1, timeout=0.01)
+        with pool.connection():
+            self.assertRaises(store.PoolTimeout, pool._acquire)
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_pool_drops_broken_connection(self):
+        pool = store.ConnectionPool(size=1)
+        with self.assertRaises(tarantool.NetworkError):
+            with pool.connection():
+                raise tarantool.NetworkError("Lost connection")
+        self.assertEqual(pool.stats()["open"], 0)
+        with pool.connection():
+            pass
+        self.assertEqual(MockedConnection.opened, 2)
+        self.assertEqual(pool.stats()["reconnects"], 1)
+
+    def test_pool_health_check(self):
+        pool = store.ConnectionPool(size=1, health_check_interval=0)
+        with pool.connection():
+            pass
+        MockedConnection.alive = False
+        with pool.connection():
+            pass
+        self.assertEqual(MockedConnection.opened, 2)
+        self.assertEqual(pool.stats()["reconnects"], 1)
+
+    @cases([1, 3])
+    def test_reconnects_counted_once(self, errors):
+        MockedConnection.opened = 0
+        pool = store.ConnectionPool(size=2)
+        for i in range(errors):
+            with self.assertRaises(tarantool.NetworkError):
+                with pool.connection():
+                    raise tarantool.NetworkError("Lost connection")
+            # counted when the slot is filled again, not on the error
+            self.assertEqual(pool.stats()["reconnects"], i)
+            with pool.connection():
+                pass
+        self.assertEqual(pool.stats()["reconnects"], errors)
+        self.assertEqual(MockedConnection.opened, errors + 1)
+
+    def test_failed_reconnect_not_counted(self):
+        pool = store.ConnectionPool(size=1, reconnect_delay=0)
+        with self.assertRaises(tarantool.NetworkError):
+            with pool.connection():
+                raise tarantool.NetworkError("Lost connection")
+        pool.port = 100000
+        self.assertRaises(tarantool.NetworkError, pool._acquire)
+        self.assertEqual(pool.stats()["reconnects"], 0)
+        pool.port = store.PORT
+        with pool.connection():
+            pass
+        self.assertEqual(pool.stats()["reconnects"], 1)
+
+    def test_pool_backoff(self):
+        pool = store.ConnectionPool(port=100000, reconnect_delay=60)
+        self.assertRaises(tarantool.NetworkError, pool._acquire)
+        pool.port = store.PORT
+        self.assertRaises(tarantool.NetworkError, pool._acquire)
+        self.assertEqual(MockedConnection.opened, 0)
+        self.assertEqual(pool.stats()["open"], 0)
+
+    def test_pool_circuit_breaker(self):
+        cb = breaker.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        pool = store.ConnectionPool(size=1, breaker=cb)
+        for _ in range(2):
+            with self.assertRaises(tarantool.NetworkError):
+                with pool.connection():
+                    raise tarantool.NetworkError("Lost connection")
+        opened = MockedConnection.opened
+        with self.assertRaises(store.CircuitOpen):
+            with pool.connection():
+                pass
+        self.assertEqual(MockedConnection.opened, opened)
+
+    def test_pool_database_error_keeps_circuit_closed(self):
+        cb = breaker.CircuitBreaker(failure_threshold=1)
+        pool = store.ConnectionPool(size=1, breaker=cb)
+        with self.assertRaises(tarantool.DatabaseError):
+            with pool.connection():
+                raise tarantool.DatabaseError(32, "no such key")
+        self.assertEqual(cb.state, breaker.CLOSED)
+
+    @cases([
+        (None, deadline.DeadlineExceeded),
+        (tarantool.NetworkError("Lost connection"), deadline.DeadlineExceeded),
+        (deadline.DeadlineExceeded("Request deadline exceeded"),
+         deadline.DeadlineExceeded),
+        (tarantool.DatabaseError(32, "no such key"), tarantool.DatabaseError),
+    ])
+    def test_store_time_observed_once(self, error, raised):
+        pool = store.ConnectionPool(size=1)
+        observed = sum(store.STORE_SECONDS.counts)
+        with self.assertRaises(raised):
+            with deadline.scope(time.time() + 0.01):
+                with pool.connection():
+                    time.sleep(0.02)
+                    if error is not None:
+                        raise error
+                    pool.budget(None)
+        self.assertEqual(sum(store.STORE_SECONDS.counts), observed + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
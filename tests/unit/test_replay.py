@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import random
+import hashlib
+import unittest
+from StringIO import StringIO
+
+from api import api, replay
+from tests.cases import cases
+from tests.unit.test_scoring import MockedStore
+
+
+class TestOrderedMap(unittest.TestCase):
+    @cases([1, 4])
+    def test_order_preserved(self, workers):
+        def slow_square(x):
+            time.sleep(random.random() / 100)
+            return x * x
+        result = list(replay.ordered_map(slow_square, range(50), workers))
+        self.assertEqual(result, [x * x for x in range(50)])
+
+    def test_bounded_read_ahead(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+        results = replay.ordered_map(lambda x: x, items(), workers=2,
+                                     window=3)
+        self.assertEqual(next(results), 0)
+        self.assertTrue(len(consumed) <= 4)
+        self.assertEqual(list(results), range(1, 100))
+
+
+class TestReplay(unittest.TestCase):
+    def request(self, **arguments):
+        return json.dumps({
+            "account": "horns&hoofs", "login": "h&f",
+            "method": "online_score", "arguments": arguments,
+            "token": hashlib.sha512("horns&hoofs" + "h&f" +
+                                    api.SALT).hexdigest(),
+        })
+
+    @cases([1, 3])
+    def test_replay_jsonl(self, workers):
+        store = MockedStore()
+        src = StringIO("\n".join([
+            self.request(phone="79175002040", email="stupnikov@otus.ru"),
+            "",
+            "{",
+            self.request(phone="79175002040"),
+        ]))
+        dst = StringIO()
+        total = replay.replay(src, dst,
+                              lambda item: api.replay_request(item, store),
+                              workers)
+        self.assertEqual(total, 3)
+        responses = [json.loads(l) for l in dst.getvalue().splitlines()]
+        self.assertEqual(responses[0],
+                         {"code": api.OK, "response": {"score": 3.0}})
+        self.assertEqual([r["code"] for r in responses[1:]],
+                         [api.BAD_REQUEST, api.INVALID_REQUEST])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 
+import datetime
 import unittest
 
 from api import api
@@ -57,6 +58,9 @@ class TestClientsInterestsRequest(unittest.TestCase):
         req.check_data(arguments)
         for key in arguments:
             self.assertEqual(arguments[key], getattr(req, key))
+        if "birthday" in arguments:
+            self.assertEqual(req.parsed["birthday"],
+                             datetime.datetime(1970, 1, 1))
 
 
 class TestOnlineScoreRequest(unittest.TestCase):
@@ -89,5 +93,29 @@ class TestOnlineScoreRequest(unittest.TestCase):
             self.assertEqual(arguments[key], getattr(req, key))
 
 
+class TestCompactRequest(unittest.TestCase):
+    def test_no_instance_dict(self):
+        req = api.MethodRequest()
+        self.assertFalse(hasattr(req, "__dict__"))
+        self.assertRaises(AttributeError, setattr, req, "extra", 1)
+
+    def test_filled_fields(self):
+        req = api.OnlineScoreRequest()
+        req.check_data({"phone": "79991234567", "email": "user@domain.ru",
+                        "first_name": ""})
+        self.assertEqual(req.filled_fields, ("email", "phone"))
+        self.assertTrue(req.has("phone", "email"))
+        self.assertFalse(req.has("phone", "first_name"))
+        self.assertEqual(req.errors_list, ())
+        self.assertIsNone(req.parsed)
+
+    def test_errors_on_failure(self):
+        req = api.MethodRequest()
+        self.assertRaises(ValueError, req.check_data, {"login": "h&f"})
+        self.assertEqual(list(req.errors_list),
+                         ["token is required", "arguments is required",
+                          "method is required", "method is empty"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from StringIO import StringIO
+
+from api import resp
+from tests.cases import cases
+
+
+class TestResp(unittest.TestCase):
+    def test_pack_command(self):
+        self.assertEqual(resp.pack_command("SET", u"uid:ж", 1.5, "EX", 60),
+                         "*5\r\n$3\r\nSET\r\n$6\r\nuid:\xd0\xb6\r\n"
+                         "$3\r\n1.5\r\n$2\r\nEX\r\n$2\r\n60\r\n")
+
+    @cases(["OK", 3, None, "", ["1.5", None, ["a", 2]]])
+    def test_reply_roundtrip(self, value):
+        stream = StringIO(resp.pack_reply(value))
+        self.assertEqual(resp.read_reply(stream), value)
+
+    def test_error_reply(self):
+        reply = resp.read_reply(StringIO("-ERR syntax error\r\n"))
+        self.assertIsInstance(reply, resp.ReplyError)
+        self.assertEqual(str(reply), "ERR syntax error")
+
+    @cases(["", "$5\r\nab", "+OK"])
+    def test_truncated_reply(self, data):
+        self.assertRaises(resp.StoreNetworkError, resp.read_reply,
+                          StringIO(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
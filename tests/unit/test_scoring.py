@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import datetime
 import unittest
 from tarantool import DatabaseError
 
@@ -13,8 +14,8 @@ class MockedStore:
 
     def __init__(self):
         self.items = {
-            "i:1": '["travel", "books"]',
-            "i:2": '["cars", "pets"]'
+            "i:1": ["travel", "books"],
+            "i:2": ["cars", "pets"]
         }
 
     def get(self, *args):
@@ -23,6 +24,11 @@ class MockedStore:
             raise DatabaseError
         return self.items.get(key)
 
+    def get_many(self, keys):
+        if not self.connected:
+            raise DatabaseError
+        return [self.items.get(key) for key in keys]
+
     def cache_get(self, *args):
         key = args[0]
         if not self.connected or key not in self.items:
@@ -35,6 +41,14 @@ class MockedStore:
         self.items.update({key: value})
         return self
 
+    def cache_get_many(self, keys, chunk_size=None):
+        return [self.cache_get(key) for key in keys]
+
+    def cache_set_many(self, items, chunk_size=None):
+        for key, value, ttl in items:
+            self.cache_set(key, value, ttl)
+        return len(items)
+
     def disconnect(self):
         self.connected = False
         return self
@@ -69,6 +83,22 @@ class TestScoring(unittest.TestCase):
                           scoring.get_interests,
                           self.store, args)
 
+    @cases([[1, 2], [2, 1, 3], [3]])
+    def test_interests_get_many(self, args):
+        ethalon = {
+            1: [u'travel', u'books'],
+            2: [u'cars', u'pets'],
+            3: []
+        }
+        interests = scoring.get_interests_many(self.store, args)
+        self.assertEqual([ethalon[cid] for cid in args], interests)
+
+    def test_interests_get_many_disconnected_store(self):
+        self.store.disconnect()
+        self.assertRaises(DatabaseError,
+                          scoring.get_interests_many,
+                          self.store, [1, 2])
+
     @cases([
         {"phone": "79991234567", "email": "user@domain.com", "gender": 1, "first_name": "Vasiliy", "last_name": "Ivanov"}
     ])
@@ -87,5 +117,47 @@ class TestScoring(unittest.TestCase):
         self.assertEqual(score, 3.5)
 
 
+class TestBulkScoring(unittest.TestCase):
+    records = [
+        {"phone": "79991234567", "email": "user@domain.com"},
+        {"first_name": "Vasiliy", "last_name": "Ivanov", "gender": "male",
+         "birthday": datetime.datetime(1990, 1, 1)},
+        {"phone": "79991234567", "email": "user@domain.com", "gender": "male",
+         "birthday": datetime.datetime(1990, 1, 1), "first_name": "Vasiliy",
+         "last_name": "Ivanov"},
+        {},
+    ]
+    fields = ("phone", "email", "birthday", "gender", "first_name",
+              "last_name")
+
+    def setUp(self):
+        self.store = MockedStore()
+
+    def columns(self):
+        return [[r.get(f) for r in self.records] for f in self.fields]
+
+    def test_matches_get_score(self):
+        ethalon = [scoring.get_score(MockedStore(), **r) for r in self.records]
+        self.assertEqual(scoring.get_scores(self.store, *self.columns()),
+                         ethalon)
+        self.assertEqual(scoring.get_scores(None, *self.columns()), ethalon)
+
+    def test_cached_scores_used(self):
+        key = scoring.score_key(**dict((f, self.records[1].get(f)) for f in
+                                       ("phone", "birthday", "first_name",
+                                        "last_name")))
+        self.store.items[key] = 4.2
+        self.assertEqual(scoring.get_scores(self.store, *self.columns())[1],
+                         4.2)
+
+    def test_missing_columns(self):
+        self.assertEqual(scoring.get_scores(self.store, phones=["7999", None]),
+                         [1.5, 0])
+
+    def test_columns_length_mismatch(self):
+        self.assertRaises(ValueError, scoring.get_scores, self.store,
+                          phones=["7999"], emails=[])
+
+
 if __name__ == "__main__":
     unittest.main()
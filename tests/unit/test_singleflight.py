@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import unittest
+
+from api import scoring, singleflight, deadline
+from api.deadline import DeadlineExceeded
+from tests.cases import cases
+from tests.unit.test_scoring import MockedStore
+
+
+class SlowStore(MockedStore):
+    def __init__(self):
+        MockedStore.__init__(self)
+        self.calls = []
+
+    def cache_get(self, key):
+        self.calls.append(key)
+        time.sleep(0.05)
+        return MockedStore.cache_get(self, key)
+
+    def get_many(self, keys):
+        self.calls.append(tuple(keys))
+        time.sleep(0.05)
+        return MockedStore.get_many(self, keys)
+
+
+class DeadlineStore(MockedStore):
+    """Lookups take ``delay`` seconds and respect the request deadline,
+    like Store's pool does."""
+
+    def __init__(self, delay):
+        MockedStore.__init__(self)
+        self.delay = delay
+        self.calls = 0
+
+    def get_many(self, keys):
+        self.calls += 1
+        time.sleep(min(self.delay, deadline.remaining(self.delay)))
+        deadline.remaining()
+        return MockedStore.get_many(self, keys)
+
+
+def run_with_budget(budget, results, func, *args):
+    def run():
+        with deadline.scope(time.time() + budget if budget else None):
+            start = time.time()
+            try:
+                results.append((budget, func(*args), time.time() - start))
+            except Exception as e:
+                results.append((budget, e, time.time() - start))
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def run_concurrently(count, func, *args):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(i):
+        try:
+            results[i] = func(*args)
+        except Exception as e:
+            errors[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flights = singleflight.SingleFlight()
+        self.calls = 0
+
+    def slow(self, value):
+        self.calls += 1
+        time.sleep(0.05)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    @cases([2, 10])
+    def test_concurrent_calls_coalesced(self, count):
+        self.calls = 0
+        results, errors = run_concurrently(count, self.flights.do, "k",
+                                           self.slow, 42)
+        self.assertEqual(results, [42] * count)
+        self.assertEqual(self.calls, 1)
+
+    def test_error_shared(self):
+        error = KeyError("k")
+        results, errors = run_concurrently(3, self.flights.do, "k",
+                                           self.slow, error)
+        self.assertEqual(errors, [error] * 3)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flights.do("k", lambda: 1), 1)
+
+    def test_sequential_calls_not_cached(self):
+        self.flights.do("k", self.slow, 1)
+        self.assertEqual(self.flights.do("k", self.slow, 2), 2)
+        self.assertEqual(self.calls, 2)
+
+    def test_do_many_looks_up_missing_keys_only(self):
+        looked_up = []
+
+        def get_many(keys):
+            looked_up.append(keys)
+            time.sleep(0.05)
+            return [k.upper() for k in keys]
+        t = threading.Thread(target=self.flights.do_many,
+                             args=(["a", "b"], get_many))
+        t.start()
+        time.sleep(0.01)
+        result = self.flights.do_many(["b", "c", "c"], get_many)
+        t.join()
+        self.assertEqual(result, ["B", "C", "C"])
+        self.assertEqual(looked_up, [["a", "b"], ["c"]])
+        self.assertEqual(self.flights.shared, 1)
+
+
+class TestScoringSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.store = SlowStore()
+
+    def test_score_computed_once(self):
+        results, errors = run_concurrently(5, scoring.get_score, self.store,
+                                           "79175002040", "a@b.ru")
+        self.assertEqual(results, [3.0] * 5)
+        self.assertEqual(len(self.store.calls), 1)
+
+    def test_interests_fetched_once(self):
+        results, errors = run_concurrently(5, scoring.get_interests_many,
+                                           self.store, [1, 2])
+        self.assertEqual(results, [[[u"travel", u"books"],
+                                    [u"cars", u"pets"]]] * 5)
+        self.assertEqual(len(self.store.calls), 1)
+
+    def test_waiter_retries_after_owner_deadline(self):
+        store = DeadlineStore(0.3)
+        results = []
+        owner = run_with_budget(0.1, results, scoring.get_interests_many,
+                                store, [1])
+        time.sleep(0.02)
+        waiter = run_with_budget(10, results, scoring.get_interests_many,
+                                 store, [1])
+        owner.join()
+        waiter.join()
+        results = dict((budget, result) for budget, result, _ in results)
+        self.assertIsInstance(results[0.1], DeadlineExceeded)
+        self.assertEqual(results[10], [[u"travel", u"books"]])
+        self.assertEqual(store.calls, 2)
+
+    def test_waiter_keeps_own_deadline(self):
+        store = DeadlineStore(0.45)
+        results = []
+        owner = run_with_budget(None, results, scoring.get_interests_many,
+                                store, [1])
+        time.sleep(0.02)
+        waiter = run_with_budget(0.05, results, scoring.get_interests_many,
+                                 store, [1])
+        waiter.join()
+        budget, result, elapsed = results[0]
+        self.assertEqual(budget, 0.05)
+        self.assertIsInstance(result, DeadlineExceeded)
+        self.assertLess(elapsed, 0.3)
+        owner.join()
+        self.assertEqual(results[1][1], [[u"travel", u"books"]])
+
+    def test_do_waiter_retries_after_owner_deadline(self):
+        flights = singleflight.SingleFlight()
+        calls = []
+
+        def lookup():
+            calls.append(deadline.current())
+            time.sleep(0.1)
+            deadline.remaining()
+            return 42
+        results = []
+        owner = run_with_budget(0.05, results, flights.do, "k", lookup)
+        time.sleep(0.02)
+        waiter = run_with_budget(10, results, flights.do, "k", lookup)
+        owner.join()
+        waiter.join()
+        results = dict((budget, result) for budget, result, _ in results)
+        self.assertIsInstance(results[0.05], DeadlineExceeded)
+        self.assertEqual(results[10], 42)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import unittest
+
+from api import api, deadline
+from api.deadline import DeadlineExceeded
+from api.memory_store import MemoryStore
+from tests.cases import cases
+
+
+class SlowStore(MemoryStore):
+    """Every lookup takes ``delay`` seconds of the request budget."""
+
+    def __init__(self, delay, **kwargs):
+        MemoryStore.__init__(self, log=False, **kwargs)
+        self.delay = delay
+
+    def get_many(self, cids):
+        time.sleep(min(self.delay, deadline.remaining(self.delay)))
+        deadline.remaining()
+        return MemoryStore.get_many(self, cids)
+
+
+class TestInterestsStream(unittest.TestCase):
+    def setUp(self):
+        self.store = MemoryStore(log=False, interests={
+            "i:1": ["a"], "i:2": ["b"]})
+
+    def render(self, client_ids, batch_size):
+        return "".join(api.InterestsStream(self.store, client_ids,
+                                           batch_size))
+
+    @cases([1, 2, 3, 10])
+    def test_duplicates_emitted_once(self, batch_size):
+        body = self.render([1, 1, 2, 1, 3, 2], batch_size)
+        self.assertEqual(body, '{"1": ["a"], "2": ["b"], "3": []}')
+        self.assertEqual(json.loads(body), {"1": ["a"], "2": ["b"],
+                                            "3": []})
+
+    def test_batches_have_own_deadline(self):
+        store = SlowStore(0.05, interests={"i:1": ["a"]})
+        stream = api.InterestsStream(store, range(10), 2,
+                                     time.time() + 0.08, batch_timeout=0.08)
+        body = "".join(stream)
+        self.assertEqual(json.loads(body)["1"], ["a"])
+        self.assertEqual(len(json.loads(body)), 10)
+
+    def test_first_batch_under_request_deadline(self):
+        store = SlowStore(0.05)
+        stream = api.InterestsStream(store, range(10), 2,
+                                     time.time() + 0.01, batch_timeout=1)
+        self.assertRaises(DeadlineExceeded, stream.start)
+
+    def test_slow_batch_exceeds_its_deadline(self):
+        store = SlowStore(0.05)
+        stream = api.InterestsStream(store, range(10), 2, None,
+                                     batch_timeout=0.01)
+        pieces = iter(stream)
+        next(pieces)
+        self.assertRaises(DeadlineExceeded, next, pieces)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import unittest
+from StringIO import StringIO
+
+from api import warmup, scoring
+from api.cache import LRUCache
+from api.memory_store import MemoryStore
+from tests.cases import cases
+from tests.unit.test_bulk_score import CSV, JSONL
+
+KEYS = {
+    scoring.score_key("79175002040", datetime.datetime(2000, 1, 1),
+                      "Stanislav", "Stupnikov"): 5.0,
+    scoring.score_key("79175002040"): 1.5,
+    scoring.score_key(birthday=datetime.datetime(2000, 1, 1)): 1.5,
+}
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.slept = []
+        self.limiter = warmup.RateLimiter(10, clock=lambda: self.now,
+                                          sleep=self.slept.append)
+
+    def test_spacing(self):
+        self.assertEqual(self.limiter.acquire(5), 0)
+        self.assertEqual(self.limiter.acquire(5), 0.5)
+        self.assertEqual(self.limiter.acquire(10), 1.0)
+        self.assertEqual(self.slept, [0.5, 1.0])
+
+    def test_idle_time_is_not_saved_up(self):
+        self.limiter.acquire(10)
+        self.now += 60
+        self.assertEqual(self.limiter.acquire(10), 0)
+        self.assertEqual(self.limiter.acquire(1), 1.0)
+
+    def test_no_limit(self):
+        limiter = warmup.RateLimiter(0, sleep=self.slept.append)
+        for _ in range(3):
+            self.assertEqual(limiter.acquire(1000), 0)
+        self.assertEqual(self.slept, [])
+
+
+class TestWarmup(unittest.TestCase):
+    @cases([
+        (warmup.CSV, CSV, 1, 1),
+        (warmup.CSV, CSV, 2, 4),
+        (warmup.JSONL, JSONL, 10, 2),
+    ])
+    def test_warm_store(self, fmt, data, batch_size, workers):
+        store = MemoryStore()
+        total = warmup.warm(StringIO(data), store, fmt=fmt,
+                            batch_size=batch_size, workers=workers)
+        self.assertEqual(total, (3, 0))
+        for key, score in KEYS.items():
+            self.assertEqual(store.cache_get(key), score)
+
+    def test_warm_cache(self):
+        cache = LRUCache()
+        warmup.warm(StringIO(CSV), cache=cache, fmt=warmup.CSV)
+        self.assertEqual(len(cache), 3)
+        for key, score in KEYS.items():
+            self.assertEqual(cache.get(key), score)
+
+    def test_keys_match_get_score(self):
+        store = MemoryStore()
+        warmup.warm(StringIO(JSONL), store, fmt=warmup.JSONL)
+        store.cache_set = None
+        self.assertEqual(scoring.get_score(
+            store, "79175002040", "stupnikov@otus.ru",
+            datetime.datetime(2000, 1, 1), "male", "Stanislav",
+            "Stupnikov"), 5.0)
+
+    def test_zero_scores_skipped(self):
+        store = MemoryStore()
+        total = warmup.warm(StringIO('{"email": ""}\n{}\n'), store)
+        self.assertEqual(total, (2, 0))
+        self.assertEqual(len(store.scores), 0)
+
+    @cases([(1, 1), (2, 4), (10, 2)])
+    def test_invalid_records_skipped(self, batch_size, workers):
+        data = '{"birthday": "31.02.1990"}\n[1]\n' + JSONL + '{"phone": \n'
+        store = MemoryStore()
+        total = warmup.warm(StringIO(data), store, batch_size=batch_size,
+                            workers=workers)
+        self.assertEqual(total, (6, 3))
+        self.assertEqual(len(store.scores), 3)
+        for key, score in KEYS.items():
+            self.assertEqual(store.cache_get(key), score)
+
+    @cases([
+        (None, 10, [2, 1]),
+        (1, 10, [1, 1, 1]),
+        (2, 1, [1, 1, 1]),
+        (10, 10, [3]),
+    ])
+    def test_rate_limited_per_chunk(self, chunk_size, batch_size, chunks):
+        store = MemoryStore()
+        store.chunk_size = 2
+        acquired = []
+        acquire = warmup.RateLimiter.acquire
+        warmup.RateLimiter.acquire = lambda self, n: acquired.append(n)
+        try:
+            warmup.warm(StringIO(JSONL), store, rate=1, workers=1,
+                        batch_size=batch_size, chunk_size=chunk_size)
+        finally:
+            warmup.RateLimiter.acquire = acquire
+        self.assertEqual(acquired, chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
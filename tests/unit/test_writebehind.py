@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from api import writebehind
+from tests.cases import cases
+
+
+class MockedStore(object):
+    connected = True
+
+    def __init__(self):
+        self.batches = []
+
+    def cache_get(self, key):
+        return None
+
+    def cache_get_many(self, keys, chunk_size=None):
+        return [None] * len(keys)
+
+    def cache_set_many(self, items):
+        if not self.connected:
+            raise IOError("Store not connected!")
+        self.batches.append(items)
+        return len(items)
+
+    def stats(self):
+        return {}
+
+
+class TestWriteBehindStore(unittest.TestCase):
+    def setUp(self):
+        self.l2 = MockedStore()
+
+    def tearDown(self):
+        self.store.close()
+
+    def get_store(self, **kwargs):
+        kwargs.setdefault("flush_interval", 60)
+        self.store = writebehind.WriteBehindStore(self.l2, log=False,
+                                                  **kwargs)
+        return self.store
+
+    @cases([1, 3, 10])
+    def test_writes_are_batched(self, count):
+        store = self.get_store(flush_size=count)
+        self.l2.batches = []
+        for i in range(count):
+            store.cache_set("uid:%s" % i, i, 3600)
+        store.flush()
+        self.assertEqual(len(self.l2.batches), 1)
+        self.assertEqual(len(self.l2.batches[0]), count)
+        store.close()
+
+    def test_writes_are_coalesced(self):
+        store = self.get_store()
+        store.cache_set("uid:1", 1.5, 3600)
+        store.cache_set("uid:1", 3.0, 3600)
+        self.assertEqual(store.cache_get("uid:1"), 3.0)
+        store.flush()
+        self.assertEqual(self.l2.batches, [[("uid:1", 3.0, 3600)]])
+        self.assertEqual(store.stats()["write_coalesced"], 1)
+
+    def test_cache_get_many_reads_pending(self):
+        store = self.get_store()
+        store.cache_set("uid:1", 1.5, 3600)
+        self.assertEqual(store.cache_get_many(["uid:0", "uid:1"]),
+                         [None, 1.5])
+
+    @cases([writebehind.DROP, writebehind.BLOCK])
+    def test_queue_overflow(self, policy):
+        store = self.get_store(queue_size=1, policy=policy, block_timeout=0)
+        self.assertTrue(store.cache_set("uid:1", 1.5, 3600))
+        self.assertIsNone(store.cache_set("uid:2", 1.5, 3600))
+        self.assertEqual(store.stats()["write_dropped"], 1)
+        store.close()
+
+    def test_flush_error(self):
+        store = self.get_store()
+        self.l2.connected = False
+        store.cache_set("uid:1", 1.5, 3600)
+        store.flush()
+        self.assertEqual(store.stats()["write_flush_errors"], 1)
+
+    def test_close_flushes_queue(self):
+        store = self.get_store()
+        store.cache_set("uid:1", 1.5, 3600)
+        store.close()
+        self.assertEqual(self.l2.batches, [[("uid:1", 1.5, 3600)]])
+
+
+if __name__ == "__main__":
+    unittest.main()